@@ -0,0 +1,119 @@
+"""Асинхронный слой доступа к данным.
+
+Функции database.py выполняются на соединении AsyncEngine (драйвер aiosqlite
+для SQLite или asyncpg для PostgreSQL): пока идет запрос, цикл событий
+продолжает обрабатывать другие обновления Telegram.
+"""
+import functools
+import logging
+from typing import Any, Callable
+
+import database
+from db_engine import create_async_db_engine
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+async_engine = create_async_db_engine()
+
+
+async def run_sync(fn: Callable, *args, **kwargs) -> Any:
+    """Выполняет синхронную функцию database.py на соединении AsyncEngine.
+
+    Сессии, открытые функцией через database.Session(), привязываются к
+    соединению текущего вызова и работают в его транзакции. То, что должно
+    фиксироваться независимо от неё, открывается через
+    database.independent_session() на отдельном соединении. Вызов
+    записывается в трассу обрабатываемого обновления.
+    """
+    with tracer.span('db', fn.__name__):
+        async with async_engine.connect() as connection:
+            def _call(sync_connection):
+                token = database.session_bind.set(sync_connection)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    database.session_bind.reset(token)
+
+            return await connection.run_sync(_call)
+
+
+def _awaitable(fn: Callable) -> Callable:
+    """Создает awaitable-аналог функции database.py"""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_sync(fn, *args, **kwargs)
+    return wrapper
+
+
+# Пользователи
+add_user = _awaitable(database.add_user)
+get_user_by_telegram_id = _awaitable(database.get_user_by_telegram_id)
+
+# Комнаты
+generate_room_code = _awaitable(database.generate_room_code)
+create_room = _awaitable(database.create_room)
+update_room_version = _awaitable(database.update_room_version)
+get_user_rooms_count = _awaitable(database.get_user_rooms_count)
+add_user_to_room = _awaitable(database.add_user_to_room)
+count_users_in_room = _awaitable(database.count_users_in_room)
+get_all_rooms = _awaitable(database.get_all_rooms)
+get_rooms_page = _awaitable(database.get_rooms_page)
+count_user_rooms = _awaitable(database.count_user_rooms)
+get_room_by_id = _awaitable(database.get_room_by_id)
+switch_to_room = _awaitable(database.switch_to_room)
+grant_access = _awaitable(database.grant_access)
+user_has_room = _awaitable(database.user_has_room)
+get_room_details = _awaitable(database.get_room_details)
+room_exists = _awaitable(database.room_exists)
+get_all_active_rooms = _awaitable(database.get_all_active_rooms)
+get_user_room = _awaitable(database.get_user_room)
+get_room_id_by_code = _awaitable(database.get_room_id_by_code)
+get_room_by_code = _awaitable(database.get_room_by_code)
+switch_room = _awaitable(database.switch_room)
+update_room_activity = _awaitable(database.update_room_activity)
+get_room_statistics = _awaitable(database.get_room_statistics)
+check_room_limits = _awaitable(database.check_room_limits)
+can_join_room = _awaitable(database.can_join_room)
+join_room = _awaitable(database.join_room)
+get_room_users = _awaitable(database.get_room_users)
+delete_room = _awaitable(database.delete_room)
+get_room_participants = _awaitable(database.get_room_participants)
+leave_room = _awaitable(database.leave_room)
+check_user_in_room = _awaitable(database.check_user_in_room)
+load_room_snapshots = _awaitable(database.load_room_snapshots)
+
+# Желания
+add_wish = _awaitable(database.add_wish)
+update_wish = _awaitable(database.update_wish)
+get_wish = _awaitable(database.get_wish)
+delete_wish = _awaitable(database.delete_wish)
+get_user_wishes = _awaitable(database.get_user_wishes)
+get_wishes_page = _awaitable(database.get_wishes_page)
+get_room_wishes = _awaitable(database.get_room_wishes)
+mark_wish_as_viewed = _awaitable(database.mark_wish_as_viewed)
+count_user_wishes = _awaitable(database.count_user_wishes)
+
+# Очередь рассылки
+enqueue_messages = _awaitable(database.enqueue_messages)
+get_pending_messages = _awaitable(database.get_pending_messages)
+mark_messages_sent = _awaitable(database.mark_messages_sent)
+mark_messages_failed = _awaitable(database.mark_messages_failed)
+postpone_messages = _awaitable(database.postpone_messages)
+
+# Подборки желаний
+get_stale_digest_room_ids = _awaitable(database.get_stale_digest_room_ids)
+save_wish_digests = _awaitable(database.save_wish_digests)
+get_wish_digests = _awaitable(database.get_wish_digests)
+
+# Жеребьевка
+get_room_member_ids = _awaitable(database.get_room_member_ids)
+add_draw_exclusion = _awaitable(database.add_draw_exclusion)
+get_draw_exclusions = _awaitable(database.get_draw_exclusions)
+get_assignments = _awaitable(database.get_assignments)
+save_assignments = _awaitable(database.save_assignments)
+get_user_assignment = _awaitable(database.get_user_assignment)
+
+# Состояние бота
+load_bot_state = _awaitable(database.load_bot_state)
+save_bot_state = _awaitable(database.save_bot_state)
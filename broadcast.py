@@ -0,0 +1,218 @@
+"""Рассылка сообщений с учетом лимитов Bot API.
+
+Сообщения сначала записываются в таблицу outbox, затем BroadcastEngine
+отправляет их порциями: общий token bucket держит глобальный лимит,
+отдельные buckets - лимит на чат, семафор ограничивает число
+одновременных запросов. После перезапуска неотправленные сообщения
+остаются в outbox и досылаются следующим запуском.
+
+Окончательно недоставленными отмечаются только сообщения, отклоненные
+Telegram (Forbidden, BadRequest). После сетевых ошибок и исчерпанных
+RetryAfter сообщение остается в очереди и откладывается с растущей паузой.
+"""
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Dict, Optional, Tuple
+
+from telegram.error import BadRequest, Forbidden, RetryAfter, TelegramError
+
+from async_database import (
+    get_pending_messages, mark_messages_sent, mark_messages_failed, postpone_messages
+)
+from config import (
+    BROADCAST_GLOBAL_RATE, BROADCAST_CHAT_RATE, BROADCAST_CONCURRENCY,
+    BROADCAST_MAX_ATTEMPTS, BROADCAST_BATCH_SIZE
+)
+
+logger = logging.getLogger(__name__)
+
+# Максимальная пауза между повторными попытками при сетевых ошибках
+MAX_BACKOFF = 60
+# Максимальная пауза до следующей рассылки отложенного сообщения
+MAX_RETRY_DELAY = 3600
+
+# Результаты отправки сообщения
+SENT = 'sent'
+FAILED = 'failed'
+POSTPONED = 'postponed'
+
+
+class TokenBucket:
+    """Token bucket: не более rate событий в секунду, всплеск до capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ждет, пока не появится свободный токен, и забирает его"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Приостанавливает выдачу токенов (например, после RetryAfter)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+def _retry_after_seconds(error: RetryAfter) -> float:
+    """Возвращает паузу из RetryAfter в секундах"""
+    delay = error.retry_after
+    if isinstance(delay, timedelta):
+        return delay.total_seconds()
+    return float(delay)
+
+
+class BroadcastEngine:
+    """Отправляет сообщения из outbox с соблюдением лимитов Telegram"""
+
+    def __init__(
+        self,
+        bot,
+        global_rate: float = BROADCAST_GLOBAL_RATE,
+        chat_rate: float = BROADCAST_CHAT_RATE,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        max_attempts: int = BROADCAST_MAX_ATTEMPTS,
+        batch_size: int = BROADCAST_BATCH_SIZE
+    ):
+        self.bot = bot
+        self.chat_rate = chat_rate
+        self.max_attempts = max_attempts
+        self.batch_size = batch_size
+        self.global_bucket = TokenBucket(global_rate)
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate, capacity=1)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _deliver(self, message: Dict) -> Tuple[str, Optional[str], int]:
+        """
+        Отправляет одно сообщение, повторяя попытку после временных ошибок
+        не более max_attempts раз.
+
+        Returns:
+            Tuple[str, Optional[str], int]: (SENT, FAILED или POSTPONED,
+            текст ошибки, число неудачных попыток)
+        """
+        attempts = 0
+        chat_bucket = self._chat_bucket(message['chat_id'])
+
+        async with self._semaphore:
+            while True:
+                # Каждая попытка, в том числе повтор, расходует токены
+                # чата и общего лимита
+                await chat_bucket.acquire()
+                await self.global_bucket.acquire()
+                try:
+                    await self.bot.send_message(
+                        chat_id=message['chat_id'],
+                        text=message['text']
+                    )
+                    return SENT, None, attempts
+                except (Forbidden, BadRequest) as e:
+                    # Пользователь заблокировал бота или чат недоступен:
+                    # повторять бессмысленно
+                    return FAILED, str(e), attempts + 1
+                except RetryAfter as e:
+                    # Флуд-контроль действует на весь бот, поэтому
+                    # останавливаем общий bucket, а не только этот запрос
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        return POSTPONED, str(e), attempts
+                    delay = _retry_after_seconds(e)
+                    logger.warning("Получен RetryAfter, пауза рассылки %s с", delay)
+                    self.global_bucket.pause(delay)
+                except TelegramError as e:
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        return POSTPONED, str(e), attempts
+                    backoff = min(2 ** attempts, MAX_BACKOFF)
+                    logger.warning(
+                        "Ошибка при отправке в чат %s: %s, повтор через %s с",
+                        message['chat_id'], e, backoff
+                    )
+                    await asyncio.sleep(backoff)
+
+    async def run(self) -> Dict[str, int]:
+        """Отправляет все сообщения из outbox. Returns: статистика рассылки"""
+        stats = {SENT: 0, FAILED: 0, POSTPONED: 0}
+        started = time.monotonic()
+
+        while True:
+            messages = await get_pending_messages(self.batch_size)
+            if not messages:
+                break
+
+            results = await asyncio.gather(
+                *(self._deliver(message) for message in messages)
+            )
+
+            sent_ids = []
+            failures = []
+            retries = []
+            for message, (status, error, attempts) in zip(messages, results):
+                if status == SENT:
+                    sent_ids.append(message['id'])
+                elif status == FAILED:
+                    logger.error(
+                        "Не удалось доставить сообщение %s в чат %s: %s",
+                        message['id'], message['chat_id'], error
+                    )
+                    failures.append((message['id'], error))
+                else:
+                    # Пауза растет с общим числом попыток этого сообщения
+                    total_attempts = message['attempts'] + attempts
+                    delay = min(2 ** total_attempts, MAX_RETRY_DELAY)
+                    logger.warning(
+                        "Сообщение %s в чат %s отложено на %s с: %s",
+                        message['id'], message['chat_id'], delay, error
+                    )
+                    retries.append((message['id'], error, attempts, delay))
+
+            saved = [
+                await mark_messages_sent(sent_ids),
+                await mark_messages_failed(failures),
+                await postpone_messages(retries),
+            ]
+            stats[SENT] += len(sent_ids)
+            stats[FAILED] += len(failures)
+            stats[POSTPONED] += len(retries)
+            if not all(saved):
+                # Несохраненные результаты оставили бы сообщения в очереди,
+                # и следующая порция отправила бы их повторно
+                logger.error(
+                    "Не удалось сохранить результаты отправки %s сообщений, рассылка остановлена",
+                    len(messages)
+                )
+                break
+
+        logger.info(
+            "Рассылка завершена за %.1f с: отправлено %s, ошибок %s, отложено %s",
+            time.monotonic() - started, stats[SENT], stats[FAILED], stats[POSTPONED]
+        )
+        return stats
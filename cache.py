@@ -0,0 +1,168 @@
+"""Кэш часто читаемых комнат и пользователей.
+
+Записи ограничены по количеству (вытесняются давно не использованные) и
+по времени жизни. Каждая запись помечается тегами вида ('room', room_id)
+или ('user', telegram_id); функции записи в database.py сбрасывают все
+записи с нужным тегом после commit.
+"""
+import copy
+import functools
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Set, Tuple
+
+
+class TTLCache:
+    """LRU-кэш с временем жизни записей и сбросом по тегам"""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30.0, enabled: bool = True):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any, Tuple]]' = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        # Часы сбросов: увеличиваются при каждом сбросе. Для тега хранится
+        # время последнего сброса, и значение, загрузка которого началась
+        # раньше сброса любого из его тегов, уже может быть устаревшим и не
+        # сохраняется. Сброс других тегов загрузку не отменяет
+        self._clock = 0
+        self._invalidated: Dict[Hashable, int] = {}
+        self._cleared_at = 0
+        # Время начала загрузок, которые еще выполняются
+        self._loading: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Any],
+        tags: Callable[[Any], Iterable[Hashable]]
+    ) -> Any:
+        """
+        Возвращает значение из кэша или загружает его через loader.
+
+        Args:
+            key: Ключ записи
+            loader: Функция загрузки значения из базы
+            tags: Функция, возвращающая теги загруженного значения
+
+        Returns:
+            Any: Значение; None не кэшируется
+        """
+        if not self.enabled:
+            return loader()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            started = self._clock
+            self._loading[started] += 1
+
+        value = None
+        try:
+            value = loader()
+            return value
+        finally:
+            value_tags = tuple(tags(value)) if value is not None else ()
+            with self._lock:
+                if value is not None and self._is_fresh(started, value_tags):
+                    self._store(key, value, value_tags)
+                self._finish_load(started)
+
+    def invalidate(self, *tags: Hashable) -> None:
+        """Сбрасывает все записи, помеченные любым из тегов"""
+        with self._lock:
+            self._clock += 1
+            for tag in tags:
+                if self._loading:
+                    self._invalidated[tag] = self._clock
+                for key in self._tags.pop(tag, set()):
+                    self._remove(key)
+
+    def clear(self) -> None:
+        """Очищает кэш и счетчики"""
+        with self._lock:
+            self._clock += 1
+            self._cleared_at = self._clock
+            self._invalidated.clear()
+            self._entries.clear()
+            self._tags.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Возвращает счетчики попаданий и промахов"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._entries)
+        }
+
+    def _is_fresh(self, started: int, tags: Tuple) -> bool:
+        """Проверяет, что после начала загрузки теги значения не сбрасывались"""
+        if self._cleared_at > started:
+            return False
+        return all(self._invalidated.get(tag, 0) <= started for tag in tags)
+
+    def _finish_load(self, started: int) -> None:
+        """Завершает загрузку и забывает сбросы, которые уже ни на что не влияют"""
+        self._loading[started] -= 1
+        if not self._loading[started]:
+            del self._loading[started]
+        if not self._loading:
+            self._invalidated.clear()
+        elif len(self._invalidated) > self.maxsize:
+            oldest = min(self._loading)
+            self._invalidated = {
+                tag: clock for tag, clock in self._invalidated.items() if clock > oldest
+            }
+
+    def _store(self, key: Hashable, value: Any, tags: Tuple) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+def cached(cache: TTLCache, tags: Callable[..., Iterable[Hashable]]) -> Callable:
+    """
+    Декоратор read-through кэширования функции чтения.
+
+    Args:
+        cache: Кэш
+        tags: Функция (value, *args), возвращающая теги значения
+    """
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args):
+            value = cache.get_or_load(
+                (fn.__name__,) + args,
+                lambda: fn(*args),
+                lambda result: tags(result, *args)
+            )
+            # Отдаем копию, чтобы вызывающий код не изменил запись в кэше
+            return copy.copy(value) if isinstance(value, dict) else value
+        return wrapper
+    return decorator
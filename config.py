@@ -12,6 +12,72 @@ class BaseConfig:
     PAYMENT_TOKEN = os.getenv("PAYMENT_TOKEN")
     MAX_FREE_USERS = 5
     MAX_PAID_USERS = 10
+    # Лимиты Bot API: ~30 сообщений в секунду всего и 1 в секунду на чат
+    BROADCAST_GLOBAL_RATE = 30
+    BROADCAST_CHAT_RATE = 1
+    BROADCAST_CONCURRENCY = 30
+    # Попыток отправки за одну рассылку, после чего сообщение откладывается
+    BROADCAST_MAX_ATTEMPTS = 5
+    BROADCAST_BATCH_SIZE = 500
+    # Не рассылать подборки желаний, не изменившиеся с прошлой рассылки
+    DIGEST_SKIP_UNCHANGED = False
+    # Кэш комнат и пользователей: число записей и время жизни в секундах
+    CACHE_ENABLED = True
+    CACHE_MAX_SIZE = 1024
+    CACHE_TTL = 30
+    # Сколько комнат и желаний показывать на одной странице списка
+    ROOMS_PAGE_SIZE = int(os.getenv("ROOMS_PAGE_SIZE", 10))
+    WISHES_PAGE_SIZE = int(os.getenv("WISHES_PAGE_SIZE", 5))
+    # Сколько клавиатур с ID комнаты хранить готовыми
+    KEYBOARD_CACHE_SIZE = 1024
+    # Коды комнат резервируются в базе блоками
+    ROOM_CODE_BLOCK_SIZE = 100
+    ROOM_CODE_SECRET = os.getenv("ROOM_CODE_SECRET", "secret-santa")
+    # Настройки SQLite, применяемые при каждом подключении
+    SQLITE_JOURNAL_MODE = "WAL"
+    SQLITE_SYNCHRONOUS = "NORMAL"
+    SQLITE_BUSY_TIMEOUT = 5000  # мс
+    SQLITE_CACHE_SIZE = -64000  # отрицательное значение - в КиБ
+    SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+    # Пул соединений PostgreSQL
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE = os.getenv("BOT_MODE", "polling")
+    WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный адрес, например https://santa.example.com
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", 8080))
+    WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")
+    # Сколько соединений Telegram может открыть к webhook одновременно
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+    # Сколько обновлений обрабатывается одновременно (обновления одного
+    # пользователя - всегда по очереди) и сколько может ждать обработки
+    UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", 16))
+    UPDATE_MAX_PENDING = 10000
+    # Где хранить context.user_data между перезапусками: sql или redis;
+    # по умолчанию не сохраняется
+    PERSISTENCE_BACKEND = os.getenv("PERSISTENCE_BACKEND", "")
+    REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    # Как часто (в секундах) сохранять изменения состояния
+    PERSISTENCE_FLUSH_INTERVAL = float(os.getenv("PERSISTENCE_FLUSH_INTERVAL", 5))
+    # Метрики функций базы данных: /metrics на отдельном сервере
+    # METRICS_HOST:METRICS_PORT и периодическая выгрузка в JSON
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+    METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+    METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH")
+    METRICS_DUMP_INTERVAL = 60
+    # По скольким последним обновлениям считать перцентили обработчиков
+    METRICS_HANDLER_WINDOW = 1000
+    # Логирование: общий уровень, уровни отдельных логгеров, формат (text
+    # или json) и прореживание частых сообщений уровня INFO и ниже
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "httpx=WARNING,apscheduler=WARNING")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+    LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", 1))
 
 class TestConfig(BaseConfig):
     """Конфигурация для тестирования"""
@@ -49,3 +115,57 @@ PRO_MAX_USERS = current_config.MAX_PAID_USERS
 # Настройки желаний
 FREE_MAX_WISHES = 3  # Максимальное количество желаний в бесплатной версии
 PRO_MAX_WISHES = 10  # Максимальное количество желаний в PRO версии
+
+# Настройки рассылки
+BROADCAST_GLOBAL_RATE = current_config.BROADCAST_GLOBAL_RATE
+BROADCAST_CHAT_RATE = current_config.BROADCAST_CHAT_RATE
+BROADCAST_CONCURRENCY = current_config.BROADCAST_CONCURRENCY
+BROADCAST_MAX_ATTEMPTS = current_config.BROADCAST_MAX_ATTEMPTS
+BROADCAST_BATCH_SIZE = current_config.BROADCAST_BATCH_SIZE
+
+# Настройки подборок желаний
+DIGEST_SKIP_UNCHANGED = current_config.DIGEST_SKIP_UNCHANGED
+
+# Настройки кэша
+CACHE_ENABLED = current_config.CACHE_ENABLED
+CACHE_MAX_SIZE = current_config.CACHE_MAX_SIZE
+CACHE_TTL = current_config.CACHE_TTL
+
+# Настройки списков
+ROOMS_PAGE_SIZE = current_config.ROOMS_PAGE_SIZE
+WISHES_PAGE_SIZE = current_config.WISHES_PAGE_SIZE
+KEYBOARD_CACHE_SIZE = current_config.KEYBOARD_CACHE_SIZE
+
+# Настройки кодов комнат
+ROOM_CODE_BLOCK_SIZE = current_config.ROOM_CODE_BLOCK_SIZE
+ROOM_CODE_SECRET = current_config.ROOM_CODE_SECRET
+
+# Настройки получения обновлений
+BOT_MODE = current_config.BOT_MODE
+WEBHOOK_URL = current_config.WEBHOOK_URL
+WEBHOOK_PATH = current_config.WEBHOOK_PATH
+WEBHOOK_HOST = current_config.WEBHOOK_HOST
+WEBHOOK_PORT = current_config.WEBHOOK_PORT
+WEBHOOK_SECRET_TOKEN = current_config.WEBHOOK_SECRET_TOKEN
+WEBHOOK_MAX_CONNECTIONS = current_config.WEBHOOK_MAX_CONNECTIONS
+UPDATE_WORKERS = current_config.UPDATE_WORKERS
+UPDATE_MAX_PENDING = current_config.UPDATE_MAX_PENDING
+
+# Настройки хранения состояния
+PERSISTENCE_BACKEND = current_config.PERSISTENCE_BACKEND
+REDIS_URL = current_config.REDIS_URL
+PERSISTENCE_FLUSH_INTERVAL = current_config.PERSISTENCE_FLUSH_INTERVAL
+
+# Настройки метрик
+METRICS_ENABLED = current_config.METRICS_ENABLED
+METRICS_HOST = current_config.METRICS_HOST
+METRICS_PORT = current_config.METRICS_PORT
+METRICS_DUMP_PATH = current_config.METRICS_DUMP_PATH
+METRICS_DUMP_INTERVAL = current_config.METRICS_DUMP_INTERVAL
+METRICS_HANDLER_WINDOW = current_config.METRICS_HANDLER_WINDOW
+
+# Настройки логирования
+LOG_LEVEL = current_config.LOG_LEVEL
+LOG_LEVELS = current_config.LOG_LEVELS
+LOG_FORMAT = current_config.LOG_FORMAT
+LOG_SAMPLE_EVERY = current_config.LOG_SAMPLE_EVERY
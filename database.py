@@ -1,20 +1,38 @@
 import os
+import itertools
 import logging
-import random
-import string
+from contextvars import ContextVar
 from sqlalchemy import (
-    create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, BigInteger, Index, Text, Table, and_, func
+    Column, Integer, String, Boolean, DateTime, ForeignKey, BigInteger, Index, Text, Table, and_, func,
+    insert, update, select, delete, union, UniqueConstraint, case, or_, text, exists, bindparam
 )
+from sqlalchemy import inspect as sqlalchemy_inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
-from config import current_config, FREE_MAX_WISHES, PRO_MAX_WISHES
-from typing import Optional, Dict, Any, List, Union, Tuple
+from sqlalchemy.orm import sessionmaker, relationship, validates
+from datetime import datetime, timedelta
+from config import (
+    current_config, FREE_MAX_WISHES, PRO_MAX_WISHES,
+    CACHE_ENABLED, CACHE_MAX_SIZE, CACHE_TTL,
+    ROOM_CODE_BLOCK_SIZE, ROOM_CODE_SECRET, METRICS_ENABLED,
+    ROOMS_PAGE_SIZE, WISHES_PAGE_SIZE
+)
+from cache import TTLCache, cached
+from db_engine import create_db_engine
+from metrics import db_metrics
+from room_codes import CODE_SPACE, RoomCodeAllocator
+from typing import Optional, Dict, Any, Iterable, List, Union, Tuple
 
 logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
+def normalize_room_code(code: str) -> str:
+    """Приводит код комнаты к виду, в котором он хранится в базе"""
+    return code.strip().upper()
+
+
 # Таблица связи между пользователями и комнатами
 user_room_association = Table(
     'user_room_association',
@@ -35,7 +53,13 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     is_admin = Column(Boolean, default=False)
     is_premium = Column(Boolean, default=False)
-    room_id = Column(Integer, ForeignKey('rooms.id'), index=True)
+    # users и rooms ссылаются друг на друга: этот ключ PostgreSQL создает
+    # отдельным ALTER TABLE после обеих таблиц
+    room_id = Column(
+        Integer,
+        ForeignKey('rooms.id', use_alter=True, name='fk_users_room_id'),
+        index=True
+    )
     
     # Связи
     room = relationship("Room", back_populates="users", foreign_keys=[room_id])
@@ -70,6 +94,11 @@ class Room(Base):
     max_participants = Column(Integer, default=5)
     description = Column(Text, nullable=True)
     last_activity = Column(DateTime, default=datetime.utcnow)
+    # Счетчики обновляются вместе с участниками и желаниями в одной
+    # транзакции; пересчитать их можно командой db_manage.py recount-counters
+    member_count = Column(Integer, nullable=False, default=0)
+    wish_count = Column(Integer, nullable=False, default=0)
+    viewed_wish_count = Column(Integer, nullable=False, default=0)
     
     # Связи
     creator = relationship(
@@ -89,6 +118,12 @@ class Room(Base):
         cascade="all, delete-orphan"
     )
 
+    @validates('code')
+    def _normalize_code(self, key, code):
+        # Коды хранятся нормализованными, поэтому поиск по коду - это
+        # точечный запрос по уникальному индексу без func.upper()
+        return normalize_room_code(code)
+
     __table_args__ = (
         Index('idx_room_code_active', 'code', 'is_active'),
         Index('idx_room_creator', 'creator_id', 'is_active'),
@@ -110,39 +145,372 @@ class Wish(Base):
     room = relationship("Room", back_populates="wishes")
 
     __table_args__ = (
-        Index('idx_wish_user_room', 'user_id', 'room_id'),
+        Index('idx_wish_user_room_id', 'user_id', 'room_id', 'id'),
         Index('idx_wish_room_viewed', 'room_id', 'is_viewed'),
     )
 
 
+class MemberCounter(Base):
+    __tablename__ = 'member_counters'
+
+    # Желания участника в комнате
+    room_id = Column(Integer, ForeignKey('rooms.id'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    wish_count = Column(Integer, nullable=False, default=0)
+    viewed_wish_count = Column(Integer, nullable=False, default=0)
+
+
+class WishDigest(Base):
+    __tablename__ = 'wish_digests'
+
+    room_id = Column(Integer, ForeignKey('rooms.id'), primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    # Пустой текст - получателю нечего отправлять
+    text = Column(Text, nullable=False, default='')
+    built_at = Column(DateTime, default=datetime.utcnow)
+    delivered_at = Column(DateTime, nullable=True)
+
+
+class Assignment(Base):
+    __tablename__ = 'assignments'
+
+    room_id = Column(Integer, ForeignKey('rooms.id'), primary_key=True)
+    giver_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    receiver_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('room_id', 'receiver_id', name='uq_assignment_receiver'),
+    )
+
+
+class DrawExclusion(Base):
+    __tablename__ = 'draw_exclusions'
+
+    room_id = Column(Integer, ForeignKey('rooms.id'), primary_key=True)
+    giver_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    receiver_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+
+
+class RoomCodeSequence(Base):
+    __tablename__ = 'room_code_sequence'
+
+    id = Column(Integer, primary_key=True)
+    next_value = Column(BigInteger, nullable=False, default=0)
+
+
+class BotState(Base):
+    __tablename__ = 'bot_state'
+
+    # namespace: user_data, chat_data, bot_data; key - ID пользователя или чата
+    namespace = Column(String(32), primary_key=True)
+    key = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class OutboxMessage(Base):
+    __tablename__ = 'outbox'
+
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(BigInteger, nullable=False)
+    text = Column(Text, nullable=False)
+    status = Column(String(16), default='pending', nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    # Следующая попытка после временной ошибки (None - отправлять сразу)
+    next_attempt_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('idx_outbox_status', 'status', 'id'),
+    )
+
+
 # Создаем подключение к базе данных
-engine = create_engine(
-    f'sqlite:///{current_config.DB_PATH}',
-    connect_args={'check_same_thread': False}
-)
+# Движок для DATABASE_URL из config.py: SQLite-файл или PostgreSQL
+engine = create_db_engine()
 Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+SessionFactory = sessionmaker(bind=engine)
 
+# Соединение, к которому привязываются сессии при вызове из async_database.
+# Вне асинхронного слоя значение пустое и сессии работают через engine.
+session_bind: ContextVar = ContextVar('session_bind', default=None)
 
+# Кэш чтения комнат и пользователей. Записи помечаются тегами
+# ('room', room_id) и ('user', telegram_id) и сбрасываются после commit
+cache = TTLCache(maxsize=CACHE_MAX_SIZE, ttl=CACHE_TTL, enabled=CACHE_ENABLED)
+
+
+def Session():
+    """Создает сессию базы данных. Внутри async_database.run_sync сессия
+    привязывается к соединению AsyncEngine текущего вызова"""
+    connection = session_bind.get()
+    if connection is not None:
+        return SessionFactory(bind=connection)
+    return SessionFactory()
+
+
+def independent_session():
+    """Создает сессию на отдельном соединении. Её commit не зависит от
+    транзакции вызывающей функции: так фиксируется то, что нельзя откатить
+    вместе с ней (например, выданный блок номеров кодов комнат)"""
+    connection = session_bind.get()
+    if connection is not None:
+        return SessionFactory(bind=connection.engine)
+    return SessionFactory()
+
+
+@db_metrics.instrument
 def init_bd():
     """Проверяет существование файла базы данных и создает его, 
-    если он не существует"""
-    db_path = current_config.DB_PATH
-    db_dir = os.path.dirname(db_path) if os.path.dirname(db_path) else '.'
-    
-    if not os.path.exists(db_dir):
-        os.makedirs(db_dir)
-    
-    # Создаем файл базы данных, если он не существует
-    if not os.path.exists(db_path):
-        open(db_path, 'w').close()
+    если он не существует (для PostgreSQL создаются только таблицы)"""
+    if engine.url.get_backend_name() == 'sqlite' and engine.url.database:
+        db_path = engine.url.database
+        db_dir = os.path.dirname(db_path) if os.path.dirname(db_path) else '.'
+        
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        
+        # Создаем файл базы данных, если он не существует
+        if not os.path.exists(db_path):
+            open(db_path, 'w').close()
     
-    # Создаем все таблицы
-    Base.metadata.create_all(engine)
+    # Создаем все таблицы и добавляем столбцы, которых нет в старых базах
+    added = upgrade_schema(engine)
+    if any(column.startswith('rooms.') for column in added) or _has_missing_memberships():
+        recount_room_counters()
     logger.info("База данных успешно инициализирована")
     return True
 
 
+# Столбцы, появившиеся после первых версий схемы. Обязательные столбцы
+# должны иметь значение по умолчанию (default) в модели
+ADDED_COLUMNS = {
+    'rooms': ('member_count', 'wish_count', 'viewed_wish_count'),
+    'outbox': ('next_attempt_at',),
+}
+
+# Индексы, появившиеся после первых версий схемы
+ADDED_INDEXES = {
+    'wishes': ('idx_wish_user_room_id',),
+}
+
+
+@db_metrics.instrument
+def upgrade_schema(bind) -> List[str]:
+    """
+    Создает недостающие таблицы и добавляет в существующие недостающие
+    столбцы (ADDED_COLUMNS) и индексы (ADDED_INDEXES). Значения новых
+    счетчиков комнат нужно пересчитать (recount_room_counters)
+    
+    Returns:
+        List[str]: Добавленные столбцы в виде "таблица.столбец"
+    """
+    Base.metadata.create_all(bind)
+    added = []
+    inspector = sqlalchemy_inspect(bind)
+    with bind.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {column['name'] for column in inspector.get_columns(table)}
+            for name in columns:
+                if name in existing:
+                    continue
+                column = Base.metadata.tables[table].c[name]
+                column_type = column.type.compile(connection.dialect)
+                ddl = f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"
+                if not column.nullable:
+                    ddl += f" NOT NULL DEFAULT {column.default.arg}"
+                connection.execute(text(ddl))
+                added.append(f"{table}.{name}")
+        for table, indexes in ADDED_INDEXES.items():
+            existing = {index['name'] for index in inspector.get_indexes(table)}
+            for index in Base.metadata.tables[table].indexes:
+                if index.name in indexes and index.name not in existing:
+                    index.create(connection)
+                    logger.warning("Добавлен индекс %s", index.name)
+    if added:
+        logger.warning("Добавлены столбцы: %s", ", ".join(added))
+    return added
+
+
+def invalidate_room_digests(session, room_id: int) -> None:
+    """Сбрасывает подборки желаний комнаты в рамках транзакции session"""
+    session.query(WishDigest).filter(
+        WishDigest.room_id == room_id
+    ).delete(synchronize_session=False)
+
+
+def set_current_room(session, user: User, room_id: Optional[int]) -> Optional[int]:
+    """
+    Меняет текущую комнату пользователя. Текущей может быть только комната,
+    в которой пользователь состоит (add_member), поэтому счетчики
+    участников не меняются
+    
+    Returns:
+        Optional[int]: ID предыдущей комнаты
+    """
+    previous_room_id = user.room_id
+    user.room_id = room_id
+    return previous_room_id
+
+
+def _dialect_insert(session, table):
+    """INSERT с поддержкой ON CONFLICT для диалекта сессии"""
+    if session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def add_member(session, user_id: int, room_id: int) -> bool:
+    """
+    Добавляет пользователя в участники комнаты и увеличивает счетчик
+    участников в рамках транзакции session
+    
+    Returns:
+        bool: False, если пользователь уже состоял в комнате
+    """
+    added = session.execute(
+        _dialect_insert(session, user_room_association).values(
+            user_id=user_id,
+            room_id=room_id
+        ).on_conflict_do_nothing()
+    ).rowcount
+    if added:
+        session.execute(
+            update(Room).where(Room.id == room_id).values(
+                member_count=Room.member_count + 1
+            ),
+            execution_options={'synchronize_session': False}
+        )
+    return bool(added)
+
+
+def update_wish_counters(session, room_id: Optional[int], user_id: Optional[int],
+                         wishes: int = 0, viewed: int = 0) -> None:
+    """Изменяет счетчики желаний комнаты и участника в рамках транзакции session"""
+    if room_id is None:
+        return
+    session.execute(update(Room).where(Room.id == room_id).values(
+        wish_count=Room.wish_count + wishes,
+        viewed_wish_count=Room.viewed_wish_count + viewed
+    ))
+    if user_id is None:
+        return
+    session.execute(
+        _dialect_insert(session, MemberCounter).values(
+            room_id=room_id,
+            user_id=user_id,
+            wish_count=max(wishes, 0),
+            viewed_wish_count=max(viewed, 0)
+        ).on_conflict_do_update(
+            index_elements=[MemberCounter.room_id, MemberCounter.user_id],
+            set_={
+                'wish_count': MemberCounter.wish_count + wishes,
+                'viewed_wish_count': MemberCounter.viewed_wish_count + viewed
+            }
+        )
+    )
+
+
+# Пары (пользователь, комната), для которых обязана быть запись о членстве:
+# создатель комнаты и пользователь, для которого комната текущая
+_IMPLIED_MEMBERSHIPS = (
+    (Room.creator_id, Room.id),
+    (User.id, User.room_id),
+)
+
+
+def _has_missing_memberships() -> bool:
+    """Есть ли создатели или текущие участники комнат без записи о членстве
+    (базы, созданные до перехода на user_room_association)"""
+    session = Session()
+    try:
+        for user_id, room_id in _IMPLIED_MEMBERSHIPS:
+            missing = select(user_id).where(
+                user_id.isnot(None), room_id.isnot(None),
+                ~exists().where(
+                    user_room_association.c.user_id == user_id,
+                    user_room_association.c.room_id == room_id
+                )
+            ).limit(1)
+            if session.execute(missing).first():
+                return True
+        return False
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def recount_room_counters() -> Dict[str, int]:
+    """
+    Пересчитывает счетчики участников и желаний по таблицам
+    user_room_association и wishes
+    
+    Создатель комнаты и пользователи, для которых комната текущая, считаются
+    её участниками: недостающие записи о членстве добавляются перед подсчетом.
+    
+    Returns:
+        Dict[str, int]: rooms - число исправленных комнат, members - число
+        записей счетчиков участников, memberships - добавлено записей о членстве
+    """
+    session = Session()
+    try:
+        memberships = 0
+        for user_id, room_id in _IMPLIED_MEMBERSHIPS:
+            memberships += session.execute(
+                _dialect_insert(session, user_room_association).from_select(
+                    ['user_id', 'room_id'],
+                    select(user_id, room_id).where(
+                        user_id.isnot(None), room_id.isnot(None)
+                    )
+                ).on_conflict_do_nothing()
+            ).rowcount
+        
+        members = select(func.count()).select_from(user_room_association).where(
+            user_room_association.c.room_id == Room.id
+        ).scalar_subquery()
+        wishes = select(func.count(Wish.id)).where(
+            Wish.room_id == Room.id
+        ).scalar_subquery()
+        viewed = select(func.count(Wish.id)).where(
+            Wish.room_id == Room.id, Wish.is_viewed.is_(True)
+        ).scalar_subquery()
+        fixed_rooms = session.execute(
+            update(Room).where(
+                (Room.member_count != members)
+                | (Room.wish_count != wishes)
+                | (Room.viewed_wish_count != viewed)
+            ).values(member_count=members, wish_count=wishes, viewed_wish_count=viewed),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        
+        session.execute(delete(MemberCounter))
+        session.execute(insert(MemberCounter).from_select(
+            ['room_id', 'user_id', 'wish_count', 'viewed_wish_count'],
+            select(
+                Wish.room_id,
+                Wish.user_id,
+                func.count(Wish.id),
+                func.count(case((Wish.is_viewed.is_(True), 1)))
+            ).where(
+                Wish.room_id.isnot(None), Wish.user_id.isnot(None)
+            ).group_by(Wish.room_id, Wish.user_id)
+        ))
+        member_rows = session.query(MemberCounter).count()
+        session.commit()
+        cache.clear()
+        logger.info("Пересчитаны счетчики: исправлено комнат %s", fixed_rooms)
+        return {'rooms': fixed_rooms, 'members': member_rows, 'memberships': memberships}
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
 def add_user(
     telegram_id: int,
     username: str,
@@ -157,13 +525,21 @@ def add_user(
         user = session.query(User).filter(User.telegram_id == telegram_id).first()
         
         if user:
+            # Имя автора входит в подборки желаний - сбрасываем их
+            if user.username != username:
+                room_ids = select(Wish.room_id).where(Wish.user_id == user.id)
+                session.query(WishDigest).filter(
+                    WishDigest.room_id.in_(room_ids)
+                ).delete(synchronize_session=False)
+            
             # Обновляем информацию о пользователе
             user.username = username
             user.first_name = first_name
             user.last_name = last_name
             session.commit()
-            logger.info(
-                f"Пользователь {telegram_id} обновлен"
+            cache.invalidate(('user', telegram_id))
+            logger.debug(
+                "Пользователь %s обновлен", telegram_id
             )
         else:
             # Создаем нового пользователя
@@ -176,13 +552,13 @@ def add_user(
             session.add(user)
             session.commit()
             logger.info(
-                f"Пользователь {telegram_id} добавлен"
+                "Пользователь %s добавлен", telegram_id
             )
         
         return True
     except Exception as e:
         logger.error(
-            f"Ошибка при работе с пользователем: {e}"
+            "Ошибка при работе с пользователем: %s", e
         )
         session.rollback()
         return False
@@ -190,72 +566,118 @@ def add_user(
         session.close()
 
 
-def generate_room_code() -> str:
-    """Генерирует уникальный код комнаты"""
-    session = Session()
+@db_metrics.instrument
+def reserve_room_codes(count: int) -> range:
+    """
+    Резервирует в базе блок номеров для кодов комнат. Резерв фиксируется
+    на отдельном соединении: номера уже выданы распределителю и не должны
+    вернуться, если транзакция вызывающей функции откатится
+    """
+    session = independent_session()
     try:
         while True:
-            # Генерируем случайный код из 6 символов
-            code = ''.join(
-                random.choices(string.ascii_uppercase + string.digits, k=6)
-            )
-            # Проверяем, не существует ли уже комната с таким кодом
-            existing_room = session.query(Room).filter(
-                Room.code == code
-            ).first()
-            if not existing_room:
-                return code
+            end = session.execute(
+                update(RoomCodeSequence)
+                .where(RoomCodeSequence.id == 1)
+                .values(next_value=RoomCodeSequence.next_value + count)
+                .returning(RoomCodeSequence.next_value)
+            ).scalar()
+            if end is None:
+                session.add(RoomCodeSequence(id=1, next_value=count))
+                end = count
+            try:
+                session.commit()
+                break
+            except IntegrityError:
+                # Счетчик одновременно создал другой процесс
+                session.rollback()
+        
+        if end > CODE_SPACE:
+            raise RuntimeError("Коды комнат закончились")
+        logger.info("Зарезервированы номера кодов комнат %s-%s", end - count, end - 1)
+        return range(end - count, end)
     finally:
         session.close()
 
 
-async def create_room(creator_id: int) -> Optional[int]:
+room_codes = RoomCodeAllocator(
+    reserve=reserve_room_codes,
+    secret=ROOM_CODE_SECRET,
+    block_size=ROOM_CODE_BLOCK_SIZE
+)
+
+# Сколько кодов пробовать, если код совпал с уже существующим
+ROOM_CODE_ATTEMPTS = 5
+
+
+@db_metrics.instrument
+def generate_room_code() -> str:
+    """Генерирует уникальный код комнаты"""
+    return room_codes.next_code()
+
+
+@db_metrics.instrument
+def create_room(creator_id: int) -> Optional[int]:
     """Создает новую комнату и возвращает её ID"""
+    # Проверяем, есть ли у пользователя уже созданная комната
+    if user_has_room(creator_id):
+        logger.warning("Пользователь %s попытался создать вторую комнату", creator_id)
+        return None
+    
     session = Session()
     try:
-        # Проверяем, есть ли у пользователя уже созданная комната
-        if user_has_room(creator_id):
-            logger.warning(f"Пользователь {creator_id} попытался создать вторую комнату")
-            return None
-            
         # Сначала проверяем/создаем пользователя
         user = session.query(User).filter(User.telegram_id == creator_id).first()
         if not user:
             user = User(telegram_id=creator_id)
             session.add(user)
             session.commit()
-            logger.info(f"Создан новый пользователь: {creator_id}")
-        
-        # Генерируем уникальный код комнаты
-        room_code = generate_room_code()
-        logger.info(f"Сгенерирован код комнаты: {room_code}")
-        
-        # Создаем новую комнату
-        new_room = Room(
-            code=room_code,
-            creator_id=user.id,
-            is_active=True,
-            max_participants=5,  # Бесплатная версия
-        )
-        session.add(new_room)
-        session.commit()
+            logger.info("Создан новый пользователь: %s", creator_id)
+        
+        # Создаем новую комнату. Уникальность кода гарантирует индекс:
+        # при совпадении со старым кодом берем следующий
+        for _ in range(ROOM_CODE_ATTEMPTS):
+            room_code = generate_room_code()
+            logger.debug("Сгенерирован код комнаты: %s", room_code)
+            
+            new_room = Room(
+                code=room_code,
+                creator_id=user.id,
+                is_active=True,
+                max_participants=5,  # Бесплатная версия
+            )
+            session.add(new_room)
+            try:
+                session.commit()
+                break
+            except IntegrityError:
+                session.rollback()
+                logger.warning("Код комнаты %s уже занят", room_code)
+        else:
+            logger.error("Не удалось подобрать свободный код комнаты")
+            return None
         
-        # Привязываем пользователя к комнате
-        user.room_id = new_room.id
+        # Создатель - первый участник комнаты
+        add_member(session, user.id, new_room.id)
+        previous_room_id = set_current_room(session, user, new_room.id)
         session.commit()
+        cache.invalidate(
+            ('user', creator_id), ('room', previous_room_id), ('room', new_room.id)
+        )
         
-        logger.info(f"Создана новая комната {new_room.id} для пользователя {creator_id}")
+        logger.info("Создана новая комната %s для пользователя %s", new_room.id, creator_id)
         return new_room.id
         
     except Exception as e:
-        logger.error(f"Ошибка при создании комнаты: {str(e)}")
+        logger.error("Ошибка при создании комнаты: %s", e)
         session.rollback()
         return None
     finally:
         session.close()
 
 
-async def update_room_version(room_id: int, version: str) -> bool:
+@db_metrics.instrument
+def update_room_version(room_id: int, version: str) -> bool:
     """Обновляет версию комнаты (free/pro)"""
     try:
         session = Session()
@@ -272,29 +694,31 @@ async def update_room_version(room_id: int, version: str) -> bool:
             
         session.commit()
         session.close()
+        cache.invalidate(('room', room_id))
         return True
     except Exception as e:
-        logger.error(f"Error updating room version: {e}")
+        logger.error("Error updating room version: %s", e)
         if session:
             session.rollback()
             session.close()
         return False
 
 
-async def get_user_rooms_count(user_id: int) -> int:
+@db_metrics.instrument
+def get_user_rooms_count(user_id: int) -> int:
     """Возвращает общее количество комнат пользователя (созданных и присоединенных)"""
     try:
         session = Session()
         # Находим пользователя в БД
         user = session.query(User).filter(User.telegram_id == user_id).first()
         if not user:
-            logger.error(f"Пользователь с ID {user_id} не найден в БД")
+            logger.error("Пользователь с ID %s не найден в БД", user_id)
             session.close()
             return 0
             
         # Считаем комнаты, созданные пользователем
         created_rooms = session.query(Room).filter(Room.creator_id == user.id).count()
-        logger.info(f"Пользователь {user_id} создал {created_rooms} комнат")
+        logger.debug("Пользователь %s создал %s комнат", user_id, created_rooms)
         
         # Проверяем, присоединился ли пользователь к какой-то комнате
         joined_rooms = 0
@@ -303,20 +727,21 @@ async def get_user_rooms_count(user_id: int) -> int:
             room = session.query(Room).filter(Room.id == user.room_id).first()
             if room and room.creator_id != user.id:
                 joined_rooms = 1
-                logger.info(f"Пользователь {user_id} присоединился к комнате {user.room_id}")
+                logger.debug("Пользователь %s присоединился к комнате %s", user_id, user.room_id)
         
         total_rooms = created_rooms + joined_rooms
-        logger.info(f"Всего комнат у пользователя {user_id}: {total_rooms}")
+        logger.debug("Всего комнат у пользователя %s: %s", user_id, total_rooms)
         
         session.close()
         return total_rooms
     except Exception as e:
-        logger.error(f"Ошибка при подсчете комнат пользователя {user_id}: {e}")
+        logger.error("Ошибка при подсчете комнат пользователя %s: %s", user_id, e)
         if session:
             session.close()
         return 0
 
 
+@db_metrics.instrument
 def add_user_to_room(room_id: int, user_id: int) -> bool:
     """Добавляет пользователя в комнату"""
     session = Session()
@@ -324,19 +749,18 @@ def add_user_to_room(room_id: int, user_id: int) -> bool:
         # Проверяем существование пользователя
         user = session.query(User).filter(User.telegram_id == user_id).first()
         if not user:
-            logger.error(f"Пользователь {user_id} не найден")
+            logger.error("Пользователь %s не найден", user_id)
             return False
         
         # Проверяем существование комнаты
         room = session.query(Room).filter(Room.id == room_id).first()
         if not room:
-            logger.error(f"Комната {room_id} не найдена")
+            logger.error("Комната %s не найдена", room_id)
             return False
         
         # Проверяем количество пользователей в комнате
-        users_count = session.query(User).filter(User.room_id == room_id).count()
-        if users_count >= room.max_participants:
-            logger.error(f"Достигнут лимит пользователей в комнате {room_id}")
+        if room.member_count >= room.max_participants:
+            logger.error("Достигнут лимит пользователей в комнате %s", room_id)
             return False
         
         # Проверяем, сколько комнат у пользователя
@@ -346,31 +770,36 @@ def add_user_to_room(room_id: int, user_id: int) -> bool:
         ).count()
         
         if user_rooms_count >= 3:
-            logger.error(f"Пользователь {user_id} уже состоит в 3 комнатах")
+            logger.error("Пользователь %s уже состоит в 3 комнатах", user_id)
             return False
         
         # Добавляем пользователя в комнату
-        user.room_id = room_id
+        add_member(session, user.id, room_id)
+        set_current_room(session, user, room_id)
         session.commit()
-        logger.info(f"Пользователь {user_id} успешно добавлен в комнату {room_id}")
+        cache.invalidate(('user', user_id), ('room', room_id))
+        logger.info("Пользователь %s успешно добавлен в комнату %s", user_id, room_id)
         return True
     except Exception as e:
-        logger.error(f"Ошибка при добавлении пользователя в комнату: {str(e)}")
+        logger.error("Ошибка при добавлении пользователя в комнату: %s", e)
         session.rollback()
         return False
     finally:
         session.close()
 
 
+@db_metrics.instrument
+@cached(cache, lambda count, room_id: [('room', room_id)])
 def count_users_in_room(room_id: int) -> int:
     """Подсчитывает количество пользователей в комнате"""
     session = Session()
     try:
-        return session.query(User).filter(User.room_id == room_id).count()
+        return session.query(Room.member_count).filter(Room.id == room_id).scalar() or 0
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def add_wish(room_id: int, user_id: int, wish_text: str) -> Tuple[bool, str]:
     """
     Добавляет желание в комнату
@@ -398,18 +827,21 @@ def add_wish(room_id: int, user_id: int, wish_text: str) -> Tuple[bool, str]:
         )
         
         session.add(wish)
+        update_wish_counters(session, room_id, user.id, wishes=1)
+        invalidate_room_digests(session, room_id)
         session.commit()
         
         return True, "Желание успешно добавлено"
         
     except Exception as e:
         session.rollback()
-        logger.error(f"Ошибка при добавлении желания: {e}")
+        logger.error("Ошибка при добавлении желания: %s", e)
         return False, "Произошла ошибка при добавлении желания"
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def update_wish(wish_id: int, new_text: str) -> bool:
     """Обновляет текст желания"""
     session = Session()
@@ -419,6 +851,7 @@ def update_wish(wish_id: int, new_text: str) -> bool:
             return False
         
         wish.text = new_text
+        invalidate_room_digests(session, wish.room_id)
         session.commit()
         return True
     except Exception:
@@ -428,6 +861,7 @@ def update_wish(wish_id: int, new_text: str) -> bool:
         session.close()
 
 
+@db_metrics.instrument
 def get_wish(wish_id: int) -> Optional[Dict[str, Any]]:
     """Получает желание по ID"""
     session = Session()
@@ -444,12 +878,13 @@ def get_wish(wish_id: int) -> Optional[Dict[str, Any]]:
             'created_at': wish.created_at
         }
     except Exception as e:
-        logger.error(f"Ошибка при получении желания {wish_id}: {e}")
+        logger.error("Ошибка при получении желания %s: %s", wish_id, e)
         return None
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def delete_wish(wish_id: int, user_id: int) -> bool:
     """Удаляет желание"""
     session = Session()
@@ -462,6 +897,11 @@ def delete_wish(wish_id: int, user_id: int) -> bool:
             return False
         
         session.delete(wish)
+        update_wish_counters(
+            session, wish.room_id, wish.user_id,
+            wishes=-1, viewed=-1 if wish.is_viewed else 0
+        )
+        invalidate_room_digests(session, wish.room_id)
         session.commit()
         return True
     except Exception:
@@ -471,6 +911,7 @@ def delete_wish(wish_id: int, user_id: int) -> bool:
         session.close()
 
 
+@db_metrics.instrument
 def get_user_wishes(user_id: int, room_id: Optional[int] = None) -> List[Dict[str, Any]]:
     """Получает список желаний пользователя в указанной комнате или все желания"""
     session = Session()
@@ -478,7 +919,7 @@ def get_user_wishes(user_id: int, room_id: Optional[int] = None) -> List[Dict[st
         # Сначала получаем пользователя по telegram_id
         user = session.query(User).filter(User.telegram_id == user_id).first()
         if not user:
-            logger.error(f"Пользователь с telegram_id {user_id} не найден")
+            logger.error("Пользователь с telegram_id %s не найден", user_id)
             return []
             
         # Теперь ищем желания по user_id
@@ -499,128 +940,222 @@ def get_user_wishes(user_id: int, room_id: Optional[int] = None) -> List[Dict[st
             for wish in wishes
         ]
     except Exception as e:
-        logger.error(f"Ошибка при получении желаний пользователя: {e}")
+        logger.error("Ошибка при получении желаний пользователя: %s", e)
         return []
     finally:
         session.close()
 
 
-def get_all_rooms(telegram_id: int) -> list:
-    """Получает список всех комнат пользователя с детальной информацией"""
+def _keyset_page(query, key, after: Optional[int], before: Optional[int], limit: int) -> Dict[str, Any]:
+    """
+    Страница строк query по возрастанию key: сразу после after или сразу
+    перед before. Читается не более limit + 1 строк, поэтому стоимость
+    страницы не зависит от ее номера.
+
+    query должен фиксировать равенством ведущие столбцы индекса, который
+    заканчивается на key (без OR и IN): тогда условие на key - развернутая
+    форма сравнения (..., key) > (..., after), и страница читается одним
+    проходом по диапазону индекса.
+
+    Returns:
+        Dict[str, Any]: rows, а также prev и next - курсоры для before и
+        after соседних страниц (None, если страницы нет)
+    """
+    if before is not None:
+        rows = query.filter(key < before).order_by(key.desc()).limit(limit + 1).all()
+        has_prev, has_next = len(rows) > limit, True
+        rows = rows[:limit][::-1]
+    else:
+        if after is not None:
+            query = query.filter(key > after)
+        rows = query.order_by(key).limit(limit + 1).all()
+        has_prev, has_next = after is not None, len(rows) > limit
+        rows = rows[:limit]
+    return {
+        'rows': rows,
+        'prev': rows[0].id if rows and has_prev else None,
+        'next': rows[-1].id if rows and has_next else None,
+    }
+
+
+@db_metrics.instrument
+def get_wishes_page(
+    telegram_id: int,
+    room_id: int,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    limit: int = WISHES_PAGE_SIZE
+) -> Dict[str, Any]:
+    """
+    Страница желаний пользователя в комнате в порядке добавления.
+
+    Args:
+        telegram_id: Telegram ID пользователя
+        room_id: ID комнаты
+        after: ID желания, после которого начинается страница
+        before: ID желания, перед которым заканчивается страница
+        limit: Желаний на странице
+
+    Returns:
+        Dict[str, Any]: items - желания, prev и next - курсоры соседних страниц
+    """
+    session = Session()
+    try:
+        user_id = select(User.id).where(User.telegram_id == telegram_id).scalar_subquery()
+        # Диапазон индекса (user_id, room_id, id)
+        query = session.query(Wish).filter(Wish.user_id == user_id, Wish.room_id == room_id)
+        page = _keyset_page(query, Wish.id, after, before, limit)
+        return {
+            'items': [
+                {
+                    'id': wish.id,
+                    'text': wish.text,
+                    'is_viewed': wish.is_viewed,
+                    'room_id': wish.room_id
+                }
+                for wish in page['rows']
+            ],
+            'prev': page['prev'],
+            'next': page['next'],
+        }
+    except Exception as e:
+        logger.error("Ошибка при получении страницы желаний: %s", e)
+        return {'items': [], 'prev': None, 'next': None}
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def get_all_rooms(telegram_id: int, with_participants: bool = False) -> list:
+    """
+    Получает список всех комнат пользователя: созданные и те, к которым он
+    присоединился (текущая комната всегда среди них).
+    
+    Комнаты вместе со счетчиком участников читаются одним запросом,
+    независимо от количества комнат.
+    
+    Args:
+        telegram_id: Telegram ID пользователя
+        with_participants: Загрузить также список участников каждой комнаты
+            (одним дополнительным запросом)
+    """
     session = Session()
     try:
         # Находим пользователя
-        user = session.query(User).filter(User.telegram_id == telegram_id).first()
+        user = session.query(User.id, User.room_id).filter(User.telegram_id == telegram_id).first()
         if not user:
-            logger.error(f"Пользователь {telegram_id} не найден")
+            logger.error("Пользователь %s не найден", telegram_id)
             return []
         
-        all_rooms = []
-        
-        # 1. Получаем комнаты, где пользователь является создателем
-        created_rooms = session.query(Room).filter(Room.creator_id == user.id).all()
-        logger.info(f"Найдено созданных комнат: {len(created_rooms)}")
-        
-        for room in created_rooms:
-            # Получаем список участников комнаты
-            participants = session.query(User).filter(User.room_id == room.id).all()
-            participants_info = [
-                {
-                    'telegram_id': p.telegram_id,
-                    'username': p.username,
-                    'first_name': p.first_name,
-                    'last_name': p.last_name
-                } for p in participants
-            ]
-            
-            all_rooms.append({
-                'id': room.id,
-                'code': room.code,
-                'name': f"Комната {room.code}",
-                'is_creator': True,
-                'is_active': room.is_active,
-                'is_paid': room.is_paid,
-                'max_participants': room.max_participants,
-                'current_users': len(participants),
-                'participants': participants_info,
-                'created_at': room.created_at.isoformat() if room.created_at else None,
-                'is_current': user.room_id == room.id
-            })
-        
-        # 2. Получаем комнаты, к которым пользователь присоединился
-        joined_rooms = session.query(Room).join(
-            user_room_association, user_room_association.c.room_id == Room.id
-        ).filter(
-            user_room_association.c.user_id == user.id,
-            Room.creator_id != user.id
-        ).all()
+        # Сначала созданные комнаты, затем присоединенные
+        kind = case((Room.creator_id == user.id, 0), else_=1)
+        rooms = _user_rooms_query(session, user).order_by(kind, Room.id).all()
         
-        logger.info(f"Найдено присоединенных комнат: {len(joined_rooms)}")
+        all_rooms = [_room_list_item(room, user) for room in rooms]
         
-        for joined_room in joined_rooms:
-            # Получаем список участников комнаты
-            participants = session.query(User).filter(User.room_id == joined_room.id).all()
-            participants_info = [
-                {
-                    'telegram_id': p.telegram_id,
-                    'username': p.username,
-                    'first_name': p.first_name,
-                    'last_name': p.last_name
-                } for p in participants
-            ]
-            
-            all_rooms.append({
-                'id': joined_room.id,
-                'code': joined_room.code,
-                'name': f"Комната {joined_room.code}",
-                'is_creator': False,
-                'is_active': joined_room.is_active,
-                'is_paid': joined_room.is_paid,
-                'max_participants': joined_room.max_participants,
-                'current_users': len(participants),
-                'participants': participants_info,
-                'created_at': joined_room.created_at.isoformat() if joined_room.created_at else None,
-                'is_current': user.room_id == joined_room.id
-            })
+        if with_participants and all_rooms:
+            participants = _load_participants(session, [room['id'] for room in all_rooms])
+            for room in all_rooms:
+                room['participants'] = participants.get(room['id'], [])
         
-        # 3. Если у пользователя есть текущая комната, но она не в списке, добавляем её
-        if user.room_id:
-            current_room = session.query(Room).filter(Room.id == user.room_id).first()
-            if current_room and not any(room['id'] == current_room.id for room in all_rooms):
-                participants = session.query(User).filter(User.room_id == current_room.id).all()
-                participants_info = [
-                    {
-                        'telegram_id': p.telegram_id,
-                        'username': p.username,
-                        'first_name': p.first_name,
-                        'last_name': p.last_name
-                    } for p in participants
-                ]
-                
-                all_rooms.append({
-                    'id': current_room.id,
-                    'code': current_room.code,
-                    'name': f"Комната {current_room.code}",
-                    'is_creator': current_room.creator_id == user.id,
-                    'is_active': current_room.is_active,
-                    'is_paid': current_room.is_paid,
-                    'max_participants': current_room.max_participants,
-                    'current_users': len(participants),
-                    'participants': participants_info,
-                    'created_at': current_room.created_at.isoformat() if current_room.created_at else None,
-                    'is_current': True
-                })
-        
-        logger.info(f"Всего найдено комнат пользователя: {len(all_rooms)}")
+        logger.debug("Всего найдено комнат пользователя: %s", len(all_rooms))
         return all_rooms
         
     except Exception as e:
-        logger.error(f"Ошибка при получении списка комнат: {str(e)}")
+        logger.error("Ошибка при получении списка комнат: %s", e)
         return []
     finally:
         session.close()
 
 
+def _user_rooms_query(session, user):
+    """Комнаты пользователя по первичному ключу (user_id, room_id)
+    user_room_association: создатель и текущая комната тоже записаны там"""
+    return session.query(Room).join(
+        user_room_association, user_room_association.c.room_id == Room.id
+    ).filter(user_room_association.c.user_id == user.id)
+
+
+def _room_list_item(room: Room, user) -> Dict[str, Any]:
+    """Комната в списке комнат пользователя"""
+    return {
+        'id': room.id,
+        'code': room.code,
+        'name': f"Комната {room.code}",
+        'is_creator': room.creator_id == user.id,
+        'is_active': room.is_active,
+        'is_paid': room.is_paid,
+        'max_participants': room.max_participants,
+        'current_users': room.member_count,
+        'created_at': room.created_at.isoformat() if room.created_at else None,
+        'is_current': user.room_id == room.id
+    }
+
+
+@db_metrics.instrument
+def get_rooms_page(
+    telegram_id: int,
+    after: Optional[int] = None,
+    before: Optional[int] = None,
+    limit: int = ROOMS_PAGE_SIZE
+) -> Dict[str, Any]:
+    """
+    Страница комнат пользователя (как в get_all_rooms) в порядке ID.
+
+    Каждая страница читается запросом по диапазону первичного ключа
+    (user_id, room_id) user_room_association, независимо от числа комнат
+    и номера страницы.
+
+    Args:
+        telegram_id: Telegram ID пользователя
+        after: ID комнаты, после которой начинается страница
+        before: ID комнаты, перед которой заканчивается страница
+        limit: Комнат на странице
+
+    Returns:
+        Dict[str, Any]: items - комнаты, prev и next - курсоры соседних страниц
+    """
+    session = Session()
+    try:
+        user = session.query(User.id, User.room_id).filter(User.telegram_id == telegram_id).first()
+        if not user:
+            logger.error("Пользователь %s не найден", telegram_id)
+            return {'items': [], 'prev': None, 'next': None}
+        
+        query = _user_rooms_query(session, user)
+        page = _keyset_page(query, user_room_association.c.room_id, after, before, limit)
+        return {
+            'items': [_room_list_item(room, user) for room in page['rows']],
+            'prev': page['prev'],
+            'next': page['next'],
+        }
+    except Exception as e:
+        logger.error("Ошибка при получении страницы комнат: %s", e)
+        return {'items': [], 'prev': None, 'next': None}
+    finally:
+        session.close()
+
+
+def _load_participants(session, room_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Загружает участников нескольких комнат одним запросом: ID комнаты -> участники"""
+    participants: Dict[int, List[Dict[str, Any]]] = {}
+    rows = session.query(
+        user_room_association.c.room_id, User.telegram_id, User.username,
+        User.first_name, User.last_name
+    ).join(
+        user_room_association, user_room_association.c.user_id == User.id
+    ).filter(user_room_association.c.room_id.in_(room_ids)).order_by(User.id)
+    for row in rows:
+        participants.setdefault(row.room_id, []).append({
+            'telegram_id': row.telegram_id,
+            'username': row.username,
+            'first_name': row.first_name,
+            'last_name': row.last_name
+        })
+    return participants
+
+
+@db_metrics.instrument
 def count_user_rooms(telegram_id: int) -> int:
     """Подсчитывает количество комнат, созданных пользователем"""
     session = Session()
@@ -633,6 +1168,8 @@ def count_user_rooms(telegram_id: int) -> int:
         session.close()
 
 
+@db_metrics.instrument
+@cached(cache, lambda room, room_id: [('room', room_id)])
 def get_room_by_id(room_id: int) -> Optional[Dict[str, Any]]:
     """Получает информацию о комнате по ID"""
     session = Session()
@@ -654,6 +1191,7 @@ def get_room_by_id(room_id: int) -> Optional[Dict[str, Any]]:
         session.close()
 
 
+@db_metrics.instrument
 def switch_to_room(telegram_id: int, room_id: int) -> bool:
     """Переключает пользователя на указанную комнату"""
     session = Session()
@@ -661,35 +1199,37 @@ def switch_to_room(telegram_id: int, room_id: int) -> bool:
         # Проверяем существование пользователя
         user = session.query(User).filter(User.telegram_id == telegram_id).first()
         if not user:
-            logger.error(f"Пользователь {telegram_id} не найден")
+            logger.error("Пользователь %s не найден", telegram_id)
             return False
             
         # Проверяем существование комнаты
         room = session.query(Room).filter(Room.id == room_id).first()
         if not room:
-            logger.error(f"Комната {room_id} не найдена")
+            logger.error("Комната %s не найдена", room_id)
             return False
             
         # Проверяем, является ли пользователь создателем комнаты
         if room.creator_id != user.id:
             logger.error(
-                f"Пользователь {telegram_id} не является создателем комнаты {room_id}"
+                "Пользователь %s не является создателем комнаты %s", telegram_id, room_id
             )
             return False
             
         # Переключаем пользователя на комнату
-        user.room_id = room_id
+        previous_room_id = set_current_room(session, user, room_id)
         session.commit()
-        logger.info(f"Пользователь {telegram_id} переключен на комнату {room_id}")
+        cache.invalidate(('user', telegram_id), ('room', previous_room_id), ('room', room_id))
+        logger.info("Пользователь %s переключен на комнату %s", telegram_id, room_id)
         return True
     except Exception as e:
-        logger.error(f"Ошибка при переключении на комнату: {str(e)}")
+        logger.error("Ошибка при переключении на комнату: %s", e)
         session.rollback()
         return False
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def get_room_wishes(room_id: int) -> list:
     """Получает все желания в комнате"""
     session = Session()
@@ -709,12 +1249,13 @@ def get_room_wishes(room_id: int) -> list:
             for wish in wishes
         ]
     except Exception as e:
-        logger.error(f"Ошибка при получении желаний комнаты: {e}")
+        logger.error("Ошибка при получении желаний комнаты: %s", e)
         return []
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def grant_access(user_id: int, access_type: str) -> bool:
     """Предоставляет доступ к PRO версии"""
     session = Session()
@@ -725,6 +1266,7 @@ def grant_access(user_id: int, access_type: str) -> bool:
         
         room.is_paid = True
         session.commit()
+        cache.invalidate(('room', room.id))
         return True
     except Exception:
         session.rollback()
@@ -733,6 +1275,7 @@ def grant_access(user_id: int, access_type: str) -> bool:
         session.close()
 
 
+@db_metrics.instrument
 def user_has_room(user_id: int) -> bool:
     """Проверяет, есть ли у пользователя комната"""
     session = Session()
@@ -743,6 +1286,8 @@ def user_has_room(user_id: int) -> bool:
         session.close()
 
 
+@db_metrics.instrument
+@cached(cache, lambda room, room_identifier: [('room', room['id'])])
 def get_room_details(room_identifier: Union[str, int]) -> Optional[Dict[str, Any]]:
     """Получает детали комнаты по её ID или коду"""
     session = Session()
@@ -750,7 +1295,7 @@ def get_room_details(room_identifier: Union[str, int]) -> Optional[Dict[str, Any
         # Пытаемся найти комнату по коду, если идентификатор - строка
         if isinstance(room_identifier, str):
             room = session.query(Room).filter(
-                Room.code == room_identifier
+                Room.code == normalize_room_code(room_identifier)
             ).first()
         # Иначе ищем по ID
         else:
@@ -774,22 +1319,19 @@ def get_room_details(room_identifier: Union[str, int]) -> Optional[Dict[str, Any
             'is_paid': room.is_paid
         }
     except Exception as e:
-        logger.error(f"Ошибка при получении деталей комнаты: {e}")
+        logger.error("Ошибка при получении деталей комнаты: %s", e)
         return None
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def room_exists(room_id: int) -> bool:
     """Проверяет существование комнаты"""
-    session = Session()
-    try:
-        room = session.query(Room).filter(Room.id == room_id).first()
-        return room is not None
-    finally:
-        session.close()
+    return get_room_by_id(room_id) is not None
 
 
+@db_metrics.instrument
 def mark_wish_as_viewed(wish_id: int) -> bool:
     """Отмечает желание как просмотренное"""
     session = Session()
@@ -798,7 +1340,9 @@ def mark_wish_as_viewed(wish_id: int) -> bool:
         if not wish:
             return False
         
-        wish.is_viewed = True
+        if not wish.is_viewed:
+            wish.is_viewed = True
+            update_wish_counters(session, wish.room_id, wish.user_id, viewed=1)
         session.commit()
         return True
     except Exception:
@@ -808,6 +1352,7 @@ def mark_wish_as_viewed(wish_id: int) -> bool:
         session.close()
 
 
+@db_metrics.instrument
 def get_all_active_rooms() -> list:
     """Получает список всех активных комнат"""
     session = Session()
@@ -828,6 +1373,8 @@ def get_all_active_rooms() -> list:
         session.close()
 
 
+@db_metrics.instrument
+@cached(cache, lambda room, user_id: [('user', user_id), ('room', room['room_id'])])
 def get_user_room(user_id: int) -> dict:
     """Получить информацию о комнате пользователя"""
     session = Session()
@@ -854,6 +1401,7 @@ def get_user_room(user_id: int) -> dict:
         session.close()
 
 
+@db_metrics.instrument
 def count_user_wishes(user_id: int, room_id: Optional[int] = None) -> int:
     """Подсчитать количество желаний пользователя в указанной комнате или общее количество желаний"""
     session = Session()
@@ -869,69 +1417,52 @@ def count_user_wishes(user_id: int, room_id: Optional[int] = None) -> int:
         session.close()
 
 
+@db_metrics.instrument
 def get_room_id_by_code(code: str) -> int:
     """Получает ID комнаты по её коду"""
     session = Session()
     try:
-        # Преобразуем код в верхний регистр для поиска
-        code = code.upper()
-        logger.info(f"Поиск комнаты с кодом {code}")
-        
-        # Проверяем все существующие коды комнат для отладки
-        all_codes = session.query(Room.code).all()
-        code_list = [c[0] for c in all_codes]
-        logger.info(f"Существующие коды комнат: {code_list}")
+        code = normalize_room_code(code)
         
-        # Ищем комнату по коду (без учета регистра)
-        room = session.query(Room).filter(
+        # Точечный запрос по уникальному индексу rooms.code
+        room_id = session.query(Room.id).filter(
             Room.code == code
-        ).first()
+        ).scalar()
         
-        if not room:
-            logger.error(f"Комната с кодом {code} не найдена")
+        if not room_id:
+            logger.debug("Комната с кодом %s не найдена", code)
             return 0
             
-        logger.info(f"Найдена комната с ID {room.id}")
-        return room.id
+        logger.debug("Найдена комната с ID %s", room_id)
+        return room_id
     except Exception as e:
         logger.error(
-            f"Ошибка при получении ID комнаты по коду: {e}"
+            "Ошибка при получении ID комнаты по коду: %s", e
         )
         return 0
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def get_room_by_code(code: str) -> Optional[Dict[str, Any]]:
     """Поиск комнаты по коду с дополнительной информацией"""
     session = Session()
     try:
-        # Преобразуем код в верхний регистр для поиска
-        code = code.upper().strip()
-        logger.info(f"Поиск комнаты с кодом {code}")
-        
-        # Проверяем все существующие коды комнат для отладки
-        all_rooms = session.query(Room).all()
-        code_list = [room.code for room in all_rooms]
-        logger.info(f"Существующие коды комнат: {code_list}")
+        code = normalize_room_code(code)
         
-        # Ищем комнату по коду (без учета регистра)
+        # Точечный запрос по уникальному индексу rooms.code
         room = session.query(Room).filter(
-            func.upper(Room.code) == code
+            Room.code == code
         ).first()
         
         if not room:
-            logger.info(f"Комната с кодом {code} не найдена")
+            logger.debug("Комната с кодом %s не найдена", code)
             return None
             
-        logger.info(f"Найдена комната: id={room.id}, code={room.code}, creator_id={room.creator_id}")
+        logger.debug("Найдена комната: id=%s, code=%s, creator_id=%s", room.id, room.code, room.creator_id)
             
-        # Получаем дополнительную информацию о комнате
-        users_count = session.query(User).filter(
-            User.room_id == room.id
-        ).count()
-        
-        logger.info(f"Количество пользователей в комнате: {users_count}")
+        logger.debug("Количество пользователей в комнате: %s", room.member_count)
         
         return {
             'id': room.id,
@@ -939,16 +1470,17 @@ def get_room_by_code(code: str) -> Optional[Dict[str, Any]]:
             'creator_id': room.creator_id,
             'is_paid': room.is_paid,
             'max_participants': room.max_participants,
-            'current_participants': users_count,
+            'current_participants': room.member_count,
             'is_active': room.is_active
         }
     except Exception as e:
-        logger.error(f"Ошибка при поиске комнаты: {e}")
+        logger.error("Ошибка при поиске комнаты: %s", e)
         return None
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def switch_room(user_id: int, room_id: int) -> bool:
     """Переключает текущую комнату пользователя"""
     session = Session()
@@ -956,13 +1488,13 @@ def switch_room(user_id: int, room_id: int) -> bool:
         # Находим пользователя
         user = session.query(User).filter(User.telegram_id == user_id).first()
         if not user:
-            logger.error(f"Пользователь {user_id} не найден")
+            logger.error("Пользователь %s не найден", user_id)
             return False
             
         # Находим комнату
         room = session.query(Room).filter(Room.id == room_id).first()
         if not room:
-            logger.error(f"Комната {room_id} не найдена")
+            logger.error("Комната %s не найдена", room_id)
             return False
             
         # Проверяем, является ли пользователь создателем комнаты или участником
@@ -973,44 +1505,47 @@ def switch_room(user_id: int, room_id: int) -> bool:
         ).first() is not None
         
         if not (is_creator or is_participant):
-            logger.error(f"Пользователь {user_id} не имеет доступа к комнате {room_id}")
+            logger.error("Пользователь %s не имеет доступа к комнате %s", user_id, room_id)
             return False
             
         # Обновляем текущую комнату пользователя
-        user.room_id = room_id
+        previous_room_id = set_current_room(session, user, room_id)
         session.commit()
+        cache.invalidate(('user', user_id), ('room', previous_room_id), ('room', room_id))
         
-        logger.info(f"Пользователь {user_id} переключился на комнату {room_id}")
+        logger.info("Пользователь %s переключился на комнату %s", user_id, room_id)
         return True
         
     except Exception as e:
-        logger.error(f"Ошибка при переключении комнаты: {str(e)}")
+        logger.error("Ошибка при переключении комнаты: %s", e)
         return False
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def update_room_activity(room_id: int) -> bool:
     """Обновляет время последней активности комнаты"""
     session = Session()
     try:
         room = session.query(Room).filter(Room.id == room_id).first()
         if not room:
-            logger.error(f"Комната {room_id} не найдена")
+            logger.error("Комната %s не найдена", room_id)
             return False
             
         room.last_activity = datetime.utcnow()
         session.commit()
-        logger.info(f"Обновлено время активности комнаты {room_id}")
+        logger.debug("Обновлено время активности комнаты %s", room_id)
         return True
     except Exception as e:
-        logger.error(f"Ошибка при обновлении активности комнаты: {e}")
+        logger.error("Ошибка при обновлении активности комнаты: %s", e)
         session.rollback()
         return False
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def get_room_statistics(room_id: int) -> Optional[Dict[str, Any]]:
     """Получает статистику комнаты"""
     session = Session()
@@ -1019,40 +1554,25 @@ def get_room_statistics(room_id: int) -> Optional[Dict[str, Any]]:
         if not room:
             return None
             
-        # Подсчитываем количество пользователей
-        users_count = session.query(User).filter(
-            User.room_id == room_id
-        ).count()
-        
-        # Подсчитываем количество желаний
-        wishes_count = session.query(Wish).filter(
-            Wish.room_id == room_id
-        ).count()
-        
-        # Подсчитываем просмотренные желания
-        viewed_wishes = session.query(Wish).filter(
-            Wish.room_id == room_id,
-            Wish.is_viewed.is_(True)
-        ).count()
-        
         return {
             'id': room.id,
             'code': room.code,
             'is_paid': room.is_paid,
             'max_participants': room.max_participants,
-            'current_participants': users_count,
-            'total_wishes': wishes_count,
-            'viewed_wishes': viewed_wishes,
+            'current_participants': room.member_count,
+            'total_wishes': room.wish_count,
+            'viewed_wishes': room.viewed_wish_count,
             'last_activity': room.last_activity,
             'created_at': room.created_at
         }
     except Exception as e:
-        logger.error(f"Ошибка при получении статистики комнаты: {e}")
+        logger.error("Ошибка при получении статистики комнаты: %s", e)
         return None
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def check_room_limits(room_id: int, user_id: int) -> Tuple[bool, str]:
     """
     Проверяет лимиты комнаты для пользователя
@@ -1066,16 +1586,13 @@ def check_room_limits(room_id: int, user_id: int) -> Tuple[bool, str]:
         if not room:
             return True, "Комната не найдена"
 
-        # Подсчитываем количество пользователей в комнате
-        users_count = session.query(User).filter(
-            User.room_id == room_id
-        ).count()
+        users_count = room.member_count
 
-        # Подсчитываем количество желаний пользователя в комнате
-        wishes_count = session.query(Wish).filter(
-            Wish.room_id == room_id,
-            Wish.user_id == user_id
-        ).count()
+        # Количество желаний пользователя в комнате
+        wishes_count = session.query(MemberCounter.wish_count).filter(
+            MemberCounter.room_id == room_id,
+            MemberCounter.user_id == user_id
+        ).scalar() or 0
 
         # Определяем максимальное количество желаний
         max_wishes = PRO_MAX_WISHES if room.is_paid else FREE_MAX_WISHES
@@ -1090,12 +1607,13 @@ def check_room_limits(room_id: int, user_id: int) -> Tuple[bool, str]:
         return False, "Лимиты не превышены"
 
     except Exception as e:
-        logger.error(f"Ошибка при проверке лимитов комнаты: {e}")
+        logger.error("Ошибка при проверке лимитов комнаты: %s", e)
         return True, "Произошла ошибка при проверке лимитов"
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def can_join_room(room_id: int, user_id: int) -> Tuple[bool, str]:
     """
     Проверяет, может ли пользователь присоединиться к комнате.
@@ -1109,53 +1627,69 @@ def can_join_room(room_id: int, user_id: int) -> Tuple[bool, str]:
     """
     session = Session()
     try:
-        logger.info(f"Проверка возможности присоединения пользователя {user_id} к комнате {room_id}")
+        logger.debug("Проверка возможности присоединения пользователя %s к комнате %s", user_id, room_id)
         
         # Проверяем существование комнаты
         room = session.query(Room).filter(Room.id == room_id).first()
         if not room:
-            logger.info(f"Комната {room_id} не найдена")
+            logger.debug("Комната %s не найдена", room_id)
             return False, "Комната не найдена"
             
         if not room.is_active:
-            logger.info(f"Комната {room_id} неактивна")
+            logger.debug("Комната %s неактивна", room_id)
             return False, "Комната неактивна"
             
         # Получаем пользователя
         user = session.query(User).filter(User.telegram_id == user_id).first()
         if not user:
-            logger.info(f"Пользователь {user_id} не найден")
+            logger.debug("Пользователь %s не найден", user_id)
             return False, "Пользователь не найден"
             
         # Проверяем, не является ли пользователь создателем комнаты
         if room.creator_id == user.id:
-            logger.info(f"Пользователь {user_id} является создателем комнаты {room_id}")
+            logger.debug("Пользователь %s является создателем комнаты %s", user_id, room_id)
             return False, "Вы уже являетесь создателем этой комнаты"
             
         # Проверяем, не состоит ли пользователь уже в комнате
-        if user in room.users:
-            logger.info(f"Пользователь {user_id} уже состоит в комнате {room_id}")
+        if user.room_id == room.id:
+            logger.debug("Пользователь %s уже состоит в комнате %s", user_id, room_id)
             return False, "Вы уже состоите в этой комнате"
             
         # Проверяем количество участников
-        current_participants = len(room.users)
+        current_participants = room.member_count
         if current_participants >= room.max_participants:
-            logger.info(f"Комната {room_id} заполнена ({current_participants}/{room.max_participants})")
+            logger.debug("Комната %s заполнена (%s/%s)", room_id, current_participants, room.max_participants)
             return False, "Комната заполнена"
             
-        logger.info(f"Пользователь {user_id} может присоединиться к комнате {room_id}")
+        logger.debug("Пользователь %s может присоединиться к комнате %s", user_id, room_id)
         return True, "Можно присоединиться"
         
     except Exception as e:
-        logger.error(f"Ошибка при проверке возможности присоединения к комнате: {e}")
+        logger.error("Ошибка при проверке возможности присоединения к комнате: %s", e)
         return False, "Произошла ошибка при проверке возможности присоединения"
     finally:
         session.close()
 
 
+def begin_write(session) -> None:
+    """
+    Начинает пишущую транзакцию. В SQLite блокировка записи берется сразу
+    (BEGIN IMMEDIATE): иначе две транзакции, начавшие с чтения, не смогут
+    обе перейти к записи и одна получит "database is locked"
+    """
+    if session.get_bind().dialect.name == 'sqlite':
+        session.execute(text('BEGIN IMMEDIATE'))
+
+
+@db_metrics.instrument
 def join_room(room_id: int, user_id: int) -> Tuple[bool, str]:
     """
-    Присоединяет пользователя к комнате.
+    Присоединяет пользователя к комнате и делает её текущей.
+    
+    Место в комнате занимается условным UPDATE счетчика участников
+    (member_count < max_participants) в той же транзакции, что и запись
+    о членстве, поэтому одновременные присоединения не превышают лимит
+    комнаты. Места в других комнатах пользователя остаются за ним.
     
     Args:
         room_id: ID комнаты
@@ -1166,61 +1700,88 @@ def join_room(room_id: int, user_id: int) -> Tuple[bool, str]:
     """
     session = Session()
     try:
-        logger.info(f"Попытка присоединения пользователя {user_id} к комнате {room_id}")
+        logger.debug("Попытка присоединения пользователя %s к комнате %s", user_id, room_id)
+        begin_write(session)
         
         # Получаем пользователя по telegram_id
         user = session.query(User).filter(User.telegram_id == user_id).first()
         if not user:
-            logger.error(f"Пользователь с telegram_id {user_id} не найден")
+            logger.error("Пользователь с telegram_id %s не найден", user_id)
             return False, "Пользователь не найден"
-            
-        # Получаем комнату
-        room = session.query(Room).filter(Room.id == room_id).first()
-        if not room:
-            logger.error(f"Комната {room_id} не найдена")
-            return False, "Комната не найдена"
-            
-        # Проверяем возможность присоединения
-        can_join, message = can_join_room(room_id, user_id)
-        if not can_join:
-            logger.info(f"Невозможно присоединиться: {message}")
+        
+        is_member = exists().where(
+            user_room_association.c.user_id == user.id,
+            user_room_association.c.room_id == Room.id
+        )
+        
+        # Занимаем место: в PostgreSQL UPDATE блокирует строку комнаты, и
+        # параллельные присоединения проверяют условие по новому значению
+        joined = session.execute(
+            update(Room).where(
+                Room.id == room_id,
+                Room.is_active.is_(True),
+                Room.creator_id != user.id,
+                ~is_member,
+                Room.member_count < Room.max_participants
+            ).values(
+                member_count=Room.member_count + 1,
+                last_activity=datetime.utcnow()
+            ),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        
+        if not joined:
+            session.rollback()
+            room = session.query(Room).filter(Room.id == room_id).first()
+            if not room:
+                message = "Комната не найдена"
+            elif not room.is_active:
+                message = "Комната неактивна"
+            elif session.query(user_room_association).filter(
+                user_room_association.c.user_id == user.id,
+                user_room_association.c.room_id == room_id
+            ).first():
+                message = "Вы уже состоите в этой комнате"
+            elif room.creator_id == user.id:
+                message = "Вы уже являетесь создателем этой комнаты"
+            else:
+                message = "Комната заполнена"
+            logger.debug("Невозможно присоединиться к комнате %s: %s", room_id, message)
             return False, message
-            
-        # Проверяем, не состоит ли пользователь уже в комнате
-        if user in room.users:
-            logger.info(f"Пользователь {user_id} уже состоит в комнате {room_id}")
-            return False, "Вы уже состоите в этой комнате"
-            
-        # Добавляем пользователя в комнату через таблицу связи
-        session.execute(
-            user_room_association.insert().values(
+        
+        # Параллельное присоединение того же пользователя уже заняло место
+        inserted = session.execute(
+            _dialect_insert(session, user_room_association).values(
                 user_id=user.id,
                 room_id=room_id
-            )
-        )
-        
-        # Обновляем время последней активности комнаты
-        room.last_activity = datetime.utcnow()
+            ).on_conflict_do_nothing()
+        ).rowcount
+        if not inserted:
+            session.rollback()
+            return False, "Вы уже состоите в этой комнате"
+        previous_room_id = set_current_room(session, user, room_id)
         
         session.commit()
-        logger.info(f"Пользователь {user_id} успешно присоединился к комнате {room_id}")
+        cache.invalidate(('user', user_id), ('room', room_id), ('room', previous_room_id))
+        logger.info("Пользователь %s успешно присоединился к комнате %s", user_id, room_id)
         return True, "Вы успешно присоединились к комнате"
         
     except Exception as e:
-        logger.error(f"Ошибка при присоединении к комнате: {e}")
+        logger.error("Ошибка при присоединении к комнате: %s", e)
         session.rollback()
         return False, "Произошла ошибка при присоединении к комнате"
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def get_room_users(room_id: int) -> list[dict]:
     """Получает список пользователей в комнате"""
     try:
         with Session() as session:
             users = session.query(User).join(
-                Room, User.room_id == Room.id
-            ).filter(Room.id == room_id).all()
+                user_room_association, user_room_association.c.user_id == User.id
+            ).filter(user_room_association.c.room_id == room_id).order_by(User.id).all()
             
             return [
                 {
@@ -1232,10 +1793,11 @@ def get_room_users(room_id: int) -> list[dict]:
                 for user in users
             ]
     except Exception as e:
-        logger.error(f"Ошибка при получении пользователей комнаты: {str(e)}")
+        logger.error("Ошибка при получении пользователей комнаты: %s", e)
         return []
 
 
+@db_metrics.instrument
 def delete_room(room_id: int, user_id: int) -> bool:
     """Удаляет комнату, если пользователь является ее создателем"""
     session = Session()
@@ -1243,42 +1805,58 @@ def delete_room(room_id: int, user_id: int) -> bool:
         # Находим пользователя
         user = session.query(User).filter(User.telegram_id == user_id).first()
         if not user:
-            logger.error(f"Пользователь {user_id} не найден")
+            logger.error("Пользователь %s не найден", user_id)
             return False
             
         # Находим комнату
         room = session.query(Room).filter(Room.id == room_id).first()
         if not room:
-            logger.error(f"Комната {room_id} не найдена")
+            logger.error("Комната %s не найдена", room_id)
             return False
             
         # Проверяем, является ли пользователь создателем комнаты
         if room.creator_id != user.id:
-            logger.error(f"Пользователь {user_id} не является создателем комнаты {room_id}")
+            logger.error("Пользователь %s не является создателем комнаты %s", user_id, room_id)
             return False
             
-        # Получаем всех пользователей в комнате
+        # Получаем всех пользователей в комнате. Записи о членстве удаляются
+        # вместе с комнатой (room.joined_users)
         users_in_room = session.query(User).filter(User.room_id == room_id).all()
+        affected = [('room', room_id)] + [
+            ('user', u.telegram_id) for u in set(users_in_room) | set(room.joined_users)
+        ]
         
         # Удаляем пользователей из комнаты
         for u in users_in_room:
-            logger.info(f"Удаляем пользователя {u.telegram_id} из комнаты {room_id}")
+            logger.debug("Удаляем пользователя %s из комнаты %s", u.telegram_id, room_id)
             u.room_id = None
             
         # Удаляем связанные желания
         wishes = session.query(Wish).filter(Wish.room_id == room_id).all()
         for wish in wishes:
-            logger.info(f"Удаляем желание {wish.id} из комнаты {room_id}")
+            logger.debug("Удаляем желание %s из комнаты %s", wish.id, room_id)
             session.delete(wish)
             
+        invalidate_room_digests(session, room_id)
+        session.query(Assignment).filter(
+            Assignment.room_id == room_id
+        ).delete(synchronize_session=False)
+        session.query(DrawExclusion).filter(
+            DrawExclusion.room_id == room_id
+        ).delete(synchronize_session=False)
+        session.query(MemberCounter).filter(
+            MemberCounter.room_id == room_id
+        ).delete(synchronize_session=False)
+            
         # Удаляем комнату
-        logger.info(f"Удаляем комнату {room_id}")
+        logger.info("Удаляем комнату %s", room_id)
         session.delete(room)
         session.commit()
+        cache.invalidate(*affected)
         return True
         
     except Exception as e:
-        logger.error(f"Ошибка при удалении комнаты {room_id}: {e}")
+        logger.error("Ошибка при удалении комнаты %s: %s", room_id, e)
         session.rollback()
         return False
     finally:
@@ -1291,6 +1869,7 @@ FREE_MAX_USERS = 5
 PRO_MAX_USERS = 10
 
 
+@db_metrics.instrument
 def get_room_participants(room_id: int) -> Dict[str, Any]:
     """Получает информацию об участниках комнаты"""
     session = Session()
@@ -1298,34 +1877,35 @@ def get_room_participants(room_id: int) -> Dict[str, Any]:
         # Проверяем существование комнаты
         room = session.query(Room).filter(Room.id == room_id).first()
         if not room:
-            logger.error(f"Комната {room_id} не найдена")
+            logger.error("Комната %s не найдена", room_id)
             return {
                 'success': False,
                 'error': 'Комната не найдена',
                 'participants': []
             }
         
-        # Получаем всех участников комнаты
-        participants = session.query(User).filter(
-            User.room_id == room_id
-        ).all()
+        # Получаем всех участников комнаты вместе со счетчиками желаний
+        participants = session.query(User, MemberCounter.wish_count).join(
+            user_room_association, user_room_association.c.user_id == User.id
+        ).outerjoin(
+            MemberCounter, and_(
+                MemberCounter.user_id == User.id,
+                MemberCounter.room_id == room_id
+            )
+        ).filter(
+            user_room_association.c.room_id == room_id
+        ).order_by(User.id).all()
         
         # Формируем информацию об участниках
         participants_info = []
-        for user in participants:
-            # Получаем количество желаний пользователя
-            wishes_count = session.query(Wish).filter(
-                Wish.user_id == user.id,
-                Wish.room_id == room_id
-            ).count()
-            
+        for user, wishes_count in participants:
             participants_info.append({
                 'telegram_id': user.telegram_id,
                 'username': user.username,
                 'first_name': user.first_name,
                 'last_name': user.last_name,
                 'is_creator': user.id == room.creator_id,
-                'wishes_count': wishes_count,
+                'wishes_count': wishes_count or 0,
                 'joined_at': user.created_at.isoformat() if user.created_at else None
             })
         
@@ -1340,7 +1920,7 @@ def get_room_participants(room_id: int) -> Dict[str, Any]:
         }
         
     except Exception as e:
-        logger.error(f"Ошибка при получении участников комнаты: {str(e)}")
+        logger.error("Ошибка при получении участников комнаты: %s", e)
         return {
             'success': False,
             'error': str(e),
@@ -1350,10 +1930,17 @@ def get_room_participants(room_id: int) -> Dict[str, Any]:
         session.close()
 
 
+@db_metrics.instrument
 def leave_room(user_id: int, room_id: int) -> tuple[bool, str]:
-    """Отключает пользователя от комнаты"""
+    """
+    Отключает пользователя от комнаты: удаляет запись о членстве,
+    освобождает место в счетчике участников и, если комната была текущей,
+    переключает пользователя на последнюю из оставшихся комнат
+    """
     session = Session()
     try:
+        begin_write(session)
+        
         # Получаем пользователя
         user = session.query(User).filter(
             User.telegram_id == user_id
@@ -1371,32 +1958,267 @@ def leave_room(user_id: int, room_id: int) -> tuple[bool, str]:
             return False, "Создатель не может покинуть комнату"
             
         # Удаляем связь пользователя с комнатой
-        session.execute(
+        left = session.execute(
             user_room_association.delete().where(
                 and_(
                     user_room_association.c.user_id == user.id,
                     user_room_association.c.room_id == room_id
                 )
             )
+        ).rowcount
+        if not left:
+            session.rollback()
+            return False, "Вы не состоите в этой комнате"
+        
+        # Освобождаем место и обновляем время последней активности комнаты
+        session.execute(
+            update(Room).where(Room.id == room_id).values(
+                member_count=Room.member_count - 1,
+                last_activity=datetime.utcnow()
+            ),
+            execution_options={'synchronize_session': False}
         )
         
-        # Обновляем время последней активности комнаты
-        room.last_activity = datetime.utcnow()
+        if user.room_id == room_id:
+            next_room_id = session.execute(
+                select(user_room_association.c.room_id).where(
+                    user_room_association.c.user_id == user.id
+                ).order_by(
+                    user_room_association.c.joined_at.desc(),
+                    user_room_association.c.room_id.desc()
+                ).limit(1)
+            ).scalar()
+            set_current_room(session, user, next_room_id)
         
         session.commit()
+        cache.invalidate(('user', user_id), ('room', room_id))
         logger.info(
-            f"Пользователь {user_id} отключился от комнаты {room_id}"
+            "Пользователь %s отключился от комнаты %s", user_id, room_id
         )
         return True, "Вы успешно покинули комнату"
     except Exception as e:
         session.rollback()
-        logger.error(f"Ошибка при отключении от комнаты: {e}")
+        logger.error("Ошибка при отключении от комнаты: %s", e)
         return False, "Ошибка при отключении от комнаты"
     finally:
         session.close()
 
 
-def get_user_by_telegram_id(telegram_id: int) -> Optional[User]:
+@db_metrics.instrument
+def import_room_members(
+    room_id: int,
+    members: Iterable[Dict[str, Any]],
+    batch_size: int = 5000,
+    allow_over_limit: bool = False
+) -> Optional[Dict[str, int]]:
+    """
+    Массово добавляет участников в комнату (импорт списка сотрудников).
+    
+    Пользователи создаются или обновляются пачками (INSERT ... ON CONFLICT
+    DO UPDATE), становятся участниками комнаты и переключаются на неё,
+    счетчик участников обновляется в той же транзакции. Каждая пачка
+    фиксируется отдельно, поэтому прерванный импорт можно просто запустить
+    повторно.
+    
+    Импорт, после которого участников стало бы больше max_participants
+    комнаты, отклоняется целиком. С allow_over_limit лимит комнаты
+    поднимается до числа участников, и это записывается в лог.
+    
+    Args:
+        room_id: ID комнаты
+        members: Записи с ключом telegram_id и необязательными username,
+            first_name, last_name
+        batch_size: Сколько записей обрабатывать одной транзакцией
+        allow_over_limit: Разрешить превышение лимита участников комнаты
+        
+    Returns:
+        Optional[Dict[str, int]]: members - обработано записей, created -
+        создано пользователей, moved - сменили текущую комнату, skipped -
+        пропущено некорректных записей; None, если комната не найдена или
+        импорт превысил бы лимит участников
+    """
+    room = get_room_by_id(room_id)
+    if not room:
+        logger.error("Комната %s не найдена", room_id)
+        return None
+    
+    result = {'members': 0, 'created': 0, 'moved': 0, 'skipped': 0}
+    # Повторы telegram_id объединяются: ON CONFLICT не может изменить одну
+    # строку дважды, а непустые поля более поздней записи дополняют раннюю
+    rows: Dict[int, Dict[str, Any]] = {}
+    for record in members:
+        try:
+            telegram_id = int(record['telegram_id'])
+        except (KeyError, TypeError, ValueError):
+            result['skipped'] += 1
+            continue
+        result['members'] += 1
+        row = rows.setdefault(telegram_id, {
+            'telegram_id': telegram_id,
+            'username': None,
+            'first_name': None,
+            'last_name': None
+        })
+        for column in ('username', 'first_name', 'last_name'):
+            row[column] = record.get(column) or row[column]
+    
+    joining = len(rows) - _count_room_members(room_id, list(rows))
+    if room['current_users'] + joining > room['max_participants']:
+        if not allow_over_limit:
+            logger.warning(
+                "Импорт в комнату %s отклонен: участников станет %s при лимите %s",
+                room_id, room['current_users'] + joining, room['max_participants']
+            )
+            return None
+        logger.warning(
+            "Импорт в комнату %s превышает лимит %s: участников станет %s",
+            room_id, room['max_participants'], room['current_users'] + joining
+        )
+    
+    imported = 0
+    for batch in _chunks(list(rows.values()), batch_size):
+        counts = _import_members_batch(room_id, batch, allow_over_limit)
+        if counts is None:
+            # Места заняли присоединившиеся во время импорта
+            logger.warning(
+                "Импорт в комнату %s остановлен: достигнут лимит участников", room_id
+            )
+            return None
+        result['created'] += counts[0]
+        result['moved'] += counts[1]
+        imported += len(batch)
+        logger.info("Импортировано %s участников в комнату %s", imported, room_id)
+    
+    if allow_over_limit:
+        session = Session()
+        try:
+            # Комната вмещает всех импортированных участников
+            raised = session.execute(
+                update(Room).where(
+                    Room.id == room_id,
+                    Room.member_count > Room.max_participants
+                ).values(max_participants=Room.member_count),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            session.commit()
+        finally:
+            session.close()
+        if raised:
+            logger.warning("Лимит участников комнаты %s поднят при импорте", room_id)
+            cache.invalidate(('room', room_id))
+    return result
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    """Делит список на части не больше size элементов"""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _count_room_members(room_id: int, telegram_ids: List[int], chunk_size: int = 5000) -> int:
+    """Сколько из пользователей telegram_ids уже состоят в комнате"""
+    session = Session()
+    try:
+        return sum(
+            session.query(func.count()).select_from(user_room_association).join(
+                User, User.id == user_room_association.c.user_id
+            ).filter(
+                user_room_association.c.room_id == room_id,
+                User.telegram_id.in_(chunk)
+            ).scalar()
+            for chunk in _chunks(telegram_ids, chunk_size)
+        )
+    finally:
+        session.close()
+
+
+def _import_members_batch(
+    room_id: int,
+    rows: List[Dict[str, Any]],
+    allow_over_limit: bool = False
+) -> Optional[Tuple[int, int]]:
+    """
+    Импортирует одну пачку участников.
+    
+    Returns:
+        Optional[Tuple[int, int]]: (создано, сменили комнату); None, если
+        пачка не поместилась в лимит комнаты (пачка не записывается)
+    """
+    session = Session()
+    try:
+        telegram_ids = [row['telegram_id'] for row in rows]
+        existing = session.query(User.telegram_id, User.room_id).filter(
+            User.telegram_id.in_(telegram_ids)
+        ).all()
+        
+        upsert = _dialect_insert(session, User)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                column: func.coalesce(getattr(upsert.excluded, column), getattr(User, column))
+                for column in ('username', 'first_name', 'last_name')
+            }
+        ).returning(User.id, User.telegram_id)
+        user_ids = {
+            row.telegram_id: row.id
+            for row in session.execute(upsert, rows)
+        }
+        
+        members = set(session.scalars(
+            select(user_room_association.c.user_id).where(
+                user_room_association.c.room_id == room_id,
+                user_room_association.c.user_id.in_(user_ids.values())
+            )
+        ))
+        joining = [user_id for user_id in user_ids.values() if user_id not in members]
+        if joining:
+            seats = update(Room).where(Room.id == room_id)
+            if not allow_over_limit:
+                seats = seats.where(
+                    Room.member_count + len(joining) <= Room.max_participants
+                )
+            taken = session.execute(
+                seats.values(member_count=Room.member_count + len(joining)),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+            if not taken:
+                session.rollback()
+                return None
+            session.execute(
+                insert(user_room_association),
+                [{'user_id': user_id, 'room_id': room_id} for user_id in joining]
+            )
+        
+        in_room = {row.telegram_id for row in existing if row.room_id == room_id}
+        moving = [
+            user_ids[telegram_id] for telegram_id in telegram_ids
+            if telegram_id not in in_room
+        ]
+        if moving:
+            session.execute(
+                update(User).where(User.id.in_(moving)).values(room_id=room_id),
+                execution_options={'synchronize_session': False}
+            )
+        session.commit()
+        
+        cache.invalidate(
+            ('room', room_id), *[('user', telegram_id) for telegram_id in telegram_ids]
+        )
+        return len(rows) - len(existing), len(moving)
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+@cached(cache, lambda user, telegram_id: [('user', telegram_id)])
+def get_user_by_telegram_id(telegram_id: int) -> Optional[Dict[str, Any]]:
     """
     Получает пользователя по его Telegram ID
     
@@ -1404,19 +2226,30 @@ def get_user_by_telegram_id(telegram_id: int) -> Optional[User]:
         telegram_id: Telegram ID пользователя
         
     Returns:
-        User: Объект пользователя или None, если пользователь не найден
+        Optional[Dict[str, Any]]: Данные пользователя или None, если
+        пользователь не найден
     """
     try:
         session = Session()
         user = session.query(User).filter(User.telegram_id == telegram_id).first()
-        return user
+        if not user:
+            return None
+        return {
+            'id': user.id,
+            'telegram_id': user.telegram_id,
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'room_id': user.room_id
+        }
     except Exception as e:
-        logger.error(f"Ошибка при получении пользователя по Telegram ID {telegram_id}: {str(e)}")
+        logger.error("Ошибка при получении пользователя по Telegram ID %s: %s", telegram_id, e)
         return None
     finally:
         session.close()
 
 
+@db_metrics.instrument
 def check_user_in_room(telegram_id: int, room_id: int) -> bool:
     """
     Проверяет, является ли пользователь участником комнаты
@@ -1447,7 +2280,577 @@ def check_user_in_room(telegram_id: int, room_id: int) -> bool:
         
         return association is not None
     except Exception as e:
-        logger.error(f"Ошибка при проверке участия пользователя {telegram_id} в комнате {room_id}: {str(e)}")
+        logger.error("Ошибка при проверке участия пользователя %s в комнате %s: %s", telegram_id, room_id, e)
+        return False
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def load_room_snapshots(room_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    Загружает все активные комнаты вместе с участниками и желаниями.
+    
+    Выполняет три запроса независимо от количества комнат: комнаты,
+    участники и желания (с именами авторов) читаются потоком через yield_per.
+    
+    Args:
+        room_ids: Ограничить загрузку этими комнатами
+        
+    Returns:
+        List[Dict[str, Any]]: Снимки комнат с ключами id, code, members, wishes
+    """
+    session = Session()
+    try:
+        room_filter = [Room.is_active.is_(True)]
+        if room_ids is not None:
+            room_filter.append(Room.id.in_(room_ids))
+        
+        snapshots = {}
+        rooms = session.query(Room.id, Room.code).filter(
+            *room_filter
+        ).order_by(Room.id).yield_per(1000)
+        for room in rooms:
+            snapshots[room.id] = {
+                'id': room.id,
+                'code': room.code,
+                'members': [],
+                'wishes': []
+            }
+        
+        # Участники - все состоящие в комнате, а не только те, для кого она текущая
+        members = session.query(
+            User.id, User.telegram_id, User.username, user_room_association.c.room_id
+        ).join(
+            user_room_association, user_room_association.c.user_id == User.id
+        ).join(
+            Room, user_room_association.c.room_id == Room.id
+        ).filter(*room_filter).yield_per(1000)
+        for member in members:
+            snapshots[member.room_id]['members'].append({
+                'id': member.id,
+                'telegram_id': member.telegram_id,
+                'username': member.username
+            })
+        
+        wishes = session.query(
+            Wish.id, Wish.text, Wish.user_id, Wish.room_id, User.username
+        ).join(
+            Room, Wish.room_id == Room.id
+        ).outerjoin(
+            User, Wish.user_id == User.id
+        ).filter(*room_filter).order_by(Wish.id).yield_per(1000)
+        for wish in wishes:
+            snapshots[wish.room_id]['wishes'].append({
+                'id': wish.id,
+                'text': wish.text,
+                'user_id': wish.user_id,
+                'username': wish.username
+            })
+        
+        logger.debug("Загружено снимков комнат: %s", len(snapshots))
+        return list(snapshots.values())
+    except Exception as e:
+        logger.error("Ошибка при загрузке снимков комнат: %s", e)
+        return []
+    finally:
+        session.close()
+
+@db_metrics.instrument
+def get_stale_digest_room_ids() -> List[int]:
+    """Возвращает активные комнаты, в которых есть участники без подборки желаний"""
+    session = Session()
+    try:
+        membership = user_room_association.c
+        rows = session.query(membership.room_id).join(
+            Room, membership.room_id == Room.id
+        ).outerjoin(
+            WishDigest,
+            and_(WishDigest.room_id == membership.room_id, WishDigest.user_id == membership.user_id)
+        ).filter(
+            Room.is_active.is_(True),
+            WishDigest.user_id.is_(None)
+        ).distinct().all()
+        return [row.room_id for row in rows]
+    except Exception as e:
+        logger.error("Ошибка при поиске устаревших подборок желаний: %s", e)
+        return []
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def save_wish_digests(room_ids: List[int], digests: List[Tuple[int, int, str]]) -> bool:
+    """
+    Заменяет подборки желаний комнат новыми
+    
+    Args:
+        room_ids: Комнаты, подборки которых пересобраны
+        digests: Список (room_id, id получателя, текст подборки)
+    """
+    session = Session()
+    try:
+        session.query(WishDigest).filter(
+            WishDigest.room_id.in_(room_ids)
+        ).delete(synchronize_session=False)
+        if digests:
+            session.execute(
+                insert(WishDigest),
+                [
+                    {'room_id': room_id, 'user_id': user_id, 'text': text}
+                    for room_id, user_id, text in digests
+                ]
+            )
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error("Ошибка при сохранении подборок желаний: %s", e)
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def get_wish_digests(only_undelivered: bool = False) -> List[Dict[str, Any]]:
+    """
+    Получает готовые подборки желаний для участников активных комнат
+    
+    Args:
+        only_undelivered: Только подборки, изменившиеся после прошлой
+            рассылки и еще не стоящие в очереди outbox
+    """
+    session = Session()
+    try:
+        query = session.query(
+            WishDigest.room_id, WishDigest.text, User.telegram_id
+        ).join(
+            user_room_association,
+            and_(
+                user_room_association.c.user_id == WishDigest.user_id,
+                user_room_association.c.room_id == WishDigest.room_id
+            )
+        ).join(
+            User, User.id == WishDigest.user_id
+        ).join(
+            Room, Room.id == WishDigest.room_id
+        ).filter(
+            Room.is_active.is_(True),
+            WishDigest.text != ''
+        )
+        if only_undelivered:
+            queued = exists().where(
+                OutboxMessage.status == 'pending',
+                OutboxMessage.chat_id == User.telegram_id,
+                OutboxMessage.text == WishDigest.text
+            )
+            query = query.filter(WishDigest.delivered_at.is_(None), ~queued)
+        
+        return [
+            {
+                'room_id': row.room_id,
+                'chat_id': row.telegram_id,
+                'text': row.text
+            }
+            for row in query.yield_per(1000)
+        ]
+    except Exception as e:
+        logger.error("Ошибка при получении подборок желаний: %s", e)
+        return []
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def enqueue_messages(messages: List[Tuple[int, str]]) -> int:
+    """
+    Добавляет сообщения в очередь рассылки (outbox)
+    
+    Args:
+        messages: Список пар (chat_id, текст сообщения)
+        
+    Returns:
+        int: Количество добавленных сообщений
+    """
+    if not messages:
+        return 0
+    session = Session()
+    try:
+        session.execute(
+            insert(OutboxMessage),
+            [
+                {'chat_id': chat_id, 'text': text, 'status': 'pending', 'attempts': 0}
+                for chat_id, text in messages
+            ]
+        )
+        session.commit()
+        logger.info("В очередь рассылки добавлено %s сообщений", len(messages))
+        return len(messages)
+    except Exception as e:
+        logger.error("Ошибка при добавлении сообщений в очередь рассылки: %s", e)
+        session.rollback()
+        return 0
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def get_pending_messages(limit: int = 500) -> List[Dict[str, Any]]:
+    """Получает очередную порцию неотправленных сообщений из outbox"""
+    session = Session()
+    try:
+        messages = session.query(OutboxMessage).filter(
+            OutboxMessage.status == 'pending',
+            or_(
+                OutboxMessage.next_attempt_at.is_(None),
+                OutboxMessage.next_attempt_at <= datetime.utcnow()
+            )
+        ).order_by(OutboxMessage.id).limit(limit).all()
+        
+        return [
+            {
+                'id': message.id,
+                'chat_id': message.chat_id,
+                'text': message.text,
+                'attempts': message.attempts
+            }
+            for message in messages
+        ]
+    except Exception as e:
+        logger.error("Ошибка при получении сообщений из очереди рассылки: %s", e)
+        return []
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def mark_messages_sent(message_ids: List[int]) -> bool:
+    """
+    Отмечает сообщения outbox как отправленные. Подборки желаний с тем же
+    получателем и текстом отмечаются разосланными в той же транзакции
+    """
+    if not message_ids:
+        return True
+    session = Session()
+    try:
+        now = datetime.utcnow()
+        session.execute(
+            update(OutboxMessage)
+            .where(OutboxMessage.id.in_(message_ids))
+            .values(
+                status='sent',
+                attempts=OutboxMessage.attempts + 1,
+                sent_at=now
+            )
+        )
+        recipient = select(User.telegram_id).where(
+            User.id == WishDigest.user_id
+        ).correlate(WishDigest).scalar_subquery()
+        session.execute(
+            update(WishDigest)
+            .where(
+                WishDigest.delivered_at.is_(None),
+                exists().where(
+                    OutboxMessage.id.in_(message_ids),
+                    OutboxMessage.chat_id == recipient,
+                    OutboxMessage.text == WishDigest.text
+                )
+            )
+            .values(delivered_at=now),
+            execution_options={'synchronize_session': False}
+        )
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error("Ошибка при отметке отправленных сообщений: %s", e)
+        session.rollback()
         return False
     finally:
         session.close()
+
+
+@db_metrics.instrument
+def mark_messages_failed(failures: List[Tuple[int, str]]) -> bool:
+    """
+    Отмечает сообщения outbox как недоставленные окончательно (повторять
+    бессмысленно, например, пользователь заблокировал бота)
+    
+    Args:
+        failures: Список пар (id сообщения, текст ошибки)
+    """
+    if not failures:
+        return True
+    session = Session()
+    try:
+        # Один executemany на все сообщения
+        session.connection().execute(
+            update(OutboxMessage.__table__)
+            .where(OutboxMessage.id == bindparam('message_id'))
+            .values(
+                status='failed',
+                attempts=OutboxMessage.attempts + 1,
+                last_error=bindparam('error')
+            ),
+            [{'message_id': message_id, 'error': error} for message_id, error in failures]
+        )
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error("Ошибка при отметке недоставленных сообщений: %s", e)
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def postpone_messages(retries: List[Tuple[int, str, int, float]]) -> bool:
+    """
+    Откладывает сообщения outbox после временной ошибки: сообщение остается
+    в очереди и отправляется снова не раньше чем через заданную паузу
+    
+    Args:
+        retries: Список (id сообщения, текст ошибки, число сделанных
+            попыток, пауза в секундах)
+    """
+    if not retries:
+        return True
+    session = Session()
+    try:
+        now = datetime.utcnow()
+        session.connection().execute(
+            update(OutboxMessage.__table__)
+            .where(OutboxMessage.id == bindparam('message_id'))
+            .values(
+                attempts=OutboxMessage.attempts + bindparam('new_attempts'),
+                last_error=bindparam('error'),
+                next_attempt_at=bindparam('retry_at')
+            ),
+            [
+                {
+                    'message_id': message_id,
+                    'error': error,
+                    'new_attempts': attempts,
+                    'retry_at': now + timedelta(seconds=delay)
+                }
+                for message_id, error, attempts, delay in retries
+            ]
+        )
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error("Ошибка при откладывании сообщений: %s", e)
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def get_room_member_ids(room_id: int) -> List[int]:
+    """Возвращает ID всех участников комнаты: создателя, присоединившихся и текущих"""
+    session = Session()
+    try:
+        members = union(
+            select(Room.creator_id).where(Room.id == room_id),
+            select(user_room_association.c.user_id).where(
+                user_room_association.c.room_id == room_id
+            ),
+            select(User.id).where(User.room_id == room_id)
+        )
+        return sorted(row[0] for row in session.execute(members))
+    except Exception as e:
+        logger.error("Ошибка при получении участников комнаты %s: %s", room_id, e)
+        return []
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def add_draw_exclusion(
+    room_id: int,
+    user_id: int,
+    excluded_user_id: int,
+    mutual: bool = True
+) -> bool:
+    """
+    Запрещает пользователю дарить подарок другому участнику комнаты
+    
+    Args:
+        room_id: ID комнаты
+        user_id: Telegram ID дарителя
+        excluded_user_id: Telegram ID участника, которому нельзя дарить
+        mutual: Запретить и обратное направление (например, для пар)
+    """
+    session = Session()
+    try:
+        users = session.query(User).filter(
+            User.telegram_id.in_([user_id, excluded_user_id])
+        ).all()
+        ids = {user.telegram_id: user.id for user in users}
+        if user_id not in ids or excluded_user_id not in ids:
+            logger.error("Пользователи %s, %s не найдены", user_id, excluded_user_id)
+            return False
+        
+        pairs = [(ids[user_id], ids[excluded_user_id])]
+        if mutual:
+            pairs.append((ids[excluded_user_id], ids[user_id]))
+        for giver_id, receiver_id in pairs:
+            session.merge(DrawExclusion(
+                room_id=room_id,
+                giver_id=giver_id,
+                receiver_id=receiver_id
+            ))
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error("Ошибка при добавлении исключения жеребьевки: %s", e)
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def get_draw_exclusions(room_id: int) -> List[Tuple[int, int]]:
+    """Возвращает запрещенные пары (даритель, получатель) комнаты"""
+    session = Session()
+    try:
+        rows = session.query(
+            DrawExclusion.giver_id, DrawExclusion.receiver_id
+        ).filter(DrawExclusion.room_id == room_id).all()
+        return [(row.giver_id, row.receiver_id) for row in rows]
+    except Exception as e:
+        logger.error("Ошибка при получении исключений жеребьевки: %s", e)
+        return []
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def get_assignments(room_id: int) -> List[Tuple[int, int]]:
+    """Возвращает результат жеребьевки комнаты: пары (даритель, получатель)"""
+    session = Session()
+    try:
+        rows = session.query(
+            Assignment.giver_id, Assignment.receiver_id
+        ).filter(Assignment.room_id == room_id).all()
+        return [(row.giver_id, row.receiver_id) for row in rows]
+    except Exception as e:
+        logger.error("Ошибка при получении жеребьевки комнаты %s: %s", room_id, e)
+        return []
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def save_assignments(room_id: int, pairs: Dict[int, int]) -> bool:
+    """Заменяет результат жеребьевки комнаты"""
+    session = Session()
+    try:
+        session.execute(delete(Assignment).where(Assignment.room_id == room_id))
+        session.execute(
+            insert(Assignment),
+            [
+                {'room_id': room_id, 'giver_id': giver_id, 'receiver_id': receiver_id}
+                for giver_id, receiver_id in pairs.items()
+            ]
+        )
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error("Ошибка при сохранении жеребьевки комнаты %s: %s", room_id, e)
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def get_user_assignment(room_id: int, telegram_id: int) -> Optional[Dict[str, Any]]:
+    """Возвращает получателя подарка для пользователя по результату жеребьевки"""
+    session = Session()
+    try:
+        giver = session.query(User).filter(User.telegram_id == telegram_id).first()
+        if not giver:
+            return None
+        
+        receiver = session.query(User).join(
+            Assignment, Assignment.receiver_id == User.id
+        ).filter(
+            Assignment.room_id == room_id,
+            Assignment.giver_id == giver.id
+        ).first()
+        if not receiver:
+            return None
+        
+        return {
+            'telegram_id': receiver.telegram_id,
+            'username': receiver.username,
+            'first_name': receiver.first_name,
+            'last_name': receiver.last_name
+        }
+    except Exception as e:
+        logger.error("Ошибка при получении получателя подарка: %s", e)
+        return None
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def load_bot_state(namespace: str) -> Dict[str, str]:
+    """Возвращает сохраненное состояние бота: ключ -> JSON"""
+    session = Session()
+    try:
+        rows = session.query(BotState.key, BotState.value).filter(
+            BotState.namespace == namespace
+        ).all()
+        return {row.key: row.value for row in rows}
+    except Exception as e:
+        logger.error("Ошибка при загрузке состояния %s: %s", namespace, e)
+        return {}
+    finally:
+        session.close()
+
+
+@db_metrics.instrument
+def save_bot_state(items: Dict[Tuple[str, str], Optional[str]]) -> bool:
+    """
+    Сохраняет изменения состояния бота одной транзакцией
+    
+    Args:
+        items: (namespace, key) -> JSON или None для удаления
+    """
+    if not items:
+        return True
+    
+    session = Session()
+    try:
+        keys_by_namespace: Dict[str, List[str]] = {}
+        for namespace, key in items:
+            keys_by_namespace.setdefault(namespace, []).append(key)
+        for namespace, keys in keys_by_namespace.items():
+            session.execute(delete(BotState).where(
+                BotState.namespace == namespace,
+                BotState.key.in_(keys)
+            ))
+        
+        rows = [
+            {'namespace': namespace, 'key': key, 'value': value}
+            for (namespace, key), value in items.items()
+            if value is not None
+        ]
+        if rows:
+            session.execute(insert(BotState), rows)
+        session.commit()
+        return True
+    except Exception as e:
+        logger.error("Ошибка при сохранении состояния бота: %s", e)
+        session.rollback()
+        return False
+    finally:
+        session.close()
+
+
+if METRICS_ENABLED:
+    db_metrics.enable()
@@ -0,0 +1,137 @@
+"""Создание подключений к базе данных.
+
+Все движки проекта (database.py, async_database.py, скрипты) создаются
+здесь и настраиваются из config.py. Для SQLite при каждом подключении
+включается WAL и задаются PRAGMA: читатели не блокируют писателя, а
+писатель при занятой базе ждет busy_timeout вместо ошибки
+"database is locked". Для PostgreSQL настраивается пул соединений.
+"""
+import logging
+from typing import Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from config import current_config
+
+logger = logging.getLogger(__name__)
+
+
+def _sqlite_pragmas(database: Optional[str]) -> list:
+    pragmas = [
+        f"PRAGMA busy_timeout = {current_config.SQLITE_BUSY_TIMEOUT}",
+        f"PRAGMA synchronous = {current_config.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size = {current_config.SQLITE_CACHE_SIZE}",
+        f"PRAGMA mmap_size = {current_config.SQLITE_MMAP_SIZE}",
+    ]
+    # Для базы в памяти WAL недоступен
+    if database and database != ':memory:':
+        pragmas.insert(0, f"PRAGMA journal_mode = {current_config.SQLITE_JOURNAL_MODE}")
+    return pragmas
+
+
+def _configure_sqlite(engine: Engine, database: Optional[str]) -> None:
+    pragmas = _sqlite_pragmas(database)
+
+    @event.listens_for(engine, 'connect')
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _sync_url(url: str):
+    url = make_url(url or current_config.DATABASE_URL)
+    # Проект использует psycopg2 (SQLAlchemy 2.1 по умолчанию выбирает psycopg 3)
+    if url.drivername == 'postgresql':
+        url = url.set(drivername='postgresql+psycopg2')
+    return url
+
+
+def _engine_options(url, kwargs: dict) -> dict:
+    if url.get_backend_name() == 'sqlite':
+        return {'connect_args': {'check_same_thread': False}}
+    # Размеры пула не применимы, если пул задан явно (например, NullPool)
+    if 'poolclass' in kwargs:
+        return {'pool_pre_ping': True}
+    return {
+        'pool_size': current_config.DB_POOL_SIZE,
+        'max_overflow': current_config.DB_MAX_OVERFLOW,
+        'pool_timeout': current_config.DB_POOL_TIMEOUT,
+        'pool_recycle': current_config.DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+
+def create_db_engine(url: Optional[str] = None, **kwargs) -> Engine:
+    """
+    Создает синхронный движок базы данных.
+
+    Args:
+        url: URL базы данных (по умолчанию DATABASE_URL из config.py)
+        **kwargs: Дополнительные параметры create_engine
+
+    Returns:
+        Engine: Настроенный движок
+    """
+    url = _sync_url(url)
+    engine = create_engine(url, **{**_engine_options(url, kwargs), **kwargs})
+    if url.get_backend_name() == 'sqlite':
+        _configure_sqlite(engine, url.database)
+    logger.info("Создан движок базы данных %s", url.render_as_string(hide_password=True))
+    return engine
+
+
+def create_async_db_engine(url: Optional[str] = None, **kwargs) -> AsyncEngine:
+    """
+    Создает асинхронный движок базы данных с теми же настройками.
+
+    Args:
+        url: URL базы данных (по умолчанию DATABASE_URL из config.py)
+        **kwargs: Дополнительные параметры create_async_engine
+
+    Returns:
+        AsyncEngine: Настроенный движок
+    """
+    url = make_url(url or current_config.DATABASE_URL)
+    if url.get_backend_name() == 'sqlite':
+        url = url.set(drivername='sqlite+aiosqlite')
+    elif url.get_backend_name() == 'postgresql':
+        url = url.set(drivername='postgresql+asyncpg')
+    engine = create_async_engine(url, **{**_engine_options(url, kwargs), **kwargs})
+    if url.get_backend_name() == 'sqlite':
+        _configure_sqlite(engine.sync_engine, url.database)
+    return engine
+
+
+def reset_sequences(connection) -> None:
+    """
+    Выравнивает последовательности PostgreSQL по максимальным ID таблиц.
+
+    Нужна после вставки строк с явными ID (перенос данных, импорт,
+    тестовые данные); в SQLite ничего не делает.
+    """
+    if connection.dialect.name != 'postgresql':
+        return
+    # Импорт здесь: database.py сам создает движки через этот модуль
+    from database import Base
+
+    for table in Base.metadata.sorted_tables:
+        columns = list(table.primary_key.columns)
+        if len(columns) != 1:
+            continue
+        column = columns[0].name
+        # Для столбцов без последовательности функция вернет NULL
+        sequence = connection.execute(
+            text("SELECT pg_get_serial_sequence(:table, :column)"),
+            {'table': table.name, 'column': column}
+        ).scalar()
+        if sequence:
+            connection.execute(text(
+                f"SELECT setval('{sequence}', "
+                f"COALESCE((SELECT MAX({column}) FROM {table.name}), 0) + 1, false)"
+            ))
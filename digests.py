@@ -0,0 +1,74 @@
+"""Подборки желаний для ежедневной рассылки.
+
+Текст подборки для каждого получателя хранится в таблице wish_digests и
+пересобирается только для комнат, где желания менялись (add_wish,
+update_wish и delete_wish сбрасывают подборки комнаты) или появились
+новые участники. В остальных комнатах рассылка лишь читает готовый текст.
+"""
+import logging
+from typing import Optional
+
+import database
+from async_database import (
+    run_sync, get_wish_digests, enqueue_messages
+)
+from config import DIGEST_SKIP_UNCHANGED
+
+logger = logging.getLogger(__name__)
+
+
+def format_digest(room: dict, recipient_id: int) -> str:
+    """Формирует подборку желаний других участников комнаты для получателя"""
+    other_wishes = [
+        wish for wish in room['wishes']
+        if wish['user_id'] != recipient_id
+    ]
+    if not other_wishes:
+        return ''
+
+    message = "🎁 Желания участников комнаты:\n\n"
+    for wish in other_wishes:
+        username = wish['username'] or 'Аноним'
+        message += f"От {username}:\n{wish['text']}\n\n"
+    return message
+
+
+def refresh_wish_digests() -> int:
+    """Пересобирает устаревшие подборки. Returns: число пересобранных комнат"""
+    room_ids = database.get_stale_digest_room_ids()
+    if not room_ids:
+        return 0
+
+    digests = []
+    for room in database.load_room_snapshots(room_ids):
+        for member in room['members']:
+            digests.append(
+                (room['id'], member['id'], format_digest(room, member['id']))
+            )
+
+    database.save_wish_digests(room_ids, digests)
+    logger.info("Пересобраны подборки желаний в %s комнатах", len(room_ids))
+    return len(room_ids)
+
+
+async def enqueue_wish_digests(skip_unchanged: Optional[bool] = None) -> int:
+    """
+    Ставит подборки желаний в очередь рассылки. Подборка считается
+    разосланной, когда её сообщение отправлено (mark_messages_sent).
+
+    Args:
+        skip_unchanged: Пропускать подборки, уже разосланные без изменений
+            (по умолчанию DIGEST_SKIP_UNCHANGED)
+
+    Returns:
+        int: Количество поставленных в очередь сообщений
+    """
+    if skip_unchanged is None:
+        skip_unchanged = DIGEST_SKIP_UNCHANGED
+
+    await run_sync(refresh_wish_digests)
+    digests = await get_wish_digests(only_undelivered=skip_unchanged)
+
+    return await enqueue_messages(
+        [(digest['chat_id'], digest['text']) for digest in digests]
+    )
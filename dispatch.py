@@ -0,0 +1,112 @@
+"""Параллельная обработка обновлений с сохранением порядка для пользователя.
+
+Обновления разных пользователей обрабатываются одновременно (не более
+max_workers сразу), а обновления одного пользователя - строго по очереди
+в порядке поступления. Так медленный запрос одного пользователя не
+задерживает остальных, а состояние ввода в context.user_data
+(waiting_for, editing_wish_id) не ломается из-за гонок.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyState:
+    """Очередь обновлений одного пользователя"""
+
+    __slots__ = ('lock', 'pending')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Обработчик обновлений с ограничением числа воркеров и порядком по пользователю"""
+
+    def __init__(self, max_workers: int, max_pending: int = 10000):
+        """
+        Args:
+            max_workers: Сколько обновлений обрабатывается одновременно
+            max_pending: Сколько обновлений может ожидать обработки; сверх
+                этого приложение перестает забирать новые обновления
+        """
+        # Семафор базового класса ограничивает ожидающие обновления, а
+        # воркеров ограничивает свой семафор: обновление, ждущее своей
+        # очереди у пользователя, не должно занимать воркер
+        super().__init__(max(max_pending, max_workers))
+        self.max_workers = max_workers
+        self._workers = asyncio.Semaphore(max_workers)
+        self._keys: Dict[Hashable, _KeyState] = {}
+        self.waiting = 0
+        self.running = 0
+        self.peak_waiting = 0
+        self.processed = 0
+
+    @staticmethod
+    def update_key(update: object) -> Optional[Hashable]:
+        """Ключ, по которому обновления выстраиваются в очередь"""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return ('user', update.effective_user.id)
+            if update.effective_chat:
+                return ('chat', update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.update_key(update)
+        state = None
+        if key is not None:
+            state = self._keys.get(key)
+            if state is None:
+                state = self._keys[key] = _KeyState()
+            state.pending += 1
+
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        started = False
+        try:
+            if state is not None:
+                await state.lock.acquire()
+            try:
+                async with self._workers:
+                    self.waiting -= 1
+                    self.running += 1
+                    started = True
+                    try:
+                        await coroutine
+                    finally:
+                        self.running -= 1
+                        self.processed += 1
+            finally:
+                if state is not None:
+                    state.lock.release()
+        finally:
+            if not started:
+                self.waiting -= 1
+            if state is not None:
+                state.pending -= 1
+                if not state.pending:
+                    del self._keys[key]
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        """Метрики очереди: обрабатываются, ожидают, всего обработано"""
+        return {
+            'workers': self.max_workers,
+            'running': self.running,
+            'waiting': self.waiting,
+            'peak_waiting': self.peak_waiting,
+            'processed': self.processed,
+            'active_users': len(self._keys),
+        }
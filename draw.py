@@ -0,0 +1,200 @@
+"""Жеребьевка тайного Санты: кто кому дарит подарок.
+
+Для комнат без ограничений используется случайное беспорядочное
+распределение (никто не дарит сам себе) или, по желанию, один общий
+цикл - оба за O(n). Если в комнате заданы исключения (пары, прошлогодние
+пары), задача решается как паросочетание в двудольном графе
+"даритель - получатель": жадное случайное распределение с последующим
+поиском увеличивающих путей для оставшихся участников.
+"""
+import logging
+import random
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import database
+
+logger = logging.getLogger(__name__)
+
+# Сколько раз пытаться построить один цикл с учетом исключений
+SINGLE_CYCLE_ATTEMPTS = 50
+
+
+def _derangement(participants: List[int], rng: random.Random) -> Dict[int, int]:
+    """Случайная перестановка без неподвижных точек (в среднем e перемешиваний)"""
+    receivers = list(participants)
+    while True:
+        rng.shuffle(receivers)
+        if all(giver != receiver for giver, receiver in zip(participants, receivers)):
+            return dict(zip(participants, receivers))
+
+
+def _single_cycle(participants: List[int], rng: random.Random) -> Dict[int, int]:
+    """Случайный цикл: каждый дарит следующему по кругу"""
+    order = list(participants)
+    rng.shuffle(order)
+    return {
+        giver: order[(index + 1) % len(order)]
+        for index, giver in enumerate(order)
+    }
+
+
+def _is_allowed(pairs: Dict[int, int], excluded: Dict[int, Set[int]]) -> bool:
+    return all(
+        receiver not in excluded.get(giver, ())
+        for giver, receiver in pairs.items()
+    )
+
+
+def _matching(
+    participants: List[int],
+    excluded: Dict[int, Set[int]],
+    rng: random.Random
+) -> Dict[int, int]:
+    """Паросочетание дарителей и получателей с учетом исключений"""
+    givers = list(participants)
+    rng.shuffle(givers)
+    pool = list(participants)
+    rng.shuffle(pool)
+
+    receiver_of: Dict[int, int] = {}
+    giver_of: Dict[int, int] = {}
+    unmatched = []
+
+    # Жадно отдаем каждому дарителю свободного получателя с конца пула:
+    # запрещенных получателей мало, поэтому поиск почти всегда O(1)
+    for giver in givers:
+        forbidden = excluded.get(giver, ())
+        for index in range(len(pool) - 1, -1, -1):
+            receiver = pool[index]
+            if receiver != giver and receiver not in forbidden:
+                pool[index] = pool[-1]
+                pool.pop()
+                receiver_of[giver] = receiver
+                giver_of[receiver] = giver
+                break
+        else:
+            unmatched.append(giver)
+
+    # Оставшихся дарителей добавляем через увеличивающие пути. Граф
+    # разрешенных пар почти полный, поэтому обходим его неявно: каждый
+    # получатель посещается не более одного раза за поиск
+    for start in unmatched:
+        parent: Dict[int, int] = {}
+        unvisited = set(participants)
+        queue = deque([start])
+        found = None
+        while queue and found is None:
+            giver = queue.popleft()
+            forbidden = excluded.get(giver, set())
+            reachable = [
+                receiver for receiver in unvisited
+                if receiver != giver and receiver not in forbidden
+            ]
+            for receiver in reachable:
+                unvisited.discard(receiver)
+                parent[receiver] = giver
+                if receiver not in giver_of:
+                    found = receiver
+                    break
+                queue.append(giver_of[receiver])
+
+        if found is None:
+            raise ValueError("Невозможно провести жеребьевку с такими исключениями")
+
+        receiver = found
+        while True:
+            giver = parent[receiver]
+            previous = receiver_of.get(giver)
+            receiver_of[giver] = receiver
+            giver_of[receiver] = giver
+            if giver == start:
+                break
+            receiver = previous
+
+    return receiver_of
+
+
+def draw_pairs(
+    participants: List[int],
+    exclusions: Optional[Iterable[Tuple[int, int]]] = None,
+    single_cycle: bool = False,
+    rng: Optional[random.Random] = None
+) -> Dict[int, int]:
+    """
+    Распределяет участников: кто кому дарит подарок.
+
+    Args:
+        participants: ID участников
+        exclusions: Пары (даритель, получатель), которые запрещены
+        single_cycle: Строить один общий цикл дарения
+        rng: Генератор случайных чисел (для воспроизводимости)
+
+    Returns:
+        Dict[int, int]: Словарь даритель -> получатель
+
+    Raises:
+        ValueError: Если распределение невозможно
+    """
+    rng = rng or random.SystemRandom()
+    participants = list(dict.fromkeys(participants))
+    if len(participants) < 2:
+        raise ValueError("Для жеребьевки нужно хотя бы два участника")
+
+    excluded: Dict[int, Set[int]] = {}
+    for giver, receiver in exclusions or ():
+        excluded.setdefault(giver, set()).add(receiver)
+
+    if not excluded:
+        if single_cycle:
+            return _single_cycle(participants, rng)
+        return _derangement(participants, rng)
+
+    if single_cycle:
+        for _ in range(SINGLE_CYCLE_ATTEMPTS):
+            pairs = _single_cycle(participants, rng)
+            if _is_allowed(pairs, excluded):
+                return pairs
+        logger.warning(
+            "Не удалось построить один цикл с учетом исключений, "
+            "используется обычное распределение"
+        )
+
+    return _matching(participants, excluded, rng)
+
+
+def draw_room(
+    room_id: int,
+    single_cycle: bool = False,
+    exclude_previous: bool = False
+) -> Tuple[bool, str]:
+    """
+    Проводит жеребьевку в комнате и сохраняет результат.
+
+    Args:
+        room_id: ID комнаты
+        single_cycle: Строить один общий цикл дарения
+        exclude_previous: Не повторять пары предыдущей жеребьевки
+
+    Returns:
+        Tuple[bool, str]: (успех операции, сообщение)
+    """
+    participants = database.get_room_member_ids(room_id)
+    if len(participants) < 2:
+        return False, "Для жеребьевки нужно хотя бы два участника"
+
+    exclusions = database.get_draw_exclusions(room_id)
+    if exclude_previous:
+        exclusions += database.get_assignments(room_id)
+
+    try:
+        pairs = draw_pairs(participants, exclusions, single_cycle=single_cycle)
+    except ValueError as e:
+        logger.error("Ошибка жеребьевки в комнате %s: %s", room_id, e)
+        return False, str(e)
+
+    if not database.save_assignments(room_id, pairs):
+        return False, "Произошла ошибка при сохранении жеребьевки"
+
+    logger.info("Проведена жеребьевка в комнате %s: %s участников", room_id, len(pairs))
+    return True, "Жеребьевка проведена"
@@ -1,55 +1,151 @@
+"""Клавиатуры бота.
+
+Статичные клавиатуры создаются один раз при импорте, а клавиатуры с
+параметром (ID комнаты) - при первом запросе и хранятся в ограниченном
+кэше. Клавиатуры Telegram неизменяемы, поэтому один объект можно
+отправлять в любом количестве ответов; PrebuiltKeyboard к тому же
+преобразуется в словарь для запроса к Bot API только один раз.
+"""
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
+from config import KEYBOARD_CACHE_SIZE
+
+# Раскладка клавиатуры: ряды кнопок (текст, callback_data)
+Layout = Sequence[Sequence[Tuple[str, str]]]
+
+MAIN_MENU_LAYOUT: Layout = (
+    (("🎁 Создать комнату", "create_room"), ("🔍 Найти комнату", "join_room")),
+    (("📋 Мои комнаты", "list_rooms"), ("📝 Создать желание", "create_wish")),
+    (("✏️ Редактировать желание", "edit_wish"), ("📋 Список желаний", "list_wishes")),
+    (("❓ Помощь", "help"),),
+)
+ROOM_VERSION_LAYOUT: Layout = (
+    (("🎁 Бесплатная версия", "free_version"), ("✨ PRO версия", "pro_version")),
+    (("« Назад", "back_to_main"),),
+)
+WISH_ACTIONS_LAYOUT: Layout = (
+    (("➕ Добавить желание", "add_wish"), ("✏️ Изменить желание", "change_wish")),
+    (("🗑 Удалить желание", "delete_wish"), ("📋 Список желаний", "list_wishes")),
+    (("« Назад", "back_to_main"),),
+)
+WISH_MENU_LAYOUT: Layout = (
+    (("📝 Добавить желание", "add_wish"),),
+    (("✏️ Редактировать желания", "edit_wish"),),
+    (("📋 Мои желания", "list_wishes"),),
+)
+ROOM_CONTEXT_MENU_LAYOUT: Layout = (
+    (("🔙 Назад", "room_menu"),),
+    (("🏠 Главное меню", "main_menu"),),
+)
+
+
+class PrebuiltKeyboard(InlineKeyboardMarkup):
+    """InlineKeyboardMarkup, преобразуемая в словарь один раз.
+
+    to_dict() возвращает один и тот же словарь, изменять его нельзя.
+    """
+
+    __slots__ = ('_serialized',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._serialized = None
+
+    def to_dict(self, recursive: bool = True) -> Dict[str, Any]:
+        if not recursive:
+            return super().to_dict(recursive=False)
+        if self._serialized is None:
+            self._serialized = super().to_dict()
+        return self._serialized
+
+
+def build_keyboard(layout: Layout, markup_class=PrebuiltKeyboard) -> InlineKeyboardMarkup:
+    """Создает клавиатуру по раскладке"""
+    return markup_class([
+        [InlineKeyboardButton(text, callback_data=data) for text, data in row]
+        for row in layout
+    ])
+
+
+MAIN_MENU_KEYBOARD = build_keyboard(MAIN_MENU_LAYOUT)
+ROOM_VERSION_KEYBOARD = build_keyboard(ROOM_VERSION_LAYOUT)
+WISH_ACTIONS_KEYBOARD = build_keyboard(WISH_ACTIONS_LAYOUT)
+WISH_MENU_KEYBOARD = build_keyboard(WISH_MENU_LAYOUT)
+ROOM_CONTEXT_MENU_KEYBOARD = build_keyboard(ROOM_CONTEXT_MENU_LAYOUT)
+
 
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
-    """Создает основное меню бота"""
-    keyboard = [
-        [
-            InlineKeyboardButton("🎁 Создать комнату", callback_data="create_room"),
-            InlineKeyboardButton("🔍 Найти комнату", callback_data="join_room")
-        ],
-        [
-            InlineKeyboardButton("📋 Мои комнаты", callback_data="list_rooms"),
-            InlineKeyboardButton("📝 Создать желание", callback_data="create_wish")
-        ],
-        [
-            InlineKeyboardButton("✏️ Редактировать желание", callback_data="edit_wish"),
-            InlineKeyboardButton("📋 Список желаний", callback_data="list_wishes")
-        ],
-        [
-            InlineKeyboardButton("❓ Помощь", callback_data="help")
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    """Основное меню бота"""
+    return MAIN_MENU_KEYBOARD
 
 
 def get_room_version_keyboard() -> InlineKeyboardMarkup:
-    """Создает клавиатуру выбора версии комнаты"""
-    keyboard = [
-        [
-            InlineKeyboardButton("🎁 Бесплатная версия", callback_data="free_version"),
-            InlineKeyboardButton("✨ PRO версия", callback_data="pro_version")
-        ],
-        [
-            InlineKeyboardButton("« Назад", callback_data="back_to_main")
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    """Клавиатура выбора версии комнаты"""
+    return ROOM_VERSION_KEYBOARD
 
 
 def get_wish_actions_keyboard() -> InlineKeyboardMarkup:
-    """Создает клавиатуру действий с желаниями"""
-    keyboard = [
-        [
-            InlineKeyboardButton("➕ Добавить желание", callback_data="add_wish"),
-            InlineKeyboardButton("✏️ Изменить желание", callback_data="change_wish")
-        ],
-        [
-            InlineKeyboardButton("🗑 Удалить желание", callback_data="delete_wish"),
-            InlineKeyboardButton("📋 Список желаний", callback_data="list_wishes")
-        ],
-        [
-            InlineKeyboardButton("« Назад", callback_data="back_to_main")
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    """Клавиатура действий с желаниями"""
+    return WISH_ACTIONS_KEYBOARD
+
+
+def get_wish_menu_keyboard() -> InlineKeyboardMarkup:
+    """Меню желаний"""
+    return WISH_MENU_KEYBOARD
+
+
+def get_room_context_menu_keyboard() -> InlineKeyboardMarkup:
+    """Контекстное меню комнаты"""
+    return ROOM_CONTEXT_MENU_KEYBOARD
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_room_payment_keyboard(room_id: int) -> InlineKeyboardMarkup:
+    """Выбор типа доступа для созданной комнаты"""
+    return build_keyboard((
+        (
+            ("Оплатить полный доступ", f"pay_full_{room_id}"),
+            ("Остаться на бесплатной версии", f"stay_free_{room_id}"),
+        ),
+    ))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_confirm_join_keyboard(room_id: int) -> InlineKeyboardMarkup:
+    """Подтверждение присоединения к комнате"""
+    return build_keyboard(((("✅ Да", f"confirm_join_{room_id}"), ("❌ Нет", "cancel_join")),))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def get_confirm_delete_keyboard(room_id: int) -> InlineKeyboardMarkup:
+    """Подтверждение удаления комнаты"""
+    return build_keyboard((
+        (("✅ Да, удалить", f"confirm_delete_{room_id}"), ("❌ Нет, отмена", "cancel_delete")),
+    ))
+
+
+def get_page_buttons(prefix: str, page: Dict[str, Any]) -> List[InlineKeyboardButton]:
+    """
+    Кнопки перехода между страницами списка.
+
+    Курсор соседней страницы передается в callback_data:
+    {prefix}prev_<ID> и {prefix}next_<ID>.
+    """
+    buttons = []
+    if page['prev'] is not None:
+        buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"{prefix}prev_{page['prev']}"))
+    if page['next'] is not None:
+        buttons.append(InlineKeyboardButton("Далее ➡️", callback_data=f"{prefix}next_{page['next']}"))
+    return buttons
+
+
+def get_page_cursor(data: Optional[str], prefix: str) -> Tuple[Optional[int], Optional[int]]:
+    """Курсор из callback_data кнопки страницы: (after, before)"""
+    if data and data.startswith(f"{prefix}next_"):
+        return int(data[len(prefix) + 5:]), None
+    if data and data.startswith(f"{prefix}prev_"):
+        return None, int(data[len(prefix) + 5:])
+    return None, None
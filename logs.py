@@ -0,0 +1,150 @@
+"""Настройка логирования бота.
+
+Запись логов не блокирует цикл событий: обработчики кладут записи в
+очередь (AsyncQueueHandler), а форматирует и выводит их отдельный поток
+(QueueListener). Сообщение собирается из шаблона и аргументов
+(logger.info("Комната %s", room_id)) только в этом потоке и только для
+записей, прошедших фильтр уровня, поэтому отключенные уровни почти
+ничего не стоят.
+
+Уровни задаются в config.py (LOG_LEVEL и LOG_LEVELS для отдельных
+логгеров), частые сообщения можно прореживать (LOG_SAMPLE_EVERY), а
+LOG_FORMAT=json выводит каждую запись строкой JSON.
+"""
+import json
+import logging
+import queue
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_SAMPLE_EVERY
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Стандартные атрибуты LogRecord: все остальные пришли через extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'taskName'
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON с полями из extra="""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает одну из every записей с одинаковым шаблоном сообщения.
+
+    Предупреждения и ошибки (выше max_level) пропускаются всегда. Счетчики
+    хранятся для maxsize последних шаблонов: шаблон, которого давно не
+    было, считается заново.
+    """
+
+    def __init__(self, every: int, max_level: int = logging.INFO, maxsize: int = 1024):
+        super().__init__()
+        self.every = every
+        self.max_level = max_level
+        self.maxsize = maxsize
+        self._counts: 'OrderedDict[Tuple[str, object], int]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.every <= 1 or record.levelno > self.max_level:
+            return True
+        # Шаблон, а не готовое сообщение: аргументы не форматируются
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts.pop(key, 0)
+            self._counts[key] = count + 1
+            if len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+        return count % self.every == 0
+
+
+class AsyncQueueHandler(QueueHandler):
+    """QueueHandler, не форматирующий запись в вызывающем потоке.
+
+    Стандартный QueueHandler собирает сообщение перед постановкой в
+    очередь; здесь запись передается как есть и форматируется потоком
+    QueueListener. Поэтому аргументы сообщения не должны меняться после
+    вызова логгера.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def parse_levels(levels: str) -> Dict[str, str]:
+    """Разбирает LOG_LEVELS вида "httpx=WARNING,database=INFO" """
+    result = {}
+    for item in levels.split(','):
+        name, separator, level = item.partition('=')
+        if separator and name.strip():
+            result[name.strip()] = level.strip().upper()
+    return result
+
+
+def setup_logging(
+    level: str = LOG_LEVEL,
+    levels: str = LOG_LEVELS,
+    log_format: str = LOG_FORMAT,
+    sample_every: int = LOG_SAMPLE_EVERY,
+    stream=None
+) -> QueueListener:
+    """
+    Настраивает корневой логгер: очередь, уровни, прореживание и формат.
+
+    Args:
+        level: Уровень корневого логгера
+        levels: Уровни отдельных логгеров (см. parse_levels)
+        log_format: text или json
+        sample_every: Выводить одно из sample_every одинаковых сообщений
+            уровня INFO и ниже
+        stream: Куда выводить логи (по умолчанию stderr)
+
+    Returns:
+        QueueListener: поток вывода; stop() дописывает очередь
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    if log_format == 'json':
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    handler = AsyncQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SamplingFilter(sample_every))
+    listener = QueueListener(handler.queue, output, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    for name, logger_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(logger_level)
+
+    listener.start()
+    return listener
+
+
+def stop_logging(listener: Optional[QueueListener]) -> None:
+    """Дописывает оставшиеся в очереди записи"""
+    if listener is not None:
+        listener.stop()
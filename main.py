@@ -1,4 +1,5 @@
 import os
+import asyncio
 import logging
 from dotenv import load_dotenv
 from telegram import Update
@@ -6,7 +7,7 @@ from telegram.ext import (
     Application, CommandHandler, CallbackQueryHandler,
     MessageHandler, filters
 )
-from start import start_command, help_command, button_handler
+from start import start_command, help_command, button_handler, BUTTON_ACTIONS
 from rooms import (
     create_room_handler, join_room_handler, handle_room_code,
     handle_room_version, list_rooms, search_room, confirm_join_handler,
@@ -17,14 +18,20 @@ from wishes import (
     handle_wish_text, edit_wish_handler, handle_edit_wish_text,
     schedule_wishes, add_wish, list_wishes
 )
-from database import init_bd, switch_room, get_room_by_id
+from database import init_bd
+from async_database import switch_room, get_room_by_id
 from keyboards import get_main_menu_keyboard
-
-# Настройка логирования
-logging.basicConfig(
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.DEBUG
+from config import (
+    BOT_MODE, UPDATE_WORKERS, UPDATE_MAX_PENDING,
+    METRICS_ENABLED, METRICS_DUMP_PATH, METRICS_DUMP_INTERVAL
 )
+from dispatch import OrderedUpdateProcessor
+from routing import CallbackRouter
+from persistence import create_persistence
+from metrics import db_metrics
+from tracing import TracedRequest, instrument_application, tracer
+from logs import setup_logging, stop_logging
+
 logger = logging.getLogger(__name__)
 
 # Загрузка переменных окружения
@@ -35,6 +42,10 @@ TOKEN = os.getenv('BOT_TOKEN')
 if not TOKEN:
     raise ValueError("Не найден токен бота. Проверьте файл .env")
 
+# Типы обновлений, которые обрабатывает бот: команды и текст, нажатия
+# на кнопки. Остальные обновления Telegram не присылает
+ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+
 
 async def switch_room_handler(update: Update, context):
     """Обработчик переключения между комнатами"""
@@ -46,7 +57,7 @@ async def switch_room_handler(update: Update, context):
     user_id = query.from_user.id
     
     # Получаем информацию о комнате
-    room = get_room_by_id(room_id)
+    room = await get_room_by_id(room_id)
     if not room:
         await query.message.edit_text(
             "❌ Не удалось получить информацию о комнате.",
@@ -55,7 +66,7 @@ async def switch_room_handler(update: Update, context):
         return
     
     # Переключаем пользователя на указанную комнату
-    success = switch_room(user_id, room_id)
+    success = await switch_room(user_id, room_id)
     
     if success:
         await query.message.edit_text(
@@ -74,12 +85,12 @@ async def switch_room_handler(update: Update, context):
 
 async def message_handler(update: Update, context):
     """Обработчик всех текстовых сообщений"""
-    logger.info(f"Получено сообщение: {update.message.text}")
-    logger.info(
-        f"Состояние пользователя: {context.user_data.get('waiting_for')}"
+    logger.debug("Получено сообщение: %s", update.message.text)
+    logger.debug(
+        "Состояние пользователя: %s", context.user_data.get('waiting_for')
     )
-    logger.info(
-        f"Редактирование желания: {context.user_data.get('editing_wish_id')}"
+    logger.debug(
+        "Редактирование желания: %s", context.user_data.get('editing_wish_id')
     )
     
     # Если пользователь ожидает ввода кода комнаты
@@ -104,104 +115,143 @@ async def message_handler(update: Update, context):
     )
 
 
+def build_application(webhook: bool = False) -> Application:
+    """Создает приложение бота со всеми обработчиками"""
+    builder = Application.builder().token(TOKEN).concurrent_updates(
+        OrderedUpdateProcessor(UPDATE_WORKERS, UPDATE_MAX_PENDING)
+    )
+    persistence = create_persistence()
+    if persistence is not None:
+        builder = builder.persistence(persistence)
+    if webhook:
+        # Обновления приходят через webhook.py, getUpdates не нужен
+        builder = builder.updater(None)
+    elif METRICS_ENABLED:
+        # В режиме webhook сервер метрик запускает run_webhook
+        builder = builder.post_init(start_metrics).post_shutdown(stop_metrics)
+    if METRICS_ENABLED:
+        # Запросы к Bot API попадают в трассы обработчиков
+        builder = builder.request(TracedRequest(connection_pool_size=256))
+    application = builder.build()
+    register_handlers(application)
+    if METRICS_ENABLED:
+        instrument_application(application)
+        tracer.enable()
+    return application
+
+
+# Сервер метрик в режиме polling (не в bot_data: bot_data сохраняется)
+metrics_runner = None
+
+
+async def start_metrics(application: Application):
+    """Запускает сервер метрик в режиме polling"""
+    global metrics_runner
+    from webhook import start_metrics_server
+    metrics_runner = await start_metrics_server()
+
+
+async def stop_metrics(application: Application):
+    global metrics_runner
+    if metrics_runner is not None:
+        await metrics_runner.cleanup()
+        metrics_runner = None
+
+
+async def dump_metrics(context):
+    """Периодически выгружает метрики базы данных в JSON"""
+    db_metrics.dump_json(METRICS_DUMP_PATH, handlers=tracer.snapshot())
+
+
+def build_callback_router() -> CallbackRouter:
+    """Создает таблицу обработчиков нажатий на кнопки"""
+    router = CallbackRouter(fallback=button_handler)
+    
+    # Кнопки главного меню и желаний; обработчики ниже имеют приоритет
+    for data in BUTTON_ACTIONS:
+        router.add(data, button_handler)
+    router.add_prefix("edit_wish_", button_handler)
+    router.add_prefix("wishes_next_", edit_wish_handler, numeric=True)
+    router.add_prefix("wishes_prev_", edit_wish_handler, numeric=True)
+    
+    # Выбор версии комнаты и оплата
+    router.add("free_version", handle_room_version)
+    router.add("pro_version", handle_room_version)
+    router.add_prefix("pay_", handle_room_version)
+    router.add_prefix("stay_", handle_room_version)
+    
+    # Комнаты
+    router.add("list_rooms", list_rooms)
+    router.add_prefix("rooms_next_", list_rooms, numeric=True)
+    router.add_prefix("rooms_prev_", list_rooms, numeric=True)
+    router.add("cancel_join", search_room)
+    router.add("room_menu", handle_room_context_menu)
+    router.add("main_menu", handle_room_context_menu)
+    router.add_prefix("switch_room_", switch_room_handler, numeric=True)
+    router.add_prefix("confirm_join_", confirm_join_handler)
+    
+    # Удаление комнаты
+    router.add_prefix("delete_room_", delete_room_handler, numeric=True)
+    router.add_prefix("confirm_delete_", confirm_delete_handler, numeric=True)
+    router.add("cancel_delete", cancel_delete_handler)
+    return router
+
+
+def register_handlers(application: Application):
+    """Регистрирует обработчики команд, кнопок и сообщений"""
+    # Добавляем обработчики команд
+    application.add_handler(CommandHandler("start", start_command))
+    application.add_handler(CommandHandler("help", help_command))
+    application.add_handler(
+        CommandHandler("create_room", create_room_handler)
+    )
+    application.add_handler(
+        CommandHandler("join_room", join_room_handler)
+    )
+    application.add_handler(
+        CommandHandler("search_room", search_room)
+    )
+    
+    # Все нажатия на кнопки маршрутизируются одной таблицей
+    application.add_handler(CallbackQueryHandler(build_callback_router()))
+    
+    # Добавляем обработчик текстовых сообщений
+    application.add_handler(
+        MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler)
+    )
+    
+    # Запускаем планировщик рассылки желаний
+    application.job_queue.run_repeating(schedule_wishes, interval=86400)  # 24 часа
+    
+    if METRICS_ENABLED and METRICS_DUMP_PATH:
+        application.job_queue.run_repeating(dump_metrics, interval=METRICS_DUMP_INTERVAL)
+
+
 def main():
     """Основная функция запуска бота"""
+    # Настройка логирования (уровни и формат - в config.py)
+    log_listener = setup_logging()
     try:
         # Инициализация базы данных
         init_bd()
 
-        # Создаем приложение
-        application = Application.builder().token(TOKEN).build()
-
-        # Добавляем обработчики команд
-        application.add_handler(CommandHandler("start", start_command))
-        application.add_handler(CommandHandler("help", help_command))
-        application.add_handler(
-            CommandHandler("create_room", create_room_handler)
-        )
-        application.add_handler(
-            CommandHandler("join_room", join_room_handler)
-        )
-        application.add_handler(
-            CommandHandler("search_room", search_room)
-        )
-        
-        # Регистрируем обработчики callback-запросов
-        application.add_handler(
-            CallbackQueryHandler(
-                handle_room_version, 
-                pattern="^(free|pro)_version$"
-            )
-        )
-        application.add_handler(
-            CallbackQueryHandler(list_rooms, pattern="^list_rooms$")
-        )
-        application.add_handler(
-            CallbackQueryHandler(
-                switch_room_handler, 
-                pattern="^switch_room_\\d+$"
-            )
-        )
-        application.add_handler(
-            CallbackQueryHandler(
-                confirm_join_handler, 
-                pattern="^confirm_join_"
-            )
-        )
-        application.add_handler(
-            CallbackQueryHandler(search_room, pattern="^cancel_join$")
-        )
-        application.add_handler(
-            CallbackQueryHandler(
-                handle_room_version, 
-                pattern="^(pay|stay)_"
-            )
-        )
-        application.add_handler(
-            CallbackQueryHandler(
-                handle_room_context_menu,
-                pattern="^(room_menu|main_menu)$"
-            )
-        )
-        
-        # Добавляем обработчики для удаления комнаты
-        application.add_handler(
-            CallbackQueryHandler(
-                delete_room_handler,
-                pattern="^delete_room_\\d+$"
-            )
-        )
-        application.add_handler(
-            CallbackQueryHandler(
-                confirm_delete_handler,
-                pattern="^confirm_delete_\\d+$"
-            )
-        )
-        application.add_handler(
-            CallbackQueryHandler(
-                cancel_delete_handler,
-                pattern="^cancel_delete$"
-            )
-        )
-        
-        # Добавляем общий обработчик кнопок
-        application.add_handler(CallbackQueryHandler(button_handler))
-        
-        # Добавляем обработчик текстовых сообщений
-        application.add_handler(
-            MessageHandler(filters.TEXT & ~filters.COMMAND, message_handler)
-        )
-        
-        # Запускаем планировщик рассылки желаний
-        application.job_queue.run_repeating(schedule_wishes, interval=86400)  # 24 часа
-        
         # Запускаем бота
-        logger.info("Запускаем бота...")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        if BOT_MODE == 'webhook':
+            from webhook import run_webhook
+            
+            logger.info("Запускаем бота в режиме webhook...")
+            application = build_application(webhook=True)
+            asyncio.run(run_webhook(application, allowed_updates=ALLOWED_UPDATES))
+        else:
+            logger.info("Запускаем бота...")
+            application = build_application()
+            application.run_polling(allowed_updates=ALLOWED_UPDATES)
 
     except Exception as e:
-        logger.error(f"Критическая ошибка: {e}")
+        logger.error("Критическая ошибка: %s", e)
         raise
+    finally:
+        stop_logging(log_listener)
 
 
 if __name__ == '__main__':
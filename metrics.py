@@ -0,0 +1,203 @@
+"""Счетчики вызовов функций работы с базой данных.
+
+Для каждой функции database.py считаются вызовы, ошибки, SQL-запросы,
+возвращенные строки и гистограмма времени выполнения. Запросы
+приписываются функции через слушатели before/after_cursor_execute
+SQLAlchemy. Метрики отдаются в текстовом формате Prometheus
+(render_prometheus) или в JSON (snapshot, dump_json).
+
+Пока метрики выключены, слушатели не установлены, а обертка функции
+проверяет один флаг и сразу вызывает функцию.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы времени выполнения, секунды
+BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+
+class FunctionStats:
+    """Метрики одной функции"""
+
+    __slots__ = ('calls', 'errors', 'statements', 'sql_seconds', 'rows', 'seconds', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.statements = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.seconds = 0.0
+        # Последняя корзина - вызовы дольше BUCKETS[-1] (+Inf)
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds: float, rows: int, failed: bool) -> None:
+        self.calls += 1
+        self.errors += failed
+        self.rows += rows
+        self.seconds += seconds
+        self.buckets[bisect_left(BUCKETS, seconds)] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'statements': self.statements,
+            'sql_seconds': self.sql_seconds,
+            'rows': self.rows,
+            'seconds': self.seconds,
+            'buckets': dict(zip([*map(str, BUCKETS), '+Inf'], self.buckets)),
+        }
+
+
+class Metrics:
+    """Реестр метрик функций"""
+
+    def __init__(self, prefix: str = 'santa_db'):
+        self.prefix = prefix
+        self.enabled = False
+        self._functions: Dict[str, FunctionStats] = {}
+        self._lock = threading.Lock()
+        # Функция, выполняющаяся сейчас: ей приписываются SQL-запросы
+        self._current: ContextVar[Optional[FunctionStats]] = ContextVar(
+            f'{prefix}_current', default=None
+        )
+
+    def stats(self, name: str) -> FunctionStats:
+        function_stats = self._functions.get(name)
+        if function_stats is None:
+            with self._lock:
+                function_stats = self._functions.setdefault(name, FunctionStats())
+        return function_stats
+
+    def enable(self) -> None:
+        """Включает сбор метрик и устанавливает слушатели SQL-запросов"""
+        if self.enabled:
+            return
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        self.enabled = True
+
+    def disable(self) -> None:
+        """Выключает сбор метрик"""
+        if not self.enabled:
+            return
+        event.remove(Engine, 'before_cursor_execute', self._before_execute)
+        event.remove(Engine, 'after_cursor_execute', self._after_execute)
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._functions.clear()
+
+    # Время начала запроса хранится в контексте выполнения: контекст живет
+    # один запрос, поэтому при ошибке запроса ничего не остается на соединении
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, 'metrics_started', None)
+        if started is None:
+            # Метрики включили во время выполнения запроса
+            return
+        function_stats = self._current.get()
+        if function_stats is None:
+            function_stats = self.stats('<other>')
+        with self._lock:
+            function_stats.statements += 1
+            function_stats.sql_seconds += time.perf_counter() - started
+
+    def instrument(self, fn: Callable) -> Callable:
+        """Декоратор: считает вызовы функции, её SQL-запросы и время"""
+        name = fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return fn(*args, **kwargs)
+            function_stats = self.stats(name)
+            token = self._current.set(function_stats)
+            started = time.perf_counter()
+            failed = True
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._current.reset(token)
+                with self._lock:
+                    function_stats.observe(
+                        time.perf_counter() - started, _count_rows(result), failed
+                    )
+        return wrapper
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Метрики всех функций: имя функции -> значения"""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._functions.items())}
+
+    def dump_json(self, path: str, **sections: Any) -> None:
+        """Записывает метрики (и дополнительные разделы sections) в JSON-файл"""
+        data = {'timestamp': time.time(), 'functions': self.snapshot(), **sections}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2)
+
+    def render_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus"""
+        prefix = self.prefix
+        functions = self.snapshot()
+        lines = []
+        counters = (
+            ('calls_total', 'calls', '{}'),
+            ('errors_total', 'errors', '{}'),
+            ('statements_total', 'statements', '{}'),
+            ('statement_seconds_total', 'sql_seconds', '{:.6f}'),
+            ('rows_total', 'rows', '{}'),
+        )
+        # Строки одной метрики должны идти подряд после её # TYPE
+        for metric, key, value_format in counters:
+            lines.append(f'# TYPE {prefix}_{metric} counter')
+            for name, stats in functions.items():
+                value = value_format.format(stats[key])
+                lines.append(f'{prefix}_{metric}{{function="{name}"}} {value}')
+
+        lines.append(f'# TYPE {prefix}_duration_seconds histogram')
+        for name, stats in functions.items():
+            cumulative = 0
+            for bound, count in stats['buckets'].items():
+                cumulative += count
+                lines.append(
+                    f'{prefix}_duration_seconds_bucket{{function="{name}",le="{bound}"}} {cumulative}'
+                )
+            lines.append(f'{prefix}_duration_seconds_sum{{function="{name}"}} {stats["seconds"]:.6f}')
+            lines.append(f'{prefix}_duration_seconds_count{{function="{name}"}} {stats["calls"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _count_rows(result: Any) -> int:
+    """Сколько строк вернула функция: длина списка, 0 для пустого результата
+    и пары (успех, сообщение), 1 для остального"""
+    if isinstance(result, list):
+        return len(result)
+    if result is None or isinstance(result, (bool, tuple)):
+        return 0
+    return 1
+
+
+# Общий реестр метрик базы данных
+db_metrics = Metrics()
@@ -0,0 +1,234 @@
+"""Перенос данных между базами (например, из SQLite в PostgreSQL).
+
+Таблицы копируются в порядке зависимостей внешних ключей. Строки читаются
+потоком (серверный курсор в PostgreSQL) в порядке первичного ключа и
+вставляются пачками, каждая пачка фиксируется отдельной транзакцией.
+Поэтому прерванный перенос можно продолжить: копирование таблицы
+начинается после наибольшего ключа, уже записанного в целевую базу.
+
+Столбцы, образующие цикл внешних ключей (users.room_id -> rooms), сначала
+вставляются пустыми и заполняются отдельным проходом, когда скопированы
+все таблицы.
+
+Исходная база может быть создана старой версией бота: копируются только
+столбцы, которые есть в обеих базах, таблицы, которых нет в источнике,
+пропускаются, а счетчики комнат после переноса пересчитываются.
+"""
+import logging
+import time
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import Table, bindparam, func, inspect, select, tuple_
+from sqlalchemy.engine import Engine
+
+from database import Base, recount_room_counters, session_bind
+from db_engine import reset_sequences
+
+logger = logging.getLogger(__name__)
+
+# progress(таблица, скопировано строк, всего строк, секунд с начала таблицы)
+Progress = Callable[[str, int, int, float], None]
+
+
+def _deferred_columns(table: Table) -> List[str]:
+    """Столбцы с внешними ключами, создаваемыми отдельным ALTER (циклы)"""
+    return [
+        fk.parent.name for fk in table.foreign_keys
+        if fk.constraint is not None and fk.constraint.use_alter
+    ]
+
+
+def _key(table: Table) -> list:
+    return list(table.primary_key.columns)
+
+
+def _after_key(table: Table, key_values):
+    key = _key(table)
+    if len(key) == 1:
+        return key[0] > key_values[0]
+    return tuple_(*key) > tuple_(*key_values)
+
+
+def _last_copied_key(connection, table: Table) -> Optional[tuple]:
+    """Наибольший первичный ключ, уже записанный в таблицу"""
+    key = _key(table)
+    row = connection.execute(
+        select(*key).order_by(*[column.desc() for column in key]).limit(1)
+    ).first()
+    return tuple(row) if row else None
+
+
+def _source_columns(source: Engine) -> Dict[str, List[str]]:
+    """Таблица -> столбцы модели, которые есть и в исходной базе"""
+    inspector = inspect(source)
+    existing = set(inspector.get_table_names())
+    columns = {}
+    for table in Base.metadata.sorted_tables:
+        if table.name in existing:
+            names = {column['name'] for column in inspector.get_columns(table.name)}
+            columns[table.name] = [column.name for column in table.columns if column.name in names]
+    return columns
+
+
+def _stream(connection, query, chunk_size: int):
+    # stream_results: в PostgreSQL строки читаются серверным курсором,
+    # а не загружаются в память целиком
+    result = connection.execution_options(
+        stream_results=True, yield_per=chunk_size
+    ).execute(query)
+    for chunk in result.mappings().partitions(chunk_size):
+        yield [dict(row) for row in chunk]
+
+
+def copy_table(
+    source: Engine,
+    destination: Engine,
+    table: Table,
+    chunk_size: int = 5000,
+    progress: Optional[Progress] = None,
+    columns: Optional[List[str]] = None
+) -> int:
+    """
+    Копирует таблицу пачками, продолжая с последнего записанного ключа.
+
+    Args:
+        columns: Копируемые столбцы (по умолчанию все); остальные
+            получают значения по умолчанию
+
+    Returns:
+        int: Сколько строк скопировано за этот запуск
+    """
+    if columns is None:
+        columns = [column.name for column in table.columns]
+    deferred = [column for column in _deferred_columns(table) if column in columns]
+    with destination.connect() as connection:
+        last_key = _last_copied_key(connection, table)
+
+    query = select(*[table.c[column] for column in columns]).order_by(*_key(table))
+    count_query = select(func.count()).select_from(table)
+    if last_key is not None:
+        query = query.where(_after_key(table, last_key))
+        count_query = count_query.where(_after_key(table, last_key))
+
+    copied = 0
+    started = time.perf_counter()
+    with source.connect() as source_connection:
+        total = source_connection.execute(count_query).scalar()
+        for rows in _stream(source_connection, query, chunk_size):
+            for row in rows:
+                for column in deferred:
+                    row[column] = None
+            with destination.begin() as connection:
+                connection.execute(table.insert(), rows)
+            copied += len(rows)
+            if progress:
+                progress(table.name, copied, total, time.perf_counter() - started)
+    return copied
+
+
+def restore_deferred_columns(
+    source: Engine,
+    destination: Engine,
+    table: Table,
+    chunk_size: int = 5000,
+    columns: Optional[List[str]] = None
+) -> int:
+    """Заполняет столбцы, вставленные пустыми из-за цикла внешних ключей"""
+    deferred = _deferred_columns(table)
+    if columns is not None:
+        deferred = [column for column in deferred if column in columns]
+    if not deferred:
+        return 0
+    key = _key(table)
+    statement = table.update().where(
+        *[column == bindparam(f'key_{column.name}') for column in key]
+    ).values({column: bindparam(f'value_{column}') for column in deferred})
+
+    updated = 0
+    query = select(*key, *[table.c[column] for column in deferred]).where(
+        *[table.c[column].isnot(None) for column in deferred]
+    ).order_by(*key)
+    with source.connect() as source_connection:
+        for rows in _stream(source_connection, query, chunk_size):
+            with destination.begin() as connection:
+                connection.execute(statement, [
+                    {
+                        **{f'key_{column.name}': row[column.name] for column in key},
+                        **{f'value_{column}': row[column] for column in deferred},
+                    }
+                    for row in rows
+                ])
+            updated += len(rows)
+    return updated
+
+
+def migrate_database(
+    source: Engine,
+    destination: Engine,
+    chunk_size: int = 5000,
+    resume: bool = False,
+    progress: Optional[Progress] = None
+) -> Dict[str, int]:
+    """
+    Переносит все таблицы проекта из source в destination.
+
+    Args:
+        source: Движок исходной базы
+        destination: Движок целевой базы (таблицы создаются при необходимости)
+        chunk_size: Сколько строк читать и вставлять за раз
+        resume: Продолжить прерванный перенос; без этого флага целевые
+            таблицы должны быть пустыми
+        progress: Функция, вызываемая после каждой пачки
+
+    Returns:
+        Dict[str, int]: Таблица -> сколько строк скопировано за этот запуск
+    """
+    Base.metadata.create_all(destination)
+    source_columns = _source_columns(source)
+    tables = []
+    for table in Base.metadata.sorted_tables:
+        if table.name in source_columns:
+            tables.append(table)
+        else:
+            logger.warning("Таблицы %s нет в исходной базе, она не переносится", table.name)
+
+    if not resume:
+        with destination.connect() as connection:
+            filled = [
+                table.name for table in tables
+                if _last_copied_key(connection, table) is not None
+            ]
+        if filled:
+            raise ValueError(
+                f"Целевая база уже содержит данные ({', '.join(filled)}); "
+                f"для продолжения переноса используйте --resume"
+            )
+
+    copied = {}
+    for table in tables:
+        columns = source_columns[table.name]
+        missing = [column.name for column in table.columns if column.name not in columns]
+        if missing:
+            logger.warning(
+                "В таблице %s исходной базы нет столбцов %s, они получат значения по умолчанию",
+                table.name, ", ".join(missing)
+            )
+        copied[table.name] = copy_table(
+            source, destination, table, chunk_size, progress, columns
+        )
+        logger.info("Таблица %s: скопировано %s строк", table.name, copied[table.name])
+
+    # Повторный проход идемпотентен, поэтому при продолжении выполняется заново
+    for table in tables:
+        restore_deferred_columns(source, destination, table, chunk_size, source_columns[table.name])
+
+    with destination.begin() as connection:
+        reset_sequences(connection)
+        # Счетчики комнат и записи о членстве выводятся из скопированных
+        # таблиц; в базах старых версий их нет или они неполные
+        token = session_bind.set(connection)
+        try:
+            recount_room_counters()
+        finally:
+            session_bind.reset(token)
+    return copied
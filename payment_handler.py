@@ -1,4 +1,4 @@
-from database import grant_access, get_room_details
+from async_database import grant_access, get_room_details
 from telegram import Update
 from telegram.ext import ContextTypes
 
@@ -22,7 +22,7 @@ async def process_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         elif data.startswith('stay_free_'):
             room_id = data.split('_')[2]
             # Для бесплатной версии просто обновляем статус
-            grant_access(user_id, 'free')
+            await grant_access(user_id, 'free')
             if update.callback_query.message:
                 await update.callback_query.message.reply_text(
                     'Вы выбрали бесплатную версию.\n'
@@ -40,7 +40,7 @@ async def process_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         return
 
-    room_details = get_room_details(room_id)
+    room_details = await get_room_details(room_id)
     if not room_details:
         if update.message:
             await update.message.reply_text('Комната не найдена')
@@ -54,7 +54,7 @@ async def process_payment(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     # В тестовом режиме сразу предоставляем доступ
-    grant_access(user_id, 'paid')
+    await grant_access(user_id, 'paid')
     
     if update.callback_query:
         await update.callback_query.message.reply_text(
@@ -82,7 +82,7 @@ async def successful_payment(update: Update, context: ContextTypes.DEFAULT_TYPE)
     user_id = update.effective_user.id
     
     # Обновляем статус комнаты
-    grant_access(user_id, 'paid')
+    await grant_access(user_id, 'paid')
     
     if update.message:
         await update.message.reply_text(
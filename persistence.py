@@ -0,0 +1,225 @@
+"""Хранение context.user_data, chat_data и bot_data между перезапусками.
+
+PersistenceBackend реализует BasePersistence python-telegram-bot поверх
+хранилища ключ-значение: таблицы bot_state (SQLite или PostgreSQL через
+async_database) или Redis. Изменения не пишутся на каждое сообщение:
+приложение раз в update_interval передает измененные данные, они
+копятся в буфере и записываются одной пачкой, а данные, не изменившиеся
+с прошлой записи, пропускаются.
+
+Данные хранятся в JSON, поэтому поддерживается только состояние, которое
+переживает JSON без изменений: ключи словарей - строки, значения - строки,
+числа, bool, None, списки и словари. Для другого состояния update_*_data
+выбрасывает TypeError, а не сохраняет его искаженным.
+"""
+import asyncio
+import json
+import logging
+from copy import deepcopy
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import async_database
+from config import PERSISTENCE_BACKEND, PERSISTENCE_FLUSH_INTERVAL, REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+USER_DATA = 'user_data'
+CHAT_DATA = 'chat_data'
+BOT_DATA = 'bot_data'
+BOT_DATA_KEY = 'bot'
+
+
+class SqlStateStore:
+    """Хранилище в таблице bot_state"""
+
+    async def load(self, namespace: str) -> Dict[str, str]:
+        return await async_database.load_bot_state(namespace)
+
+    async def save(self, items: Dict[Tuple[str, str], Optional[str]]) -> bool:
+        return await async_database.save_bot_state(items)
+
+
+class RedisStateStore:
+    """Хранилище в Redis: хеш на каждое пространство имен"""
+
+    def __init__(self, client=None, url: Optional[str] = REDIS_URL, prefix: str = 'santa'):
+        """
+        Args:
+            client: Асинхронный клиент Redis (по умолчанию создается по url)
+            url: Адрес Redis
+            prefix: Префикс ключей
+        """
+        if client is None:
+            try:
+                from redis.asyncio import Redis
+            except ImportError as e:
+                raise ImportError("Для хранения состояния в Redis установите пакет redis") from e
+            client = Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+
+    def _name(self, namespace: str) -> str:
+        return f'{self.prefix}:{namespace}'
+
+    async def load(self, namespace: str) -> Dict[str, str]:
+        data = await self.client.hgetall(self._name(namespace))
+        return {
+            (key.decode() if isinstance(key, bytes) else key):
+            (value.decode() if isinstance(value, bytes) else value)
+            for key, value in data.items()
+        }
+
+    async def save(self, items: Dict[Tuple[str, str], Optional[str]]) -> bool:
+        pipeline = self.client.pipeline()
+        for (namespace, key), value in items.items():
+            if value is None:
+                pipeline.hdel(self._name(namespace), key)
+            else:
+                pipeline.hset(self._name(namespace), key, value)
+        await pipeline.execute()
+        return True
+
+
+class PersistenceBackend(BasePersistence):
+    """Persistence для user_data, chat_data и bot_data с отложенной записью"""
+
+    def __init__(self, store, update_interval: float = PERSISTENCE_FLUSH_INTERVAL):
+        """
+        Args:
+            store: Хранилище (SqlStateStore или RedisStateStore)
+            update_interval: Как часто (в секундах) сохранять изменения
+        """
+        super().__init__(
+            store_data=PersistenceInput(
+                user_data=True, chat_data=True, bot_data=True, callback_data=False
+            ),
+            update_interval=update_interval
+        )
+        self.store = store
+        self._pending: Dict[Tuple[str, str], Optional[str]] = {}
+        # Последние записанные значения, чтобы не перезаписывать неизмененные
+        self._saved: Dict[Tuple[str, str], Optional[str]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    async def _load(self, namespace: str) -> Dict[str, str]:
+        data = await self.store.load(namespace)
+        for key, value in data.items():
+            self._saved[(namespace, key)] = value
+        return data
+
+    async def _load_by_id(self, namespace: str) -> Dict[int, Any]:
+        return {
+            int(key): json.loads(value)
+            for key, value in (await self._load(namespace)).items()
+        }
+
+    def _stage(self, namespace: str, key: Any, data: Optional[Any]) -> None:
+        item = (namespace, str(key))
+        value = None if data is None else _dump(namespace, key, data)
+        if item not in self._pending and self._saved.get(item) == value:
+            return
+        self._pending[item] = value
+        # Приложение передает все изменения за интервал подряд; запись
+        # откладывается до конца этой пачки
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        """Запускает запись, если она еще не запланирована"""
+        task = self._flush_task
+        if task is None or task.done() or task is asyncio.current_task():
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return await self._load_by_id(USER_DATA)
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return await self._load_by_id(CHAT_DATA)
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        data = await self._load(BOT_DATA)
+        return json.loads(data[BOT_DATA_KEY]) if BOT_DATA_KEY in data else {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> Dict:
+        return {}
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        self._stage(USER_DATA, user_id, deepcopy(data))
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        self._stage(CHAT_DATA, chat_id, deepcopy(data))
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        self._stage(BOT_DATA, BOT_DATA_KEY, deepcopy(data))
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def update_conversation(self, name: str, key, new_state) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage(USER_DATA, user_id, None)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage(CHAT_DATA, chat_id, None)
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def flush(self) -> None:
+        """Записывает накопленные изменения одной пачкой"""
+        # Приложение вызывает flush при остановке, когда запись по таймеру
+        # может еще идти
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            try:
+                saved = await self.store.save(pending)
+            except Exception as e:
+                logger.error("Ошибка при сохранении состояния: %s", e)
+                saved = False
+            if not saved:
+                # Более новые изменения из буфера важнее несохраненных
+                self._pending = {**pending, **self._pending}
+                return
+            self._saved.update(pending)
+            logger.debug("Сохранено состояние для %s записей", len(pending))
+            # Изменения, пришедшие во время записи, не запланировали свою
+            if self._pending:
+                self._schedule_flush()
+
+
+def _dump(namespace: str, key: Any, data: Any) -> str:
+    """Сериализует состояние в JSON, проверяя, что оно читается обратно без изменений"""
+    try:
+        value = json.dumps(data, ensure_ascii=False)
+    except (TypeError, ValueError) as e:
+        raise TypeError(f"Состояние {namespace}/{key} не сохраняется в JSON: {e}") from e
+    if json.loads(value) != data:
+        raise TypeError(
+            f"Состояние {namespace}/{key} изменится при сохранении в JSON: ключи "
+            f"словарей должны быть строками, последовательности - списками"
+        )
+    return value
+
+
+def create_persistence() -> Optional[PersistenceBackend]:
+    """Создает persistence по PERSISTENCE_BACKEND из config.py"""
+    if PERSISTENCE_BACKEND == 'sql':
+        return PersistenceBackend(SqlStateStore())
+    if PERSISTENCE_BACKEND == 'redis':
+        return PersistenceBackend(RedisStateStore())
+    return None
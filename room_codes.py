@@ -0,0 +1,94 @@
+"""Выдача кодов комнат без проверочных запросов к базе.
+
+Код - это номер из общего счетчика, перемешанный сетью Фейстеля и
+записанный в алфавите A-Z0-9. Перестановка взаимно однозначна, поэтому
+разные номера всегда дают разные коды, а по соседним кодам нельзя
+угадать следующий. Номера резервируются в базе блоками (один UPDATE на
+блок), а редкие совпадения со старыми случайными кодами отсекает
+уникальный индекс rooms.code.
+"""
+import hashlib
+import string
+import threading
+from collections import deque
+from typing import Callable, Deque
+
+ALPHABET = string.ascii_uppercase + string.digits
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+# Сеть Фейстеля работает на 32 битах (две половины по 16 бит); значения
+# вне CODE_SPACE прогоняются через нее повторно
+HALF_BITS = 16
+HALF_MASK = (1 << HALF_BITS) - 1
+ROUNDS = 4
+
+
+def _round(value: int, round_index: int, secret: bytes) -> int:
+    digest = hashlib.blake2b(
+        value.to_bytes(2, 'big') + bytes([round_index]),
+        digest_size=2,
+        key=secret
+    ).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _feistel(value: int, secret: bytes) -> int:
+    left, right = value >> HALF_BITS, value & HALF_MASK
+    for round_index in range(ROUNDS):
+        left, right = right, left ^ _round(right, round_index, secret)
+    return (left << HALF_BITS) | right
+
+
+def permute(number: int, secret: bytes) -> int:
+    """Взаимно однозначно отображает [0, CODE_SPACE) на себя"""
+    if not 0 <= number < CODE_SPACE:
+        raise ValueError("Номер кода вне допустимого диапазона")
+    value = _feistel(number, secret)
+    while value >= CODE_SPACE:
+        value = _feistel(value, secret)
+    return value
+
+
+def encode(number: int) -> str:
+    """Записывает число в алфавите кодов комнат"""
+    chars = []
+    for _ in range(CODE_LENGTH):
+        number, index = divmod(number, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return ''.join(reversed(chars))
+
+
+class RoomCodeAllocator:
+    """Раздает коды из зарезервированного в базе блока номеров"""
+
+    def __init__(
+        self,
+        reserve: Callable[[int], range],
+        secret: str,
+        block_size: int = 100
+    ):
+        """
+        Args:
+            reserve: Функция, резервирующая в базе блок номеров заданного размера
+            secret: Ключ перестановки
+            block_size: Сколько номеров резервировать за раз
+        """
+        self.reserve = reserve
+        self.secret = hashlib.blake2b(secret.encode()).digest()[:16]
+        self.block_size = block_size
+        self._numbers: Deque[int] = deque()
+        self._lock = threading.Lock()
+
+    def next_code(self) -> str:
+        """Возвращает следующий код"""
+        with self._lock:
+            if not self._numbers:
+                self._numbers.extend(self.reserve(self.block_size))
+            number = self._numbers.popleft()
+        return encode(permute(number, self.secret))
+
+    def reset(self) -> None:
+        """Забывает зарезервированные номера (например, при смене базы)"""
+        with self._lock:
+            self._numbers.clear()
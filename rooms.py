@@ -1,17 +1,23 @@
 import random
 import string
 import logging
-from database import (
+from async_database import (
     create_room, count_users_in_room, add_user_to_room, user_has_room,
     room_exists, get_room_details, get_room_id_by_code,
-    get_all_rooms, generate_room_code, count_user_rooms, get_user_room,
-    get_room_users, update_room_version, get_user_rooms_count, MAX_ROOMS_PER_USER,
+    get_rooms_page, count_user_rooms, get_user_room,
+    get_room_users, update_room_version, get_user_rooms_count,
     get_user_wishes, get_user_by_telegram_id, get_room_by_id, check_user_in_room,
-    switch_room, get_room_by_code, can_join_room, join_room
+    switch_room, get_room_by_code, delete_room,
+    join_room as db_join_room
 )
+from database import MAX_ROOMS_PER_USER
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from keyboards import get_main_menu_keyboard, get_room_version_keyboard
+from keyboards import (
+    get_main_menu_keyboard, get_room_version_keyboard, get_page_buttons, get_page_cursor,
+    get_room_context_menu_keyboard, get_room_payment_keyboard, get_confirm_join_keyboard,
+    get_confirm_delete_keyboard
+)
 from config import FREE_MAX_USERS, PRO_MAX_USERS
 
 # Настройка логирования
@@ -19,17 +25,13 @@ logger = logging.getLogger(__name__)
 
 
 def get_room_context_menu():
-    """Создает контекстное меню для комнаты"""
-    keyboard = [
-        [InlineKeyboardButton("🔙 Назад", callback_data="room_menu")],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data="main_menu")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    """Контекстное меню для комнаты"""
+    return get_room_context_menu_keyboard()
 
 
 async def create_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды создания комнаты"""
-    logger.info("Вызван обработчик создания комнаты")
+    logger.debug("Вызван обработчик создания комнаты")
     
     if not update.effective_user:
         if update.message:
@@ -39,17 +41,16 @@ async def create_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
 
     user_id = update.effective_user.id
-    room_name = ' '.join(context.args) if context.args else f'Комната {generate_room_code()}'
 
-    if user_has_room(user_id):
+    if await user_has_room(user_id):
         if update.message:
             await update.message.reply_text("Вы уже создали комнату!")
         return
 
-    logger.info(f"Создание комнаты пользователем {user_id}")
-    room_id = create_room(name=room_name, creator_id=user_id, max_participants=5)
+    logger.debug("Создание комнаты пользователем %s", user_id)
+    room_id = await create_room(user_id)
     
-    if room_id == 0:
+    if not room_id:
         if update.message:
             await update.message.reply_text(
                 "Произошла ошибка при создании комнаты. Попробуйте позже."
@@ -57,7 +58,7 @@ async def create_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     
     # Получаем детали комнаты
-    room = get_room_details(room_id)
+    room = await get_room_details(room_id)
     if not room:
         if update.message:
             await update.message.reply_text(
@@ -65,19 +66,8 @@ async def create_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
         return
     
-    keyboard = [
-        [
-            InlineKeyboardButton(
-                "Оплатить полный доступ", 
-                callback_data=f"pay_full_{room_id}"
-            ),
-            InlineKeyboardButton(
-                "Остаться на бесплатной версии", 
-                callback_data=f"stay_free_{room_id}"
-            )
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    room_name = ' '.join(context.args) if context.args else room['name']
+    reply_markup = get_room_payment_keyboard(room_id)
     
     if update.message:
         await update.message.reply_text(
@@ -90,23 +80,22 @@ async def create_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 async def create_room_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик callback-запроса создания комнаты"""
-    logger.info("Вызван callback-обработчик создания комнаты")
+    logger.debug("Вызван callback-обработчик создания комнаты")
     
     if not update.effective_user:
         return
 
     user_id = update.effective_user.id
-    room_name = f'Комната {generate_room_code()}'
 
-    if user_has_room(user_id):
+    if await user_has_room(user_id):
         if update.callback_query:
             await update.callback_query.message.reply_text("Вы уже создали комнату!")
         return
 
-    logger.info(f"Создание комнаты пользователем {user_id} через callback")
-    room_id = create_room(room_name, user_id, max_participants=5)
+    logger.debug("Создание комнаты пользователем %s через callback", user_id)
+    room_id = await create_room(user_id)
     
-    if room_id == 0:
+    if not room_id:
         if update.callback_query:
             await update.callback_query.message.reply_text(
                 "Произошла ошибка при создании комнаты. Попробуйте позже."
@@ -114,7 +103,7 @@ async def create_room_callback(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     # Получаем детали комнаты
-    room = get_room_details(room_id)
+    room = await get_room_details(room_id)
     if not room:
         if update.callback_query:
             await update.callback_query.message.reply_text(
@@ -122,17 +111,11 @@ async def create_room_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             )
         return
     
-    keyboard = [
-        [
-            InlineKeyboardButton("Оплатить полный доступ", callback_data=f"pay_full_{room_id}"),
-            InlineKeyboardButton("Остаться на бесплатной версии", callback_data=f"stay_free_{room_id}")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+    reply_markup = get_room_payment_keyboard(room_id)
     
     if update.callback_query:
         await update.callback_query.message.reply_text(
-            f'Вы создали комнату "{room_name}", поздравляем!!\n'
+            f'Вы создали комнату "{room["name"]}", поздравляем!!\n'
             f'Друзья ждут вас, поделитесь с ними кодом: {room["code"]}\n\n'
             'Выберите тип доступа:',
             reply_markup=reply_markup
@@ -147,7 +130,7 @@ async def join_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     user_id = update.effective_user.id
-    logger.info(f"Попытка присоединения к комнате пользователем {user_id}")
+    logger.debug("Попытка присоединения к комнате пользователем %s", user_id)
     
     # Обработка команды /join_room
     if update.message and update.message.text.startswith('/join_room'):
@@ -161,43 +144,34 @@ async def join_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Обработка введенного кода комнаты
     if update.message and context.user_data.get('waiting_for') == 'room_join':
         room_code = update.message.text.strip().upper()
-        logger.info(f"Поиск комнаты с кодом: {room_code}")
+        logger.debug("Поиск комнаты с кодом: %s", room_code)
         
         # Ищем комнату по коду
-        room = get_room_by_code(room_code)
+        room = await get_room_by_code(room_code)
         
         if not room:
-            logger.info(f"Комната с кодом {room_code} не найдена")
+            logger.debug("Комната с кодом %s не найдена", room_code)
             await update.message.reply_text(
                 "❌ Комната не найдена. Проверьте код и попробуйте снова.",
                 reply_markup=get_main_menu_keyboard()
             )
             return
             
-        logger.info(f"Найдена комната: {room}")
+        logger.debug("Найдена комната: %s", room)
         
-        # Проверяем возможность подключения
-        can_join, message = can_join_room(room['id'], user_id)
-        if not can_join:
-            logger.info(f"Пользователь {user_id} не может присоединиться к комнате {room['id']}: {message}")
-            await update.message.reply_text(
-                f"❌ {message}",
-                reply_markup=get_main_menu_keyboard()
-            )
-            return
-            
-        # Присоединяем пользователя к комнате
-        success, message = join_room(room['id'], user_id)
+        # Присоединяем пользователя к комнате: проверка лимитов и
+        # присоединение выполняются одной транзакцией
+        success, message = await db_join_room(room['id'], user_id)
         if success:
-            logger.info(f"Пользователь {user_id} успешно присоединился к комнате {room['id']}")
+            logger.info("Пользователь %s успешно присоединился к комнате %s", user_id, room['id'])
             await update.message.reply_text(
                 f'✅ Вы успешно присоединились к комнате!\n'
                 f'Код комнаты: {room["code"]}\n'
-                f'Участников: {room["current_participants"]}/{room["max_participants"]}',
+                f'Участников: {room["current_participants"] + 1}/{room["max_participants"]}',
                 reply_markup=get_room_context_menu()
             )
         else:
-            logger.error(f"Ошибка при присоединении пользователя {user_id} к комнате {room['id']}: {message}")
+            logger.error("Ошибка при присоединении пользователя %s к комнате %s: %s", user_id, room['id'], message)
             await update.message.reply_text(
                 f"❌ {message}",
                 reply_markup=get_main_menu_keyboard()
@@ -209,7 +183,7 @@ async def join_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def join_room_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик подключения к комнате по callback_data"""
-    logger.info("Вызван обработчик подключения к комнате по callback")
+    logger.debug("Вызван обработчик подключения к комнате по callback")
     
     if not update.effective_user:
         if update.callback_query:
@@ -223,12 +197,12 @@ async def join_room_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Получаем ID комнаты из callback_data
     room_id = int(query.data.split('_')[2])
-    logger.info(
-        f"Пользователь {user_id} пытается подключиться к комнате {room_id}"
+    logger.debug(
+        "Пользователь %s пытается подключиться к комнате %s", user_id, room_id
     )
     
     # Проверяем существование комнаты
-    room = get_room_details(room_id)
+    room = await get_room_details(room_id)
     if not room:
         await query.message.reply_text(
             '❌ Комната не найдена. Возможно, она была удалена.'
@@ -236,7 +210,7 @@ async def join_room_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     # Проверяем, не состоит ли пользователь уже в этой комнате
-    user_room = get_user_room(user_id)
+    user_room = await get_user_room(user_id)
     if user_room['room_id'] == room_id:
         await query.message.reply_text(
             '❌ Вы уже состоите в этой комнате.'
@@ -244,7 +218,7 @@ async def join_room_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     # Проверяем, не превышен ли лимит комнат для пользователя
-    user_rooms_count = count_user_rooms(user_id)
+    user_rooms_count = await count_user_rooms(user_id)
     if user_rooms_count >= 3:
         await query.message.reply_text(
             '❌ Вы достигли лимита комнат (максимум 3). '
@@ -253,12 +227,12 @@ async def join_room_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return
     
     # Подключаем пользователя к комнате
-    success = add_user_to_room(room_id, user_id)
+    success = await add_user_to_room(room_id, user_id)
     if success:
         await query.message.reply_text(
             f'✅ Вы успешно подключились к комнате "{room["name"]}"!\n'
             f'🔑 Код комнаты: {room["code"]}\n'
-            f'👥 Участников: {count_users_in_room(room_id)}/'
+            f'👥 Участников: {await count_users_in_room(room_id)}/'
             f'{room["max_participants"]}'
         )
     else:
@@ -270,7 +244,7 @@ async def join_room_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 async def room_info_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды информации о комнате"""
-    logger.info("Вызван обработчик информации о комнате")
+    logger.debug("Вызван обработчик информации о комнате")
     
     room_id = context.args[0] if context.args else None
     if not room_id:
@@ -278,7 +252,7 @@ async def room_info_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text('Укажите код комнаты: /room_info *код*')
         return
 
-    details = get_room_details(room_id)
+    details = await get_room_details(room_id)
     if details:
         status = "Платная" if details["is_paid"] else "Бесплатная"
         if update.message:
@@ -303,7 +277,7 @@ async def handle_room_creation(update: Update, context: ContextTypes.DEFAULT_TYP
         user_id = update.effective_user.id
         rooms_count = await get_user_rooms_count(user_id)
         
-        logger.info(f"Пользователь {user_id} имеет {rooms_count} комнат, лимит {MAX_ROOMS_PER_USER}")
+        logger.debug("Пользователь %s имеет %s комнат, лимит %s", user_id, rooms_count, MAX_ROOMS_PER_USER)
         
         if rooms_count >= MAX_ROOMS_PER_USER:
             await query.message.edit_text(
@@ -342,7 +316,7 @@ async def handle_room_creation(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         
     except Exception as e:
-        logger.error(f"Error in handle_room_creation: {e}")
+        logger.error("Error in handle_room_creation: %s", e)
         await query.message.edit_text(
             "❌ Произошла ошибка при создании комнаты. "
             "Пожалуйста, попробуйте позже.",
@@ -371,7 +345,7 @@ async def handle_room_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
     room_code = update.message.text.upper()
     
     # Получаем ID комнаты по коду
-    room_id = get_room_id_by_code(room_code)
+    room_id = await get_room_id_by_code(room_code)
     if not room_id:
         await update.message.reply_text(
             "❌ Комната с таким кодом не найдена. "
@@ -380,14 +354,14 @@ async def handle_room_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Проверяем, существует ли комната
-    if not room_exists(room_id):
+    if not await room_exists(room_id):
         await update.message.reply_text(
             "❌ Комната не найдена. Возможно, она была удалена."
         )
         return
     
     # Проверяем, не состоит ли пользователь уже в комнате
-    if user_has_room(user_id):
+    if await user_has_room(user_id):
         await update.message.reply_text(
             "❌ Вы уже состоите в комнате. "
             "Покините текущую комнату, чтобы присоединиться к другой."
@@ -395,8 +369,8 @@ async def handle_room_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Проверяем количество участников
-    users_count = count_users_in_room(room_id)
-    room = get_room_details(room_id)
+    users_count = await count_users_in_room(room_id)
+    room = await get_room_details(room_id)
     
     if users_count >= room['max_participants']:
         await update.message.reply_text(
@@ -405,11 +379,11 @@ async def handle_room_code(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     
     # Добавляем пользователя в комнату
-    success = add_user_to_room(room_id, user_id)
+    success = await add_user_to_room(room_id, user_id)
     if success:
         # Получаем обновленную информацию о комнате
-        room = get_room_details(room_id)
-        users_count = count_users_in_room(room_id)
+        room = await get_room_details(room_id)
+        users_count = await count_users_in_room(room_id)
         
         await update.message.reply_text(
             f"✅ Вы успешно присоединились к комнате!\n\n"
@@ -442,7 +416,7 @@ async def handle_room_version(update: Update, context: ContextTypes.DEFAULT_TYPE
     elif callback_data == "pro_version":
         version = "pro"
     else:
-        logger.error(f"Неизвестная версия комнаты: {callback_data}")
+        logger.error("Неизвестная версия комнаты: %s", callback_data)
         await query.message.edit_text(
             "Произошла ошибка при выборе версии комнаты. Пожалуйста, попробуйте снова.",
             reply_markup=get_main_menu_keyboard()
@@ -460,7 +434,7 @@ async def handle_room_version(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     try:
         # Получаем информацию о комнате, чтобы вывести её код
-        room_info = get_room_details(room_id)
+        room_info = await get_room_details(room_id)
         if not room_info:
             await query.message.edit_text(
                 "Произошла ошибка при получении информации о комнате. Пожалуйста, попробуйте снова.",
@@ -498,7 +472,7 @@ async def handle_room_version(update: Update, context: ContextTypes.DEFAULT_TYPE
         context.user_data.pop('creating_room_id', None)
         
     except Exception as e:
-        logger.error(f"Error in handle_room_version: {e}")
+        logger.error("Error in handle_room_version: %s", e)
         await query.message.edit_text(
             "Произошла ошибка при создании комнаты. Пожалуйста, попробуйте снова.",
             reply_markup=get_main_menu_keyboard()
@@ -506,8 +480,8 @@ async def handle_room_version(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 async def list_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Показывает список комнат пользователя"""
-    logger.info("Вызван обработчик списка комнат")
+    """Показывает страницу списка комнат пользователя (rooms_next_/rooms_prev_ - соседние)"""
+    logger.debug("Вызван обработчик списка комнат")
     
     if not update.effective_user:
         if update.callback_query:
@@ -517,9 +491,15 @@ async def list_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     
     try:
-        # Получаем список комнат пользователя
-        rooms = get_all_rooms(user_id)
-        logger.info(f"Найдено комнат: {len(rooms)}")
+        # Получаем страницу списка комнат пользователя
+        data = update.callback_query.data if update.callback_query else None
+        after, before = get_page_cursor(data, "rooms_")
+        page = await get_rooms_page(user_id, after=after, before=before)
+        if not page['items'] and (after or before):
+            # Комнаты страницы удалены - показываем первую страницу
+            page = await get_rooms_page(user_id)
+        rooms = page['items']
+        logger.debug("Найдено комнат: %s", len(rooms))
         
         if not rooms:
             text = "У вас пока нет комнат. Создайте новую комнату или присоединитесь к существующей!"
@@ -533,7 +513,7 @@ async def list_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Создаем клавиатуру с кнопками для каждой комнаты
         keyboard = []
-        for i, room in enumerate(rooms, 1):
+        for room in rooms:
             # Проверяем наличие всех необходимых полей
             room_name = room.get('name', 'Без названия')
             room_code = room.get('code', 'Нет кода')
@@ -554,7 +534,7 @@ async def list_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
             status_text = f" ({', '.join(status)})" if status else ""
             
             message += (
-                f"{i}. {room_name}{status_text}\n"
+                f"🏠 {room_name}{status_text}\n"
                 f"   🔑 Код: {room_code}\n"
                 f"   👥 Участников: {current_users}/{max_participants}\n"
                 f"   {'💎 PRO' if is_paid else '🆓 Бесплатная'}\n\n"
@@ -568,7 +548,10 @@ async def list_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
             ])
             
-        # Добавляем кнопку возврата в главное меню
+        # Кнопки соседних страниц и возврата в главное меню
+        page_buttons = get_page_buttons("rooms_", page)
+        if page_buttons:
+            keyboard.append(page_buttons)
         keyboard.append([InlineKeyboardButton("🔙 Назад", callback_data="main_menu")])
         
         if update.callback_query:
@@ -583,7 +566,7 @@ async def list_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             
     except Exception as e:
-        logger.error(f"Ошибка при получении списка комнат: {str(e)}")
+        logger.error("Ошибка при получении списка комнат: %s", e)
         text = "❌ Произошла ошибка при получении списка комнат. Пожалуйста, попробуйте позже."
         if update.callback_query:
             await update.callback_query.message.edit_text(text, reply_markup=get_main_menu_keyboard())
@@ -593,7 +576,7 @@ async def list_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def search_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Поиск комнаты по коду"""
-    logger.info("Вызван обработчик поиска комнаты")
+    logger.debug("Вызван обработчик поиска комнаты")
     
     if not update.effective_user:
         if update.message:
@@ -614,9 +597,9 @@ async def search_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Обработка введенного кода комнаты
     if update.message and context.user_data.get('waiting_for') == 'room_search':
         room_code = update.message.text.strip().upper()
-        logger.info(f"Поиск комнаты с кодом: {room_code}")
+        logger.debug("Поиск комнаты с кодом: %s", room_code)
         
-        room_id = get_room_id_by_code(room_code)
+        room_id = await get_room_id_by_code(room_code)
         if not room_id:
             await update.message.reply_text(
                 '❌ Комната не найдена. Проверьте код и попробуйте снова.',
@@ -625,7 +608,7 @@ async def search_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data.pop('waiting_for', None)
             return
         
-        room_details = get_room_details(room_id)
+        room_details = await get_room_details(room_id)
         if not room_details:
             await update.message.reply_text(
                 '❌ Ошибка при получении информации о комнате',
@@ -644,17 +627,9 @@ async def search_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Хотите присоединиться к этой комнате?"
         )
 
-        # Создаем клавиатуру с кнопками подтверждения
-        keyboard = [
-            [
-                InlineKeyboardButton("✅ Да", callback_data=f"confirm_join_{room_id}"),
-                InlineKeyboardButton("❌ Нет", callback_data="cancel_join")
-            ]
-        ]
-        
         await update.message.reply_text(
             message,
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=get_confirm_join_keyboard(room_id)
         )
         context.user_data.pop('waiting_for', None)
 
@@ -669,7 +644,7 @@ async def confirm_join_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         
         # Проверяем количество комнат пользователя
         rooms_count = await get_user_rooms_count(user_id)
-        logger.info(f"Пользователь {user_id} имеет {rooms_count} комнат, лимит {MAX_ROOMS_PER_USER}")
+        logger.debug("Пользователь %s имеет %s комнат, лимит %s", user_id, rooms_count, MAX_ROOMS_PER_USER)
         
         if rooms_count >= MAX_ROOMS_PER_USER:
             await query.message.edit_text(
@@ -681,7 +656,7 @@ async def confirm_join_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             return
         
         # Получаем актуальную информацию о комнате
-        room = get_room_details(room_id)
+        room = await get_room_details(room_id)
         if not room:
             await query.message.edit_text(
                 '❌ Комната больше не существует',
@@ -698,7 +673,7 @@ async def confirm_join_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             return
         
         # Проверяем, не состоит ли пользователь уже в этой комнате
-        user_room = get_user_room(user_id)
+        user_room = await get_user_room(user_id)
         if user_room and user_room['id'] == room_id:
             await query.message.edit_text(
                 '❌ Вы уже состоите в этой комнате',
@@ -707,7 +682,7 @@ async def confirm_join_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             return
             
         # Добавляем пользователя в комнату
-        if add_user_to_room(room_id, user_id):
+        if await add_user_to_room(room_id, user_id):
             await query.message.edit_text(
                 f"✅ Вы успешно присоединились к комнате!\n"
                 f"🏠 Название: {room['name']}\n"
@@ -721,7 +696,7 @@ async def confirm_join_handler(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             
     except Exception as e:
-        logger.error(f"Ошибка при присоединении к комнате: {str(e)}")
+        logger.error("Ошибка при присоединении к комнате: %s", e)
         await query.message.edit_text(
             '❌ Произошла ошибка при обработке запроса',
             reply_markup=get_main_menu_keyboard()
@@ -733,7 +708,7 @@ async def handle_room_context_menu(update: Update, context: ContextTypes.DEFAULT
     await query.answer()
     
     action = query.data
-    logger.info(f"Получен callback_data: {action}")
+    logger.debug("Получен callback_data: %s", action)
     
     if action == "room_menu":
         # Возвращаемся в меню комнаты
@@ -758,10 +733,10 @@ async def delete_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
         room_id = int(query.data.split('_')[2])
         user_id = query.from_user.id
         
-        logger.info(f"Попытка удаления комнаты {room_id} пользователем {user_id}")
+        logger.info("Попытка удаления комнаты %s пользователем %s", room_id, user_id)
         
         # Получаем информацию о комнате
-        room_info = get_room_details(room_id)
+        room_info = await get_room_details(room_id)
         if not room_info:
             await query.message.edit_text(
                 "❌ Комната не найдена. Возможно, она уже удалена.",
@@ -774,16 +749,11 @@ async def delete_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             f"🗑️ Вы действительно хотите удалить комнату '{room_info['name']}'?\n\n"
             "⚠️ Это действие нельзя отменить. "
             "Все желания пользователей в комнате будут удалены.",
-            reply_markup=InlineKeyboardMarkup([
-                [
-                    InlineKeyboardButton("✅ Да, удалить", callback_data=f"confirm_delete_{room_id}"),
-                    InlineKeyboardButton("❌ Нет, отмена", callback_data="cancel_delete")
-                ]
-            ])
+            reply_markup=get_confirm_delete_keyboard(room_id)
         )
         
     except Exception as e:
-        logger.error(f"Ошибка при подготовке к удалению комнаты: {e}")
+        logger.error("Ошибка при подготовке к удалению комнаты: %s", e)
         await query.message.edit_text(
             "❌ Произошла ошибка при обработке запроса. Пожалуйста, попробуйте позже.",
             reply_markup=get_main_menu_keyboard()
@@ -800,11 +770,10 @@ async def confirm_delete_handler(update: Update, context: ContextTypes.DEFAULT_T
         room_id = int(query.data.split('_')[2])
         user_id = query.from_user.id
         
-        logger.info(f"Подтверждено удаление комнаты {room_id} пользователем {user_id}")
+        logger.info("Подтверждено удаление комнаты %s пользователем %s", room_id, user_id)
         
         # Удаляем комнату
-        from database import delete_room
-        if delete_room(room_id, user_id):
+        if await delete_room(room_id, user_id):
             await query.message.edit_text(
                 "✅ Комната успешно удалена.",
                 reply_markup=get_main_menu_keyboard()
@@ -816,7 +785,7 @@ async def confirm_delete_handler(update: Update, context: ContextTypes.DEFAULT_T
             )
             
     except Exception as e:
-        logger.error(f"Ошибка при удалении комнаты: {e}")
+        logger.error("Ошибка при удалении комнаты: %s", e)
         await query.message.edit_text(
             "❌ Произошла ошибка при удалении комнаты. Пожалуйста, попробуйте позже.",
             reply_markup=get_main_menu_keyboard()
@@ -846,11 +815,11 @@ async def switch_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     try:
         # Переключаем пользователя на выбранную комнату
-        success = switch_room(user_id, room_id)
+        success = await switch_room(user_id, room_id)
         
         if success:
             # Получаем информацию о комнате
-            room = get_room_by_id(room_id)
+            room = await get_room_by_id(room_id)
             if room:
                 message = (
                     f"✅ Вы переключились на комнату {room['name']}\n"
@@ -874,7 +843,7 @@ async def switch_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
             )
             
     except Exception as e:
-        logger.error(f"Ошибка при переключении комнаты: {str(e)}")
+        logger.error("Ошибка при переключении комнаты: %s", e)
         await query.message.edit_text(
             "❌ Произошла ошибка при переключении комнаты",
             reply_markup=get_main_menu_keyboard()
@@ -0,0 +1,90 @@
+"""Маршрутизация нажатий на кнопки по callback_data.
+
+Вместо цепочки CallbackQueryHandler с регулярными выражениями, которую
+каждое нажатие проходит по порядку, используется одна таблица: точные
+значения callback_data ищутся в словаре, а для значений с параметром
+(switch_room_5, edit_wish_12) - префикс до последнего '_' и короче.
+Число '_' в callback_data ограничено, поэтому поиск занимает O(1).
+"""
+import logging
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable]
+
+
+class CallbackRouter:
+    """Таблица обработчиков callback_data"""
+
+    def __init__(self, fallback: Optional[Handler] = None):
+        """
+        Args:
+            fallback: Обработчик для callback_data, не найденных в таблице
+        """
+        self.fallback = fallback
+        self._exact: Dict[str, Handler] = {}
+        self._prefixes: Dict[str, Tuple[Handler, bool]] = {}
+
+    def add(self, data: str, handler: Handler) -> None:
+        """Регистрирует обработчик для точного значения callback_data"""
+        self._exact[data] = handler
+
+    def add_prefix(self, prefix: str, handler: Handler, numeric: bool = False) -> None:
+        """
+        Регистрирует обработчик для callback_data, начинающихся с prefix.
+
+        Args:
+            prefix: Префикс, заканчивающийся на '_'
+            handler: Обработчик
+            numeric: Параметр после префикса должен быть числом
+        """
+        if not prefix.endswith('_'):
+            raise ValueError("Префикс callback_data должен заканчиваться на '_'")
+        self._prefixes[prefix] = (handler, numeric)
+
+    def wrap_handlers(self, wrapper: Callable[[Handler], Handler]) -> None:
+        """Оборачивает все обработчики таблицы (например, для трассировки)"""
+        wrapped: Dict[Handler, Handler] = {}
+
+        def wrap(handler: Handler) -> Handler:
+            if handler not in wrapped:
+                wrapped[handler] = wrapper(handler)
+            return wrapped[handler]
+
+        self._exact = {data: wrap(handler) for data, handler in self._exact.items()}
+        self._prefixes = {
+            prefix: (wrap(handler), numeric)
+            for prefix, (handler, numeric) in self._prefixes.items()
+        }
+        if self.fallback is not None:
+            self.fallback = wrap(self.fallback)
+
+    def resolve(self, data: Optional[str]) -> Optional[Handler]:
+        """Находит обработчик для callback_data (без учета fallback)"""
+        if data is None:
+            return None
+        handler = self._exact.get(data)
+        if handler is not None:
+            return handler
+
+        head = data
+        while True:
+            head, separator, _ = head.rpartition('_')
+            if not separator:
+                return None
+            entry = self._prefixes.get(head + '_')
+            if entry is not None:
+                handler, numeric = entry
+                if not numeric or data[len(head) + 1:].isdigit():
+                    return handler
+
+    async def __call__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        handler = self.resolve(update.callback_query.data) or self.fallback
+        if handler is None:
+            logger.warning("Нет обработчика для callback_data %s", update.callback_query.data)
+            return
+        return await handler(update, context)
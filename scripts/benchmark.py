@@ -0,0 +1,543 @@
+"""Бенчмарки функций работы с базой данных."""
+import os
+import sys
+import tempfile
+import time
+
+# Добавляем корневую директорию проекта в путь для импорта
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import click
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+import database
+from database import Base, User, Room
+from db_engine import create_db_engine
+from tests.helpers import QueryCounter, seed_rooms, seed_user_rooms
+from tracing import percentile
+
+
+def use_database(path):
+    """Создает базу данных в файле path и переключает на неё database.py"""
+    engine = create_db_engine(f'sqlite:///{path}')
+    Base.metadata.create_all(engine)
+    database.SessionFactory = sessionmaker(bind=engine)
+    database.cache.clear()
+    database.room_codes.reset()
+    return engine
+
+
+def _parse_counts(value: str):
+    return [int(count) for count in value.split(',')]
+
+
+@click.group()
+def cli():
+    """Бенчмарки функций работы с базой данных."""
+    pass
+
+
+@cli.command()
+@click.option('--rooms', default='10,100,1000', help='Количество комнат через запятую')
+@click.option('--members', default=5, help='Участников в комнате')
+@click.option('--wishes', default=2, help='Желаний у участника')
+def snapshot(rooms, members, wishes):
+    """Число запросов при загрузке комнат для рассылки желаний."""
+    click.echo(f"{'комнат':>8} | {'запросов (по комнатам)':>22} | {'запросов (снимок)':>17} | {'время снимка':>12}")
+    for rooms_count in _parse_counts(rooms):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = use_database(os.path.join(tmp, 'benchmark.db'))
+            seed_rooms(engine, rooms_count, members, wishes)
+
+            # Прежний способ: запросы на каждую комнату
+            with QueryCounter(engine) as legacy:
+                for room in database.get_all_active_rooms():
+                    database.get_room_users(room['room_id'])
+                    database.get_room_wishes(room['room_id'])
+
+            with QueryCounter(engine) as counter:
+                started = time.perf_counter()
+                snapshots = database.load_room_snapshots()
+                elapsed = time.perf_counter() - started
+
+            assert len(snapshots) == rooms_count
+            click.echo(
+                f"{rooms_count:>8} | {legacy.count:>22} | {counter.count:>17} | "
+                f"{elapsed * 1000:>9.1f} мс"
+            )
+            engine.dispose()
+
+
+
+@cli.command()
+@click.option('--members', default='100,1000,10000', help='Участников через запятую')
+@click.option('--repeat', default=5, help='Повторов для каждого замера')
+def draw(members, repeat):
+    """Время жеребьевки без ограничений, одним циклом и с исключениями пар."""
+    import random
+    from draw import draw_pairs
+
+    click.echo(f"{'участников':>10} | {'обычная':>10} | {'один цикл':>10} | {'с парами':>10}")
+    for count in _parse_counts(members):
+        participants = list(range(1, count + 1))
+        # Каждые двое подряд - пара, которой нельзя дарить друг другу
+        couples = []
+        for giver in range(1, count, 2):
+            couples += [(giver, giver + 1), (giver + 1, giver)]
+
+        timings = []
+        for kwargs in ({}, {'single_cycle': True}, {'exclusions': couples}):
+            best = None
+            for seed in range(repeat):
+                started = time.perf_counter()
+                draw_pairs(participants, rng=random.Random(seed), **kwargs)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append(best)
+
+        click.echo(
+            f"{count:>10} | " + " | ".join(f"{t * 1000:>7.1f} мс" for t in timings)
+        )
+
+
+def seed_room_codes(engine, rooms: int, batch: int = 50_000):
+    """Быстро заполняет таблицу rooms кодами R000000001, R000000002, ..."""
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{'id': 1, 'telegram_id': 10_000_001}])
+        for start in range(1, rooms + 1, batch):
+            stop = min(start + batch, rooms + 1)
+            connection.exec_driver_sql(
+                "INSERT INTO rooms (id, code, creator_id, is_active, is_paid, max_participants) "
+                "VALUES (?, ?, 1, 1, 0, 5)",
+                [(room_id, f'R{room_id:09d}') for room_id in range(start, stop)]
+            )
+
+
+@cli.command()
+@click.option('--rooms', default='1000,100000,1000000', help='Количество комнат через запятую')
+@click.option('--lookups', default=2000, help='Поисков по коду на замер')
+def lookup(rooms, lookups):
+    """Время поиска комнаты по коду в зависимости от числа комнат."""
+    import random
+
+    click.echo(f"{'комнат':>8} | {'поиск по коду':>13} | {'запросов':>8} | план")
+    for rooms_count in _parse_counts(rooms):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = use_database(os.path.join(tmp, 'benchmark.db'))
+            seed_room_codes(engine, rooms_count)
+            rng = random.Random(0)
+            # Пользователи вводят код в произвольном регистре
+            codes = [
+                f'r{rng.randint(1, rooms_count):09d}' for _ in range(lookups)
+            ]
+
+            with QueryCounter(engine) as counter:
+                started = time.perf_counter()
+                for code in codes:
+                    assert database.get_room_id_by_code(code)
+                elapsed = time.perf_counter() - started
+
+            with engine.connect() as connection:
+                plan = connection.exec_driver_sql(
+                    "EXPLAIN QUERY PLAN SELECT id FROM rooms WHERE code = ?",
+                    ('R000000001',)
+                ).fetchall()
+            click.echo(
+                f"{rooms_count:>8} | {elapsed / lookups * 1e6:>10.1f} мкс | "
+                f"{counter.count / lookups:>8.1f} | {plan[0][-1]}"
+            )
+            engine.dispose()
+
+
+def legacy_room_list(telegram_id: int) -> list:
+    """Прежняя загрузка списка комнат: отдельный запрос участников на каждую комнату"""
+    session = database.Session()
+    try:
+        user = session.query(User).filter(User.telegram_id == telegram_id).first()
+        created = session.query(Room).filter(Room.creator_id == user.id).all()
+        joined = session.query(Room).join(
+            database.user_room_association,
+            database.user_room_association.c.room_id == Room.id
+        ).filter(
+            database.user_room_association.c.user_id == user.id,
+            Room.creator_id != user.id
+        ).all()
+        return [
+            (room.id, len(session.query(User).filter(User.room_id == room.id).all()))
+            for room in created + joined
+        ]
+    finally:
+        session.close()
+
+
+@cli.command('room-list')
+@click.option('--rooms', default='1,10,50', help='Комнат пользователя через запятую')
+@click.option('--members', default=20, help='Участников в комнате')
+@click.option('--repeat', default=50, help='Повторов для каждого замера')
+def room_list(rooms, members, repeat):
+    """Число запросов и время загрузки списка комнат пользователя."""
+    click.echo(
+        f"{'комнат':>8} | {'запросов (по комнатам)':>22} | {'время':>9} | "
+        f"{'запросов (счетчики)':>19} | {'время':>9}"
+    )
+    for rooms_count in _parse_counts(rooms):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = use_database(os.path.join(tmp, 'benchmark.db'))
+            telegram_id = seed_user_rooms(engine, rooms_count, members)
+
+            with QueryCounter(engine) as legacy:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    legacy_room_list(telegram_id)
+                legacy_time = (time.perf_counter() - started) / repeat
+
+            with QueryCounter(engine) as counter:
+                started = time.perf_counter()
+                for _ in range(repeat):
+                    assert len(database.get_all_rooms(telegram_id)) == rooms_count
+                elapsed = (time.perf_counter() - started) / repeat
+
+            click.echo(
+                f"{rooms_count:>8} | {legacy.count // repeat:>22} | {legacy_time * 1000:>6.2f} мс | "
+                f"{counter.count // repeat:>19} | {elapsed * 1000:>6.2f} мс"
+            )
+            engine.dispose()
+
+
+@cli.command('import-members')
+@click.option('--members', default='1000,10000,100000', help='Участников через запятую')
+@click.option('--batch-size', default=5000, help='Записей в одной транзакции')
+def import_members(members, batch_size):
+    """Время массового добавления участников в комнату."""
+    click.echo(f"{'участников':>10} | {'время':>8} | {'в секунду':>9} | {'запросов':>8}")
+    for members_count in _parse_counts(members):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = use_database(os.path.join(tmp, 'benchmark.db'))
+            room_id = database.create_room(1)
+            records = (
+                {'telegram_id': 20_000_000 + index, 'username': f'employee_{index}'}
+                for index in range(members_count)
+            )
+
+            with QueryCounter(engine) as counter:
+                started = time.perf_counter()
+                result = database.import_room_members(
+                    room_id, records, batch_size=batch_size, allow_over_limit=True
+                )
+                elapsed = time.perf_counter() - started
+
+            assert result['created'] == members_count
+            click.echo(
+                f"{members_count:>10} | {elapsed:>6.2f} с | {members_count / elapsed:>9.0f} | "
+                f"{counter.count:>8}"
+            )
+            engine.dispose()
+
+
+def _telegram_id(rng, users: int) -> int:
+    """Telegram ID случайного пользователя синтетических данных"""
+    return 10_000_000 + rng.randint(1, users)
+
+
+def _new_telegram_id(rng) -> int:
+    """Telegram ID, которого еще нет в синтетических данных"""
+    return 20_000_000 + rng.randint(1, 10_000_000)
+
+
+# Публичные функции database.py и выбор аргументов для очередного вызова:
+# rng, пользователей, комнат -> аргументы. Сначала чтение, затем запись;
+# выход из комнат и удаление комнат - в конце, чтобы не менять данные
+# для остальных замеров. ID желаний выбираются среди первых users: желаний
+# в среднем больше, чем пользователей
+SUITE_SCENARIOS = [
+    ('get_user_by_telegram_id', lambda rng, users, rooms: (_telegram_id(rng, users),)),
+    ('get_user_room', lambda rng, users, rooms: (_telegram_id(rng, users),)),
+    ('get_all_rooms', lambda rng, users, rooms: (_telegram_id(rng, users),)),
+    ('get_rooms_page', lambda rng, users, rooms: (_telegram_id(rng, users),)),
+    ('count_user_rooms', lambda rng, users, rooms: (_telegram_id(rng, users),)),
+    ('get_user_rooms_count', lambda rng, users, rooms: (_telegram_id(rng, users),)),
+    ('user_has_room', lambda rng, users, rooms: (rng.randint(1, users),)),
+    ('get_user_wishes', lambda rng, users, rooms: (_telegram_id(rng, users),)),
+    ('get_wishes_page', lambda rng, users, rooms: (_telegram_id(rng, users), rng.randint(1, rooms))),
+    ('count_user_wishes', lambda rng, users, rooms: (rng.randint(1, users),)),
+    ('get_wish', lambda rng, users, rooms: (rng.randint(1, users),)),
+    ('get_room_by_id', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_room_details', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('room_exists', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('count_users_in_room', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_room_id_by_code', lambda rng, users, rooms: (f'r{rng.randint(1, rooms):09d}',)),
+    ('get_room_by_code', lambda rng, users, rooms: (f'r{rng.randint(1, rooms):09d}',)),
+    ('get_room_participants', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_room_users', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_room_member_ids', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_room_statistics', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_room_wishes', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('check_user_in_room', lambda rng, users, rooms: (_telegram_id(rng, users), rng.randint(1, rooms))),
+    ('check_room_limits', lambda rng, users, rooms: (rng.randint(1, rooms), rng.randint(1, users))),
+    ('can_join_room', lambda rng, users, rooms: (rng.randint(1, rooms), _telegram_id(rng, users))),
+    ('get_all_active_rooms', lambda rng, users, rooms: ()),
+    ('load_room_snapshots', lambda rng, users, rooms: ([rng.randint(1, rooms)],)),
+    ('get_stale_digest_room_ids', lambda rng, users, rooms: ()),
+    ('get_wish_digests', lambda rng, users, rooms: (True,)),
+    ('get_pending_messages', lambda rng, users, rooms: ()),
+    ('get_draw_exclusions', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_assignments', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('get_user_assignment', lambda rng, users, rooms: (rng.randint(1, rooms), _telegram_id(rng, users))),
+    ('load_bot_state', lambda rng, users, rooms: ('user_data',)),
+    ('add_user', lambda rng, users, rooms: (_new_telegram_id(rng), 'benchmark')),
+    ('generate_room_code', lambda rng, users, rooms: ()),
+    ('reserve_room_codes', lambda rng, users, rooms: (100,)),
+    ('create_room', lambda rng, users, rooms: (_new_telegram_id(rng),)),
+    ('update_room_version', lambda rng, users, rooms: (rng.randint(1, rooms), 'pro')),
+    ('grant_access', lambda rng, users, rooms: (rng.randint(1, rooms), 'pro')),
+    ('update_room_activity', lambda rng, users, rooms: (rng.randint(1, rooms),)),
+    ('add_wish', lambda rng, users, rooms: (rng.randint(1, rooms), _telegram_id(rng, users), 'Новое желание')),
+    ('update_wish', lambda rng, users, rooms: (rng.randint(1, users), 'Измененное желание')),
+    ('mark_wish_as_viewed', lambda rng, users, rooms: (rng.randint(1, users),)),
+    ('add_user_to_room', lambda rng, users, rooms: (rng.randint(1, rooms), _telegram_id(rng, users))),
+    ('join_room', lambda rng, users, rooms: (rng.randint(1, rooms), _telegram_id(rng, users))),
+    ('switch_room', lambda rng, users, rooms: (_telegram_id(rng, users), rng.randint(1, rooms))),
+    ('switch_to_room', lambda rng, users, rooms: (_telegram_id(rng, users), rng.randint(1, rooms))),
+    ('import_room_members', lambda rng, users, rooms: (
+        rng.randint(1, rooms), [{'telegram_id': _new_telegram_id(rng)} for _ in range(10)], 5000, True
+    )),
+    ('add_draw_exclusion', lambda rng, users, rooms: (
+        rng.randint(1, rooms), _telegram_id(rng, users), _telegram_id(rng, users)
+    )),
+    ('save_assignments', lambda rng, users, rooms: (
+        rng.randint(1, rooms), {rng.randint(1, users): rng.randint(1, users)}
+    )),
+    ('save_wish_digests', lambda rng, users, rooms: (
+        [rng.randint(1, rooms)], []
+    )),
+    ('save_bot_state', lambda rng, users, rooms: (
+        {('user_data', str(_telegram_id(rng, users))): '{"waiting_for": "wish"}'},
+    )),
+    ('enqueue_messages', lambda rng, users, rooms: ([(_telegram_id(rng, users), 'Подборка желаний')],)),
+    ('mark_messages_sent', lambda rng, users, rooms: ([rng.randint(1, users)],)),
+    ('mark_messages_failed', lambda rng, users, rooms: ([(rng.randint(1, users), 'Forbidden')],)),
+    ('postpone_messages', lambda rng, users, rooms: ([(rng.randint(1, users), 'Timed out', 1, 60)],)),
+    ('delete_wish', lambda rng, users, rooms: (rng.randint(1, users), rng.randint(1, users))),
+    ('leave_room', lambda rng, users, rooms: (_telegram_id(rng, users), rng.randint(1, rooms))),
+    ('delete_room', lambda rng, users, rooms: (
+        # Комнату N создал пользователь N
+        rng.randint(1, rooms), 10_000_000 + rng.randint(1, rooms)
+    )),
+]
+
+# Публичные функции, которые не замеряются набором: они обходят всю базу
+# и выполняются однократно (при запуске или из scripts/db_manage.py)
+SUITE_SKIPPED = {
+    'init_bd': 'создание схемы при запуске',
+    'upgrade_schema': 'создание схемы при запуске',
+    'recount_room_counters': 'полный пересчет счетчиков, db_manage.py recount-counters',
+}
+
+
+def run_suite(engine, users: int, rooms: int, calls: int = 200, seed: int = 0,
+              scenarios=None) -> list:
+    """
+    Вызывает функции database.py со случайными аргументами.
+
+    Returns:
+        list: Для каждой функции число вызовов, перцентили задержки (мс)
+        и среднее число SQL-запросов на вызов
+    """
+    import random
+
+    rng = random.Random(seed)
+    results = []
+    for name, make_args in scenarios or SUITE_SCENARIOS:
+        function = getattr(database, name)
+        timings = []
+        with QueryCounter(engine) as counter:
+            for _ in range(calls):
+                args = make_args(rng, users, rooms)
+                started = time.perf_counter()
+                function(*args)
+                timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        results.append({
+            'function': name,
+            'calls': calls,
+            'p50_ms': percentile(timings, 0.50),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+            'max_ms': timings[-1],
+            'queries': counter.count / calls,
+        })
+    return results
+
+
+@cli.command()
+@click.option('--users', default=100000, help='Пользователей')
+@click.option('--rooms', default=10000, help='Комнат')
+@click.option('--wishes', default=2, help='Желаний у пользователя в среднем')
+@click.option('--calls', default=200, help='Вызовов каждой функции')
+@click.option('--cache/--no-cache', default=False, help='Использовать кэш чтения')
+@click.option('--json', 'as_json', is_flag=True, help='Вывести результаты в JSON')
+def suite(users, rooms, wishes, calls, cache, as_json):
+    """Задержки и число запросов функций database.py на синтетических данных."""
+    import json
+    import logging
+    from tests.test_data import generate_dataset
+
+    # Журнал функций database.py искажает замеры
+    logging.getLogger('database').setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = use_database(os.path.join(tmp, 'benchmark.db'))
+        database.cache.enabled = cache
+        started = time.perf_counter()
+        dataset = generate_dataset(engine, users, rooms, wishes)
+        seeded = time.perf_counter() - started
+        results = run_suite(engine, dataset['users'], dataset['rooms'], calls)
+        engine.dispose()
+
+    if as_json:
+        click.echo(json.dumps({'dataset': dataset, 'results': results}, ensure_ascii=False, indent=2))
+        return
+    click.echo(
+        f"Пользователей {dataset['users']}, комнат {dataset['rooms']}, "
+        f"желаний {dataset['wishes']} (заполнено за {seeded:.1f} с)"
+    )
+    click.echo(
+        f"{'функция':>24} | {'p50':>7} | {'p95':>7} | {'p99':>7} | {'max':>7} | {'запросов':>8}"
+    )
+    for row in results:
+        click.echo(
+            f"{row['function']:>24} | {row['p50_ms']:>7.2f} | {row['p95_ms']:>7.2f} | "
+            f"{row['p99_ms']:>7.2f} | {row['max_ms']:>7.2f} | {row['queries']:>8.1f}"
+        )
+
+
+# Прежняя цепочка обработчиков нажатий из main.py: (обработчик, шаблон)
+LEGACY_CALLBACK_PATTERNS = [
+    ('handle_room_version', '^(free|pro)_version$'),
+    ('list_rooms', '^list_rooms$'),
+    ('switch_room_handler', '^switch_room_\\d+$'),
+    ('confirm_join_handler', '^confirm_join_'),
+    ('search_room', '^cancel_join$'),
+    ('handle_room_version', '^(pay|stay)_'),
+    ('handle_room_context_menu', '^(room_menu|main_menu)$'),
+    ('delete_room_handler', '^delete_room_\\d+$'),
+    ('confirm_delete_handler', '^confirm_delete_\\d+$'),
+    ('cancel_delete_handler', '^cancel_delete$'),
+    ('button_handler', None),
+]
+
+# Типичные callback_data: частые кнопки меню и кнопки с параметром
+SAMPLE_CALLBACK_DATA = [
+    'list_wishes', 'add_wish', 'main_menu', 'help', 'create_room', 'join_room',
+    'edit_wish_42', 'switch_room_7', 'confirm_join_7', 'delete_room_3',
+    'confirm_delete_3', 'cancel_delete', 'free_version', 'pay_full_3', 'unknown',
+]
+
+
+def legacy_callback_handlers():
+    """Цепочка CallbackQueryHandler в прежнем порядке регистрации"""
+    from telegram.ext import CallbackQueryHandler
+
+    async def noop(update, context):
+        pass
+
+    return [
+        (name, CallbackQueryHandler(noop, pattern=pattern))
+        for name, pattern in LEGACY_CALLBACK_PATTERNS
+    ]
+
+
+def make_callback_update(data: str):
+    """Создает обновление с нажатием на кнопку"""
+    from telegram import Update
+
+    return Update.de_json({
+        'update_id': 1,
+        'callback_query': {
+            'id': '1',
+            'chat_instance': '1',
+            'from': {'id': 1, 'is_bot': False, 'first_name': 'Тест'},
+            'data': data,
+        },
+    }, None)
+
+
+@cli.command()
+@click.option('--iterations', default=20000, help='Повторов для каждого callback_data')
+def routing(iterations):
+    """Время выбора обработчика нажатия: цепочка шаблонов и таблица."""
+    os.environ.setdefault('BOT_TOKEN', '0:benchmark')
+    from main import build_callback_router
+
+    router = build_callback_router()
+    legacy = legacy_callback_handlers()
+
+    click.echo(f"{'callback_data':>16} | {'цепочка':>10} | {'таблица':>10}")
+    for data in SAMPLE_CALLBACK_DATA:
+        update = make_callback_update(data)
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            for name, handler in legacy:
+                if handler.check_update(update):
+                    break
+        legacy_time = (time.perf_counter() - started) / iterations
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            router.resolve(update.callback_query.data)
+        router_time = (time.perf_counter() - started) / iterations
+
+        click.echo(
+            f"{data:>16} | {legacy_time * 1e6:>6.2f} мкс | {router_time * 1e6:>6.2f} мкс"
+        )
+
+
+def reply_markup_cost(get_markup, iterations: int) -> float:
+    """Среднее время получения клавиатуры и ее сериализации для Bot API, секунды"""
+    import json
+
+    started = time.perf_counter()
+    for i in range(iterations):
+        json.dumps(get_markup(i).to_dict())
+    return (time.perf_counter() - started) / iterations
+
+
+@cli.command('keyboards')
+@click.option('--iterations', default=20000, help='Ответов на каждую клавиатуру')
+@click.option('--rooms', default=100, help='Разных ID комнат в клавиатурах с параметром')
+def keyboards_benchmark(iterations, rooms):
+    """Стоимость клавиатуры ответа: создание заново и готовые клавиатуры."""
+    from telegram import InlineKeyboardMarkup
+    import keyboards
+
+    def confirm_join_layout(room_id):
+        return ((("✅ Да", f"confirm_join_{room_id}"), ("❌ Нет", "cancel_join")),)
+
+    cases = [
+        (
+            'главное меню',
+            lambda i: keyboards.build_keyboard(keyboards.MAIN_MENU_LAYOUT, InlineKeyboardMarkup),
+            lambda i: keyboards.get_main_menu_keyboard(),
+        ),
+        (
+            'действия с желаниями',
+            lambda i: keyboards.build_keyboard(keyboards.WISH_ACTIONS_LAYOUT, InlineKeyboardMarkup),
+            lambda i: keyboards.get_wish_actions_keyboard(),
+        ),
+        (
+            'вступление в комнату',
+            lambda i: keyboards.build_keyboard(confirm_join_layout(i % rooms), InlineKeyboardMarkup),
+            lambda i: keyboards.get_confirm_join_keyboard(i % rooms),
+        ),
+    ]
+    click.echo(f"{'клавиатура':>22} | {'заново':>10} | {'готовая':>10}")
+    for name, build, prebuilt in cases:
+        build_time = reply_markup_cost(build, iterations)
+        prebuilt_time = reply_markup_cost(prebuilt, iterations)
+        click.echo(
+            f"{name:>22} | {build_time * 1e6:>6.2f} мкс | {prebuilt_time * 1e6:>6.2f} мкс"
+        )
+
+if __name__ == '__main__':
+    cli()
@@ -6,8 +6,8 @@ import sys
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from database import User, Room, Wish
-from config import current_config
-from sqlalchemy import create_engine
+from db_engine import create_db_engine
+from sqlalchemy import inspect
 from sqlalchemy.orm import sessionmaker
 
 
@@ -15,15 +15,16 @@ def check_database():
     """Проверка работы базы данных."""
     print("Проверка базы данных...")
     
-    # Создаем подключение к базе данных
-    engine = create_engine(current_config.DATABASE_URL)
+    # Создаем подключение к базе данных из DATABASE_URL
+    engine = create_db_engine()
+    print(f"База данных: {engine.url.render_as_string(hide_password=True)}")
     Session = sessionmaker(bind=engine)
     session = Session()
     
     try:
         # Проверяем таблицы
         print("\n1. Проверка таблиц:")
-        tables = engine.table_names()
+        tables = inspect(engine).get_table_names()
         print(f"Найденные таблицы: {tables}")
         
         # Проверяем пользователей
@@ -38,7 +39,7 @@ def check_database():
         rooms = session.query(Room).all()
         print(f"Количество комнат: {len(rooms)}")
         for room in rooms:
-            print(f"- {room.name} (Код: {room.code})")
+            print(f"- Комната {room.code} (ID: {room.id})")
             print(f"  Создатель: {room.creator_id}")
             print(f"  Активна: {room.is_active}")
             print(f"  Оплачена: {room.is_paid}")
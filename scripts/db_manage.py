@@ -1,14 +1,16 @@
 """Скрипт для управления базой данных."""
+import csv
+import json
 import os
 import sys
+import time
 
 # Добавляем корневую директорию проекта в путь для импорта
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import click
-from sqlalchemy import create_engine
 from database import Base
-from config import current_config
+from db_engine import create_db_engine
 
 
 @click.group()
@@ -20,7 +22,7 @@ def cli():
 @cli.command()
 def init_db():
     """Инициализация базы данных."""
-    engine = create_engine(current_config.DATABASE_URL)
+    engine = create_db_engine()
     Base.metadata.create_all(engine)
     click.echo('База данных инициализирована')
 
@@ -28,7 +30,7 @@ def init_db():
 @cli.command()
 def clear_db():
     """Очистка базы данных."""
-    engine = create_engine(current_config.DATABASE_URL)
+    engine = create_db_engine()
     Base.metadata.drop_all(engine)
     click.echo('База данных очищена')
 
@@ -53,24 +55,143 @@ def create_test_data():
 @cli.command()
 @click.argument('source')
 @click.argument('destination')
-def migrate_data(source, destination):
+@click.option('--chunk-size', default=5000, help='Строк в одной пачке')
+@click.option('--resume', is_flag=True, help='Продолжить прерванный перенос')
+def migrate_data(source, destination, chunk_size, resume):
     """Миграция данных из одной базы в другую."""
-    source_engine = create_engine(source)
-    dest_engine = create_engine(destination)
+    from migration import migrate_database
     
-    # Создаем таблицы в целевой базе
-    Base.metadata.create_all(dest_engine)
+    source_engine = create_db_engine(source)
+    dest_engine = create_db_engine(destination)
     
-    # Копируем данные
-    with source_engine.connect() as source_conn, \
-         dest_engine.connect() as dest_conn:
-        for table in Base.metadata.tables.values():
-            data = source_conn.execute(table.select()).fetchall()
-            if data:
-                dest_conn.execute(table.insert(), data)
+    def progress(table, copied, total, elapsed):
+        rate = copied / elapsed if elapsed else 0
+        click.echo(f'{table}: {copied}/{total} строк ({rate:.0f} строк/с)')
     
-    click.echo('Данные успешно перенесены')
+    started = time.perf_counter()
+    try:
+        copied = migrate_database(
+            source_engine, dest_engine,
+            chunk_size=chunk_size, resume=resume, progress=progress
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - started
+    
+    total = sum(copied.values())
+    click.echo(
+        f'Данные успешно перенесены: {total} строк за {elapsed:.1f} с '
+        f'({total / elapsed if elapsed else 0:.0f} строк/с)'
+    )
+
+
+@cli.command()
+def recount_counters():
+    """Пересчет счетчиков участников и желаний в комнатах."""
+    from database import engine, recount_room_counters, upgrade_schema
+    
+    # Базы, созданные до появления счетчиков: добавляем недостающие столбцы
+    for column in upgrade_schema(engine):
+        click.echo(f'Добавлен столбец {column}')
+    
+    result = recount_room_counters()
+    click.echo(
+        f'Счетчики пересчитаны: исправлено комнат {result["rooms"]}, '
+        f'счетчиков участников {result["members"]}, '
+        f'добавлено записей о членстве {result["memberships"]}'
+    )
+
+
+def read_members(path: str):
+    """
+    Читает участников из CSV (с заголовком telegram_id,username,...) или
+    JSONL (по объекту на строку) потоком, не загружая файл целиком
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(file)
 
 
+@cli.command()
+@click.argument('room_code')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=5000, help='Записей в одной транзакции')
+@click.option(
+    '--allow-over-limit', is_flag=True,
+    help='Поднять лимит участников комнаты, если список в него не помещается'
+)
+def import_members(room_code, path, batch_size, allow_over_limit):
+    """Массовое добавление участников в комнату из CSV или JSONL."""
+    from database import get_room_id_by_code, import_room_members
+    
+    room_id = get_room_id_by_code(room_code)
+    if not room_id:
+        click.echo(f'Комната {room_code} не найдена')
+        return
+    
+    started = time.perf_counter()
+    result = import_room_members(
+        room_id, read_members(path), batch_size=batch_size,
+        allow_over_limit=allow_over_limit
+    )
+    elapsed = time.perf_counter() - started
+    if result is None:
+        click.echo(
+            'Импорт отклонен: участников станет больше, чем позволяет тариф '
+            'комнаты (запустите с --allow-over-limit, чтобы поднять лимит)'
+        )
+        return
+    click.echo(
+        f'Обработано записей: {result["members"]} за {elapsed:.1f} с '
+        f'(новых пользователей {result["created"]}, сменили комнату {result["moved"]}, '
+        f'пропущено строк {result["skipped"]})'
+    )
+
+
+@cli.command()
+@click.argument('room_code')
+@click.option('--single-cycle', is_flag=True, help='Один общий цикл дарения')
+@click.option('--exclude-previous', is_flag=True, help='Не повторять прошлые пары')
+def draw(room_code, single_cycle, exclude_previous):
+    """Жеребьевка в комнате."""
+    from database import get_room_id_by_code
+    from draw import draw_room
+    
+    room_id = get_room_id_by_code(room_code)
+    if not room_id:
+        click.echo(f'Комната {room_code} не найдена')
+        return
+    
+    success, message = draw_room(
+        room_id,
+        single_cycle=single_cycle,
+        exclude_previous=exclude_previous
+    )
+    click.echo(message)
+
+
+@cli.command()
+@click.argument('room_code')
+@click.argument('user_id', type=int)
+@click.argument('excluded_user_id', type=int)
+@click.option('--one-way', is_flag=True, help='Запретить только одно направление')
+def exclude(room_code, user_id, excluded_user_id, one_way):
+    """Запрет пары участников в жеребьевке (по Telegram ID)."""
+    from database import get_room_id_by_code, add_draw_exclusion
+    
+    room_id = get_room_id_by_code(room_code)
+    if not room_id:
+        click.echo(f'Комната {room_code} не найдена')
+        return
+    
+    if add_draw_exclusion(room_id, user_id, excluded_user_id, mutual=not one_way):
+        click.echo('Исключение добавлено')
+    else:
+        click.echo('Не удалось добавить исключение')
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -3,14 +3,14 @@ from telegram.ext import ContextTypes
 from keyboards import get_main_menu_keyboard
 from rooms import join_room, handle_room_creation
 from wishes import create_wish, edit_wish_handler, list_wishes, handle_wish_text, handle_edit_wish_text, edit_specific_wish
-from database import add_user
+from async_database import add_user
 
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
     user = update.effective_user
     # Добавляем пользователя в базу данных
-    add_user(
+    await add_user(
         telegram_id=user.id,
         username=user.username,
         first_name=user.first_name,
@@ -69,6 +69,60 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
 
 
+async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает главное меню вместо текущего сообщения"""
+    await update.callback_query.message.edit_text(
+        "Выберите действие из меню ниже 👇",
+        reply_markup=get_main_menu_keyboard()
+    )
+
+
+async def show_help(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Показывает справку вместо текущего сообщения"""
+    # Отправляем сообщение с помощью
+    help_text = (
+        "🎄 *Как пользоваться ботом:*\n\n"
+        "1. *Создание волшебной комнаты:*\n"
+        "   - Нажми '🎁 Создать комнату'\n"
+        "   - Выбери версию (бесплатная/PRO)\n"
+        "   - Получи волшебный код комнаты\n\n"
+        "2. *Присоединение к друзьям:*\n"
+        "   - Нажми '🔍 Найти комнату'\n"
+        "   - Введи волшебный код\n\n"
+        "3. *Загадывание желаний:*\n"
+        "   - Добавляй свои желания\n"
+        "   - Редактируй их\n"
+        "   - Просматривай желания друзей\n\n"
+        "4. *Управление комнатами:*\n"
+        "   - Создавай до 3 комнат\n"
+        "   - Приглашай друзей\n"
+        "   - Следи за активностью\n\n"
+        "5. *Версии бота:*\n"
+        "   - *Бесплатная:* до 5 участников, 3 желания\n"
+        "   - *PRO:* до 10 участников, 10 желаний\n\n"
+        "❓ *Нужна помощь?* Напиши /help"
+    )
+    await update.callback_query.message.edit_text(
+        help_text,
+        parse_mode='Markdown',
+        reply_markup=get_main_menu_keyboard()
+    )
+
+
+# Действия кнопок главного меню по callback_data
+BUTTON_ACTIONS = {
+    'create_room': handle_room_creation,
+    'back_to_main': show_main_menu,
+    'join_room': join_room,
+    'create_wish': create_wish,
+    'add_wish': create_wish,
+    'edit_wish': edit_wish_handler,
+    'list_wishes': list_wishes,
+    'help': show_help,
+    'main_menu': show_main_menu,
+}
+
+
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик нажатий на кнопки"""
     query = update.callback_query
@@ -78,57 +132,12 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if query.data in ['free_version', 'pro_version']:
         return
     
-    if query.data == 'create_room':
-        await handle_room_creation(update, context)
-    elif query.data == 'back_to_main':
-        await query.message.edit_text(
-            "Выберите действие из меню ниже 👇",
-            reply_markup=get_main_menu_keyboard()
-        )
-    elif query.data == 'join_room':
-        await join_room(update, context)
-    elif query.data == 'create_wish' or query.data == 'add_wish':
-        await create_wish(update, context)
-    elif query.data == 'edit_wish':
-        await edit_wish_handler(update, context)
-    elif query.data.startswith('edit_wish_'):
-        await edit_specific_wish(update, context)
-    elif query.data == 'list_wishes':
-        await list_wishes(update, context)
-    elif query.data == 'help':
-        # Отправляем сообщение с помощью
-        help_text = (
-            "🎄 *Как пользоваться ботом:*\n\n"
-            "1. *Создание волшебной комнаты:*\n"
-            "   - Нажми '🎁 Создать комнату'\n"
-            "   - Выбери версию (бесплатная/PRO)\n"
-            "   - Получи волшебный код комнаты\n\n"
-            "2. *Присоединение к друзьям:*\n"
-            "   - Нажми '🔍 Найти комнату'\n"
-            "   - Введи волшебный код\n\n"
-            "3. *Загадывание желаний:*\n"
-            "   - Добавляй свои желания\n"
-            "   - Редактируй их\n"
-            "   - Просматривай желания друзей\n\n"
-            "4. *Управление комнатами:*\n"
-            "   - Создавай до 3 комнат\n"
-            "   - Приглашай друзей\n"
-            "   - Следи за активностью\n\n"
-            "5. *Версии бота:*\n"
-            "   - *Бесплатная:* до 5 участников, 3 желания\n"
-            "   - *PRO:* до 10 участников, 10 желаний\n\n"
-            "❓ *Нужна помощь?* Напиши /help"
-        )
-        await query.message.edit_text(
-            help_text,
-            parse_mode='Markdown',
-            reply_markup=get_main_menu_keyboard()
-        )
-    elif query.data == 'main_menu':
-        await query.message.edit_text(
-            "Выберите действие из меню ниже 👇",
-            reply_markup=get_main_menu_keyboard()
-        )
+    action = BUTTON_ACTIONS.get(query.data)
+    if action is None and query.data.startswith('edit_wish_'):
+        action = edit_specific_wish
+    
+    if action is not None:
+        await action(update, context)
     else:
         await query.message.reply_text(
             "Выбери действие из меню ниже 👇",
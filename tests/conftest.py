@@ -1,40 +1,75 @@
 """Конфигурация тестов и фикстуры."""
 import os
+from functools import partial
+
 import pytest
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from database import Base
+from sqlalchemy.pool import NullPool
 
-# Устанавливаем тестовое окружение
+# Устанавливаем тестовое окружение до импорта database
 os.environ['ENVIRONMENT'] = 'testing'
 
+import database
+import async_database
+from database import Base
+from db_engine import create_db_engine, create_async_db_engine
+from tests import helpers
+
 
 @pytest.fixture(scope="session")
-def test_engine():
-    """Создает тестовый движок базы данных."""
-    engine = create_engine("sqlite:///test_santa_bot.db")
+def postgres_url(tmp_path_factory):
+    """URL тестового PostgreSQL: TEST_POSTGRES_URL или локальный pgserver."""
+    url = os.getenv('TEST_POSTGRES_URL')
+    if url:
+        yield url
+        return
+    
+    pgserver = pytest.importorskip('pgserver')
+    server = pgserver.get_server(tmp_path_factory.mktemp('postgres'), cleanup_mode='stop')
+    yield server.get_uri()
+    server.cleanup()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def temp_db(request, tmp_path, monkeypatch):
+    """Подменяет базу данных функций database.py на пустую тестовую базу.
+    
+    Каждый тест выполняется на временном файле SQLite и на PostgreSQL.
+    """
+    if request.param == 'sqlite':
+        url = f'sqlite:///{tmp_path / "santa_bot.db"}'
+    else:
+        url = request.getfixturevalue('postgres_url')
+    
+    engine = create_db_engine(url)
+    Base.metadata.drop_all(engine)
     Base.metadata.create_all(engine)
+    monkeypatch.setattr(database, 'SessionFactory', sessionmaker(bind=engine))
+    # Без пула: соединения asyncpg не переживают цикл событий теста
+    monkeypatch.setattr(
+        async_database, 'async_engine',
+        create_async_db_engine(url, poolclass=NullPool)
+    )
+    database.cache.clear()
+    database.room_codes.reset()
     yield engine
-    Base.metadata.drop_all(engine)
+    database.cache.clear()
+    engine.dispose()
 
 
-@pytest.fixture(scope="session")
-def test_session_factory(test_engine):
-    """Создает фабрику сессий для тестов."""
-    return sessionmaker(bind=test_engine)
+@pytest.fixture
+def count_queries(temp_db):
+    """Возвращает QueryCounter тестовой базы: with count_queries() as counter"""
+    return partial(helpers.QueryCounter, temp_db)
 
 
 @pytest.fixture
-def test_session(test_session_factory):
-    """Создает тестовую сессию."""
-    session = test_session_factory()
-    yield session
-    session.rollback()
-    session.close()
+def seed_rooms(temp_db):
+    """Заполняет тестовую базу комнатами (helpers.seed_rooms)"""
+    return partial(helpers.seed_rooms, temp_db)
 
 
 @pytest.fixture
-def test_data(test_session):
-    """Создает тестовые данные."""
-    from test_data import setup_test_data
-    return setup_test_data(test_session) 
\ No newline at end of file
+def seed_user_rooms(temp_db):
+    """Заполняет тестовую базу комнатами одного пользователя (helpers.seed_user_rooms)"""
+    return partial(helpers.seed_user_rooms, temp_db)
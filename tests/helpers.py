@@ -0,0 +1,111 @@
+"""Вспомогательные функции тестов и бенчмарков: подсчет запросов и
+заполнение базы комнатами."""
+from sqlalchemy import bindparam, event, insert, update
+
+from database import MemberCounter, Room, User, Wish, user_room_association
+from db_engine import reset_sequences
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные через engine"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+
+def seed_rooms(engine, rooms: int, members: int, wishes: int):
+    """
+    Заполняет базу rooms комнатами по members участников с wishes желаниями
+    у каждого. Комната N имеет ID N и код R00000000N, её первый участник -
+    создатель; у пользователя с ID K Telegram ID равен 10000000 + K.
+    """
+    users_rows = []
+    rooms_rows = []
+    wishes_rows = []
+    counters_rows = []
+    for room_index in range(rooms):
+        room_id = room_index + 1
+        first_user_id = room_index * members + 1
+        rooms_rows.append({
+            'id': room_id,
+            'code': f'R{room_id:09d}',
+            'creator_id': first_user_id,
+            'is_active': True,
+            # Оставляем свободное место, чтобы не упираться в лимиты комнаты
+            'max_participants': members + 1,
+            'member_count': members,
+            'wish_count': members * wishes
+        })
+        for member_index in range(members):
+            user_id = first_user_id + member_index
+            users_rows.append({
+                'id': user_id,
+                'telegram_id': 10_000_000 + user_id,
+                'username': f'user_{user_id}',
+                'room_id': room_id
+            })
+            if wishes:
+                counters_rows.append({
+                    'room_id': room_id, 'user_id': user_id, 'wish_count': wishes
+                })
+            for wish_index in range(wishes):
+                wishes_rows.append({
+                    'text': f'Желание {wish_index} пользователя {user_id}',
+                    'user_id': user_id,
+                    'room_id': room_id
+                })
+
+    # users.room_id и rooms.creator_id ссылаются друг на друга, поэтому
+    # комната проставляется участникам после создания комнат
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User), [{**row, 'room_id': None} for row in users_rows]
+        )
+        connection.execute(insert(Room), rooms_rows)
+        connection.execute(
+            update(User)
+            .where(User.id == bindparam('user_id'))
+            .values(room_id=bindparam('member_room_id')),
+            [
+                {'user_id': row['id'], 'member_room_id': row['room_id']}
+                for row in users_rows
+            ]
+        )
+        connection.execute(insert(user_room_association), [
+            {'user_id': row['id'], 'room_id': row['room_id']} for row in users_rows
+        ])
+        if wishes_rows:
+            connection.execute(insert(Wish), wishes_rows)
+            connection.execute(insert(MemberCounter), counters_rows)
+        reset_sequences(connection)
+
+
+def seed_user_rooms(engine, rooms: int, members: int):
+    """
+    Создает rooms комнат и делает первого пользователя участником всех:
+    он создатель первой комнаты и присоединился к остальным.
+
+    Returns:
+        int: Telegram ID этого пользователя
+    """
+    seed_rooms(engine, rooms, members, wishes=0)
+    with engine.begin() as connection:
+        if rooms > 1:
+            connection.execute(insert(user_room_association), [
+                {'user_id': 1, 'room_id': room_id} for room_id in range(2, rooms + 1)
+            ])
+            connection.execute(
+                update(Room).where(Room.id > 1).values(member_count=Room.member_count + 1)
+            )
+    return 10_000_001
@@ -0,0 +1,84 @@
+"""Тесты асинхронного слоя доступа к данным."""
+import asyncio
+import pytest
+
+import async_database
+import database
+
+
+@pytest.mark.asyncio
+async def test_add_and_get_user(temp_db):
+    """Тест записи и чтения пользователя через async_database."""
+    assert await async_database.add_user(123456789, "test_user", "Test", "User")
+
+    user = await async_database.get_user_by_telegram_id(123456789)
+    assert user is not None
+    assert user['username'] == "test_user"
+
+
+@pytest.mark.asyncio
+async def test_room_and_wish_flow(temp_db):
+    """Тест создания комнаты и желания через awaitable-функции."""
+    await async_database.add_user(123456789, "test_user")
+    room_id = await async_database.create_room(123456789)
+    assert room_id
+
+    room = await async_database.get_room_details(room_id)
+    assert room['current_users'] == 1
+
+    success, _ = await async_database.add_wish(room_id, 123456789, "Хочу новый телефон")
+    assert success
+    wishes = await async_database.get_user_wishes(123456789, room_id)
+    assert [wish['text'] for wish in wishes] == ["Хочу новый телефон"]
+
+
+@pytest.mark.asyncio
+async def test_event_loop_not_blocked(temp_db):
+    """Тест того, что цикл событий обрабатывает задачи во время запросов."""
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.gather(*[
+        async_database.add_user(1000 + i, f"user_{i}") for i in range(20)
+    ])
+    task.cancel()
+
+    assert ticks > 0
+    assert await async_database.get_user_by_telegram_id(1019) is not None
+
+
+@pytest.mark.asyncio
+async def test_code_reservation_survives_rollback(temp_db):
+    """Тест того, что резерв кодов комнат не откатывается с вызывающей транзакцией."""
+    await async_database.add_user(123456789, "test_user")
+
+    def create_and_rollback():
+        session = database.Session()
+        try:
+            session.query(database.User).count()
+            code = database.generate_room_code()
+            session.add(database.User(telegram_id=987654321))
+            session.flush()
+            session.rollback()
+            return code
+        finally:
+            session.close()
+
+    code = await async_database.run_sync(create_and_rollback)
+    session = database.Session()
+    try:
+        sequence = session.get(database.RoomCodeSequence, 1)
+        assert sequence.next_value == database.ROOM_CODE_BLOCK_SIZE
+        assert session.query(database.User).count() == 1
+    finally:
+        session.close()
+
+    # Следующая комната получает новый номер, а не выданный повторно
+    room_id = await async_database.create_room(123456789)
+    assert (await async_database.get_room_details(room_id))['code'] != code
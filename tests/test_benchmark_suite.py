@@ -0,0 +1,41 @@
+"""Тесты генератора синтетических данных и набора замеров."""
+import inspect
+
+import database
+from scripts.benchmark import SUITE_SCENARIOS, SUITE_SKIPPED, run_suite
+from tests.test_data import generate_dataset
+
+
+def test_generated_dataset_is_consistent(temp_db):
+    """Тест того, что счетчики сгенерированных данных совпадают с пересчетом."""
+    dataset = generate_dataset(temp_db, users=300, rooms=20, wishes_per_user=2)
+    assert dataset['users'] == 300 and dataset['rooms'] == 20
+    assert database.recount_room_counters()['rooms'] == 0
+    # Комнаты неравномерные: первая комната больше последней
+    assert database.count_users_in_room(1) > database.count_users_in_room(20)
+
+
+def test_run_suite_reports_every_function(temp_db, monkeypatch):
+    """Тест отчета набора замеров: перцентили и запросы для каждой функции."""
+    monkeypatch.setattr(database.cache, 'enabled', False)
+    dataset = generate_dataset(temp_db, users=100, rooms=10)
+    results = run_suite(temp_db, dataset['users'], dataset['rooms'], calls=5)
+
+    assert [row['function'] for row in results] == [name for name, _ in SUITE_SCENARIOS]
+    for row in results:
+        assert row['p50_ms'] <= row['p95_ms'] <= row['p99_ms'] <= row['max_ms']
+        # generate_room_code обращается к базе раз на блок кодов
+        assert row['queries'] > 0
+
+
+def test_suite_covers_public_functions():
+    """Тест того, что набор замеров покрывает все публичные функции database.py."""
+    public = {
+        name for name, function in vars(database).items()
+        if inspect.isfunction(function) and function.__module__ == 'database'
+        and not name.startswith('_') and hasattr(function, '__wrapped__')
+    }
+    measured = [name for name, _ in SUITE_SCENARIOS]
+    assert len(measured) == len(set(measured))
+    assert set(measured) | set(SUITE_SKIPPED) == public
+
@@ -0,0 +1,174 @@
+"""Тесты рассылки с ограничением скорости."""
+import asyncio
+import time
+import pytest
+from telegram.error import Forbidden, NetworkError, RetryAfter
+
+import database
+from broadcast import BroadcastEngine, TokenBucket
+
+
+class FakeBot:
+    """Бот, запоминающий отправленные сообщения."""
+
+    def __init__(self, errors=None):
+        self.sent = []
+        self.errors = errors or {}
+
+    async def send_message(self, chat_id, text):
+        error = self.errors.get(chat_id)
+        if error:
+            # Ошибка возникает один раз, повторная отправка проходит
+            self.errors.pop(chat_id)
+            raise error
+        self.sent.append((chat_id, text, time.monotonic()))
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_rate():
+    """Тест того, что bucket не выдает больше rate токенов в секунду."""
+    bucket = TokenBucket(rate=100, capacity=1)
+    started = time.monotonic()
+    for _ in range(11):
+        await bucket.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_engine_drains_outbox(temp_db):
+    """Тест отправки всех сообщений из outbox."""
+    database.enqueue_messages([(chat_id, f"msg {chat_id}") for chat_id in range(50)])
+    bot = FakeBot()
+
+    stats = await BroadcastEngine(bot, global_rate=1000, batch_size=20).run()
+
+    assert stats == {'sent': 50, 'failed': 0, 'postponed': 0}
+    assert sorted(chat_id for chat_id, _, _ in bot.sent) == list(range(50))
+    assert database.get_pending_messages() == []
+
+
+@pytest.mark.asyncio
+async def test_engine_respects_chat_rate(temp_db):
+    """Тест того, что сообщения в один чат идут не чаще chat_rate."""
+    database.enqueue_messages([(1, "first"), (1, "second"), (2, "other")])
+    bot = FakeBot()
+
+    await BroadcastEngine(bot, global_rate=1000, chat_rate=10).run()
+
+    chat_times = [sent_at for chat_id, _, sent_at in bot.sent if chat_id == 1]
+    assert [text for chat_id, text, _ in bot.sent if chat_id == 1] == ["first", "second"]
+    assert chat_times[1] - chat_times[0] >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_engine_retry_after_and_forbidden(temp_db):
+    """Тест повтора после RetryAfter и отказа от повтора после Forbidden."""
+    database.enqueue_messages([(1, "retry"), (2, "blocked")])
+    bot = FakeBot(errors={1: RetryAfter(0), 2: Forbidden("bot was blocked by the user")})
+
+    stats = await BroadcastEngine(bot, global_rate=1000).run()
+
+    assert stats == {'sent': 1, 'failed': 1, 'postponed': 0}
+    assert [chat_id for chat_id, _, _ in bot.sent] == [1]
+
+
+class FailingBot(FakeBot):
+    """Бот, у которого отправка в выбранные чаты всегда завершается ошибкой."""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.failing = errors
+        self.calls = 0
+
+    async def send_message(self, chat_id, text):
+        self.calls += 1
+        if chat_id in self.failing:
+            raise self.failing[chat_id]
+        await super().send_message(chat_id, text)
+
+
+@pytest.mark.asyncio
+async def test_transient_errors_keep_message_pending(temp_db):
+    """Тест того, что временные ошибки откладывают сообщение, а не теряют его."""
+    database.enqueue_messages([(1, "network"), (2, "flood"), (3, "ok")])
+    bot = FailingBot({1: NetworkError("connection reset"), 2: RetryAfter(0)})
+
+    engine = BroadcastEngine(bot, global_rate=1000, max_attempts=1)
+    assert await engine.run() == {'sent': 1, 'failed': 0, 'postponed': 2}
+
+    # Отложенные сообщения не отправляются до конца паузы
+    assert database.get_pending_messages() == []
+    session = database.Session()
+    try:
+        messages = session.query(database.OutboxMessage).order_by(database.OutboxMessage.id).all()
+        assert [message.status for message in messages] == ['pending', 'pending', 'sent']
+        assert [message.attempts for message in messages] == [1, 1, 1]
+        assert all(message.next_attempt_at for message in messages[:2])
+        session.query(database.OutboxMessage).update({'next_attempt_at': None})
+        session.commit()
+    finally:
+        session.close()
+
+    # После паузы сообщение доставляется
+    bot.failing.clear()
+    assert await engine.run() == {'sent': 2, 'failed': 0, 'postponed': 0}
+    assert sorted(chat_id for chat_id, _, _ in bot.sent) == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_run_stops_when_results_not_saved(temp_db, monkeypatch):
+    """Тест того, что рассылка останавливается, если результаты не сохранены."""
+    import broadcast
+
+    async def fail_to_save(message_ids):
+        return False
+
+    monkeypatch.setattr(broadcast, 'mark_messages_sent', fail_to_save)
+    database.enqueue_messages([(1, "once")])
+    bot = FakeBot()
+
+    stats = await asyncio.wait_for(BroadcastEngine(bot, global_rate=1000).run(), timeout=5)
+
+    assert stats == {'sent': 1, 'failed': 0, 'postponed': 0}
+    assert [text for _, text, _ in bot.sent] == ["once"]
+
+
+@pytest.mark.asyncio
+async def test_retries_respect_chat_rate(temp_db):
+    """Тест того, что повтор после ошибки ждет токен чата."""
+    database.enqueue_messages([(1, "retry")])
+    attempts = []
+
+    class FlakyBot(FakeBot):
+        async def send_message(self, chat_id, text):
+            attempts.append(time.monotonic())
+            if len(attempts) == 1:
+                raise RetryAfter(0)
+            await super().send_message(chat_id, text)
+
+    await BroadcastEngine(FlakyBot(), global_rate=1000, chat_rate=10).run()
+
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.09
+
+
+def test_failed_and_postponed_marked_in_one_statement(count_queries):
+    """Тест того, что результаты отправки порции сохраняются одним запросом."""
+    database.enqueue_messages([(chat_id, "text") for chat_id in range(6)])
+    ids = [message['id'] for message in database.get_pending_messages()]
+
+    with count_queries() as failed:
+        assert database.mark_messages_failed([(message_id, "blocked") for message_id in ids[:3]])
+    with count_queries() as postponed:
+        assert database.postpone_messages([(message_id, "timeout", 2, 60) for message_id in ids[3:]])
+
+    assert failed.count == postponed.count == 1
+    session = database.Session()
+    try:
+        messages = session.query(database.OutboxMessage).order_by(database.OutboxMessage.id).all()
+        assert [message.status for message in messages] == ['failed'] * 3 + ['pending'] * 3
+        assert [message.attempts for message in messages] == [1] * 3 + [2] * 3
+        assert [message.last_error for message in messages] == ['blocked'] * 3 + ['timeout'] * 3
+        assert all(message.next_attempt_at for message in messages[3:])
+    finally:
+        session.close()
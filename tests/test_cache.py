@@ -0,0 +1,88 @@
+"""Тесты кэша комнат и пользователей."""
+import time
+
+import database
+from cache import TTLCache
+
+
+def test_cache_evicts_least_recently_used():
+    """Тест вытеснения давно не использованной записи."""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.get_or_load('a', lambda: 1, lambda value: [])
+    cache.get_or_load('b', lambda: 2, lambda value: [])
+    cache.get_or_load('a', lambda: 0, lambda value: [])
+    cache.get_or_load('c', lambda: 3, lambda value: [])
+
+    assert cache.get_or_load('a', lambda: 0, lambda value: []) == 1
+    assert cache.get_or_load('b', lambda: 0, lambda value: []) == 0
+    assert cache.stats()['size'] == 2
+
+
+def test_cache_ttl_and_tags():
+    """Тест истечения времени жизни и сброса по тегу."""
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.get_or_load('room', lambda: 1, lambda value: [('room', 1)])
+    assert cache.get_or_load('room', lambda: 2, lambda value: [('room', 1)]) == 1
+
+    time.sleep(0.06)
+    assert cache.get_or_load('room', lambda: 2, lambda value: [('room', 1)]) == 2
+
+    cache.invalidate(('room', 1))
+    assert cache.get_or_load('room', lambda: 3, lambda value: [('room', 1)]) == 3
+    assert cache.stats()['hits'] == 1
+
+
+def test_cache_skips_value_loaded_during_invalidation():
+    """Тест того, что значение, прочитанное до сброса, не попадает в кэш."""
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    def loader():
+        cache.invalidate(('room', 1))
+        return 'stale'
+
+    cache.get_or_load('room', loader, lambda value: [('room', 1)])
+    assert cache.get_or_load('room', lambda: 'fresh', lambda value: [('room', 1)]) == 'fresh'
+
+
+def test_cache_keeps_value_when_other_tag_invalidated():
+    """Тест того, что сброс другого тега не отменяет загрузку значения."""
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    def loader():
+        cache.invalidate(('room', 2), ('user', 5))
+        return 'loaded'
+
+    cache.get_or_load('room', loader, lambda value: [('room', 1)])
+    assert cache.get_or_load('room', lambda: 'reloaded', lambda value: [('room', 1)]) == 'loaded'
+
+    # После завершения загрузок журнал сбросов не растет
+    for room_id in range(100):
+        cache.invalidate(('room', room_id))
+    assert cache._invalidated == {}
+
+
+def test_room_lookup_served_from_cache(count_queries, seed_rooms):
+    """Тест того, что повторные запросы комнаты не обращаются к базе."""
+    seed_rooms(rooms=1, members=3, wishes=0)
+    assert database.get_room_by_id(1)['current_users'] == 3
+
+    with count_queries() as counter:
+        assert database.room_exists(1)
+        assert database.get_room_by_id(1)['current_users'] == 3
+        assert database.count_users_in_room(1) == 3
+    assert counter.count == 0
+
+
+def test_writes_invalidate_cache(seed_rooms):
+    """Тест сброса кэша при изменении комнаты и переходе участника."""
+    seed_rooms(rooms=2, members=2, wishes=0)
+    assert database.get_room_details(1)['is_paid'] is False
+    assert database.get_user_room(10_000_001)['room_id'] == 1
+
+    assert database.update_room_version(1, 'pro')
+    assert database.get_room_details(1)['is_paid'] is True
+
+    assert database.add_user_to_room(2, 10_000_001)
+    assert database.get_user_room(10_000_001)['room_id'] == 2
+    assert database.count_users_in_room(1) == 2
+    assert database.get_room_by_id(2)['current_users'] == 3
@@ -0,0 +1,115 @@
+"""Тесты счетчиков участников и желаний в комнатах."""
+from sqlalchemy import create_engine, delete, inspect, text
+
+import database
+from database import MemberCounter, Room, User, user_room_association
+
+
+def _counters(room_id):
+    session = database.Session()
+    try:
+        room = session.get(Room, room_id)
+        return room.member_count, room.wish_count, room.viewed_wish_count
+    finally:
+        session.close()
+
+
+def test_counters_follow_members_and_wishes(temp_db):
+    """Тест того, что счетчики меняются вместе с участниками и желаниями."""
+    room_id = database.create_room(1)
+    other_room_id = database.create_room(2)
+    database.add_user(3, 'guest')
+    assert database.add_user_to_room(room_id, 3)
+    assert _counters(room_id) == (2, 0, 0)
+
+    assert database.add_wish(room_id, 3, 'Книга')[0]
+    assert database.add_wish(room_id, 3, 'Шарф')[0]
+    wishes = database.get_room_wishes(room_id)
+    assert database.mark_wish_as_viewed(wishes[0]['id'])
+    assert database.mark_wish_as_viewed(wishes[0]['id'])
+    assert _counters(room_id) == (2, 2, 1)
+
+    guest_id = wishes[0]['user_id']
+    assert database.delete_wish(wishes[0]['id'], guest_id)
+    assert _counters(room_id) == (2, 1, 0)
+
+    # Переход в другую комнату оставляет место в прежней
+    assert database.add_user_to_room(other_room_id, 3)
+    assert _counters(room_id) == (2, 1, 0)
+    assert database.count_users_in_room(other_room_id) == 2
+
+    stats = database.get_room_participants(room_id)
+    assert stats['total_participants'] == 2
+    assert database.check_room_limits(room_id, guest_id) == (False, "Лимиты не превышены")
+
+    # Счетчики совпадают с пересчетом по таблицам
+    assert database.recount_room_counters()['rooms'] == 0
+
+
+def test_recount_repairs_counters(temp_db):
+    """Тест того, что пересчет исправляет рассогласованные счетчики."""
+    room_id = database.create_room(1)
+    database.add_wish(room_id, 1, 'Книга')
+    session = database.Session()
+    session.query(Room).update({'member_count': 40, 'wish_count': 0})
+    session.query(MemberCounter).delete()
+    session.commit()
+    session.close()
+    database.cache.clear()
+
+    assert database.recount_room_counters() == {'rooms': 1, 'members': 1, 'memberships': 0}
+    assert _counters(room_id) == (1, 1, 0)
+
+
+def test_recount_backfills_memberships(temp_db):
+    """Тест того, что пересчет восстанавливает членство создателя и текущую комнату."""
+    room_id = database.create_room(1)
+    database.add_user(2, 'guest')
+    session = database.Session()
+    session.query(User).filter(User.telegram_id == 2).update({'room_id': room_id})
+    session.execute(delete(user_room_association))
+    session.commit()
+    session.close()
+
+    assert database.recount_room_counters()['memberships'] == 2
+    assert _counters(room_id) == (2, 0, 0)
+    assert len(database.get_room_users(room_id)) == 2
+
+
+def test_upgrade_schema_adds_counter_columns(tmp_path):
+    """Тест того, что старая база без счетчиков получает столбцы при запуске."""
+    engine = create_engine(f'sqlite:///{tmp_path / "old.db"}')
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE rooms (id INTEGER PRIMARY KEY, code VARCHAR(8), "
+            "creator_id INTEGER, is_active BOOLEAN, is_paid BOOLEAN, "
+            "max_participants INTEGER, version VARCHAR(10), "
+            "created_at DATETIME, last_activity DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO rooms (id, code) VALUES (1, 'ABC')"))
+
+    assert database.upgrade_schema(engine) == [
+        'rooms.member_count', 'rooms.wish_count', 'rooms.viewed_wish_count'
+    ]
+    assert database.upgrade_schema(engine) == []
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT member_count FROM rooms")).scalar() == 0
+    wishes_indexes = {index['name'] for index in inspect(engine).get_indexes('wishes')}
+    assert 'idx_wish_user_room_id' in wishes_indexes
+    engine.dispose()
+
+
+def test_limit_check_reads_counters(count_queries):
+    """Тест того, что проверка лимитов не зависит от числа желаний."""
+    room_id = database.create_room(1)
+    creator_id = database.get_room_by_id(room_id)['creator_id']
+    with count_queries() as empty:
+        database.check_room_limits(room_id, creator_id)
+    for text in ('Книга', 'Шарф'):
+        database.add_wish(room_id, 1, text)
+    with count_queries() as filled:
+        limits = database.check_room_limits(room_id, creator_id)
+    assert limits == (False, "Лимиты не превышены")
+    assert empty.count == filled.count == 2
+    assert database.add_wish(room_id, 1, 'Носки')[0]
+    assert database.check_room_limits(room_id, creator_id)[0]
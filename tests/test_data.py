@@ -1,5 +1,11 @@
 """Модуль с тестовыми данными для тестирования."""
-from database import User, Room, Wish, UserRoom
+import random
+from collections import Counter
+
+from sqlalchemy import bindparam, insert, update
+
+from database import User, Room, Wish, MemberCounter, user_room_association
+from db_engine import reset_sequences
 
 
 def create_test_user(session, telegram_id=123456789, username="test_user"):
@@ -19,8 +25,7 @@ def create_test_room(session, owner_id, code="TEST123"):
     """Создает тестовую комнату."""
     room = Room(
         code=code,
-        owner_id=owner_id,
-        name="Test Room"
+        creator_id=owner_id
     )
     session.add(room)
     session.commit()
@@ -41,14 +46,11 @@ def create_test_wish(session, user_id, room_id, text="Test wish"):
 
 def create_test_user_room(session, user_id, room_id, is_owner=False):
     """Создает тестовую связь пользователя с комнатой."""
-    user_room = UserRoom(
+    session.execute(user_room_association.insert().values(
         user_id=user_id,
-        room_id=room_id,
-        is_owner=is_owner
-    )
-    session.add(user_room)
+        room_id=room_id
+    ))
     session.commit()
-    return user_room
 
 
 def setup_test_data(session):
@@ -57,16 +59,118 @@ def setup_test_data(session):
     user = create_test_user(session)
     
     # Создаем тестовую комнату
-    room = create_test_room(session, user.telegram_id)
+    room = create_test_room(session, user.id)
     
     # Создаем связь пользователя с комнатой
-    create_test_user_room(session, user.telegram_id, room.id, is_owner=True)
+    create_test_user_room(session, user.id, room.id, is_owner=True)
     
     # Создаем тестовое желание
-    wish = create_test_wish(session, user.telegram_id, room.id)
+    wish = create_test_wish(session, user.id, room.id)
     
     return {
         'user': user,
         'room': room,
         'wish': wish
-    } 
\ No newline at end of file
+    }
+
+
+def generate_dataset(engine, users, rooms, wishes_per_user=2, seed=0):
+    """
+    Заполняет базу синтетическими данными для нагрузочных замеров.
+    
+    Первые rooms пользователей создают по комнате. Остальные распределяются
+    по комнатам неравномерно (несколько больших комнат и много маленьких),
+    часть пользователей присоединилась еще к одной комнате. Желаний у
+    пользователя в среднем wishes_per_user, около трети просмотрено.
+    Счетчики комнат заполняются согласованно с данными.
+    
+    Returns:
+        dict: Число созданных пользователей, комнат и желаний
+    """
+    rng = random.Random(seed)
+    rooms = min(rooms, users)
+    weights = [1 / (index + 1) for index in range(rooms)]
+    current_rooms = list(range(1, rooms + 1)) + rng.choices(
+        range(1, rooms + 1), weights=weights, k=users - rooms
+    )
+    
+    users_rows = [
+        {
+            'id': user_id,
+            'telegram_id': 10_000_000 + user_id,
+            'username': f'user_{user_id}',
+            'first_name': f'Имя {user_id}',
+        }
+        for user_id in range(1, users + 1)
+    ]
+    memberships = set()
+    for user_id, room_id in enumerate(current_rooms, 1):
+        memberships.add((user_id, room_id))
+        if rng.random() < 0.2:
+            extra_room_id = rng.randint(1, rooms)
+            if extra_room_id != room_id and extra_room_id != user_id:
+                memberships.add((user_id, extra_room_id))
+    
+    wishes_rows = []
+    member_counters = []
+    for user_id, room_id in enumerate(current_rooms, 1):
+        count = rng.randint(0, wishes_per_user * 2)
+        viewed = 0
+        for index in range(count):
+            is_viewed = rng.random() < 0.3
+            viewed += is_viewed
+            wishes_rows.append({
+                'text': f'Желание {index} пользователя {user_id}',
+                'user_id': user_id,
+                'room_id': room_id,
+                'is_viewed': is_viewed,
+            })
+        if count:
+            member_counters.append({
+                'room_id': room_id, 'user_id': user_id,
+                'wish_count': count, 'viewed_wish_count': viewed,
+            })
+    
+    members = Counter(room_id for _, room_id in memberships)
+    wishes = Counter(row['room_id'] for row in wishes_rows)
+    viewed_wishes = Counter(row['room_id'] for row in wishes_rows if row['is_viewed'])
+    rooms_rows = [
+        {
+            'id': room_id,
+            'code': f'R{room_id:09d}',
+            'creator_id': room_id,
+            'is_active': True,
+            'is_paid': rng.random() < 0.3,
+            # Свободные места остаются для замеров присоединения
+            'max_participants': members[room_id] * 2 + 10,
+            'member_count': members[room_id],
+            'wish_count': wishes[room_id],
+            'viewed_wish_count': viewed_wishes[room_id],
+        }
+        for room_id in range(1, rooms + 1)
+    ]
+    
+    # users.room_id и rooms.creator_id ссылаются друг на друга
+    with engine.begin() as connection:
+        connection.execute(insert(User), users_rows)
+        connection.execute(insert(Room), rooms_rows)
+        connection.execute(
+            update(User)
+            .where(User.id == bindparam('user_id'))
+            .values(room_id=bindparam('current_room_id')),
+            [
+                {'user_id': user_id, 'current_room_id': room_id}
+                for user_id, room_id in enumerate(current_rooms, 1)
+            ]
+        )
+        if memberships:
+            connection.execute(insert(user_room_association), [
+                {'user_id': user_id, 'room_id': room_id}
+                for user_id, room_id in sorted(memberships)
+            ])
+        if wishes_rows:
+            connection.execute(insert(Wish), wishes_rows)
+            connection.execute(insert(MemberCounter), member_counters)
+        reset_sequences(connection)
+    
+    return {'users': users, 'rooms': rooms, 'wishes': len(wishes_rows)}
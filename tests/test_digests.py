@@ -0,0 +1,99 @@
+"""Тесты подборок желаний для ежедневной рассылки."""
+import pytest
+
+import database
+from digests import enqueue_wish_digests, refresh_wish_digests
+
+
+def _outbox_texts():
+    return [message['text'] for message in database.get_pending_messages()]
+
+
+def _delivered_count():
+    session = database.Session()
+    try:
+        return session.query(database.WishDigest).filter(
+            database.WishDigest.delivered_at.isnot(None)
+        ).count()
+    finally:
+        session.close()
+
+
+def test_digests_rebuilt_only_after_wish_change(seed_rooms):
+    """Тест того, что подборки пересобираются только в измененной комнате."""
+    seed_rooms(rooms=3, members=2, wishes=1)
+    assert refresh_wish_digests() == 3
+    assert refresh_wish_digests() == 0
+
+    success, _ = database.add_wish(2, 10_000_003, "Новое желание")
+    assert success
+    assert database.get_stale_digest_room_ids() == [2]
+    assert refresh_wish_digests() == 1
+
+    digests = database.get_wish_digests()
+    assert any("Новое желание" in digest['text'] for digest in digests)
+
+
+def test_update_and_delete_wish_invalidate_digests(seed_rooms):
+    """Тест сброса подборок при изменении и удалении желания."""
+    seed_rooms(rooms=1, members=2, wishes=1)
+    refresh_wish_digests()
+
+    assert database.update_wish(1, "Измененное желание")
+    assert database.get_stale_digest_room_ids() == [1]
+    refresh_wish_digests()
+
+    assert database.delete_wish(1, 1)
+    assert database.get_stale_digest_room_ids() == [1]
+
+
+@pytest.mark.asyncio
+async def test_skip_unchanged_digests(seed_rooms):
+    """Тест пропуска уже разосланных подборок без изменений."""
+    seed_rooms(rooms=2, members=2, wishes=1)
+
+    assert await enqueue_wish_digests(skip_unchanged=True) == 4
+    database.mark_messages_sent([message['id'] for message in database.get_pending_messages()])
+
+    assert await enqueue_wish_digests(skip_unchanged=True) == 0
+    assert await enqueue_wish_digests(skip_unchanged=False) == 4
+    database.mark_messages_sent([message['id'] for message in database.get_pending_messages()])
+
+    database.update_wish(1, "Измененное желание")
+    assert await enqueue_wish_digests(skip_unchanged=True) == 2
+    assert any("Измененное желание" in text for text in _outbox_texts())
+
+
+@pytest.mark.asyncio
+async def test_digest_delivered_only_after_sending(seed_rooms):
+    """Тест того, что подборка считается разосланной только после отправки."""
+    seed_rooms(rooms=2, members=2, wishes=1)
+
+    assert await enqueue_wish_digests(skip_unchanged=True) == 4
+    # Сообщения еще в очереди: повторно не ставятся, но и не разосланы
+    assert await enqueue_wish_digests(skip_unchanged=True) == 0
+    assert _delivered_count() == 0
+
+    pending = database.get_pending_messages()
+    database.mark_messages_sent([pending[0]['id']])
+    database.mark_messages_failed([
+        (message['id'], 'Forbidden: bot was blocked by the user') for message in pending[1:]
+    ])
+
+    # Неотправленные подборки ставятся в очередь снова
+    assert _delivered_count() == 1
+    assert await enqueue_wish_digests(skip_unchanged=True) == 3
+    assert pending[0]['text'] not in _outbox_texts()
+
+
+def test_member_keeps_digest_after_switching_rooms(seed_rooms):
+    """Тест того, что участник, перешедший в другую комнату, остается в первой."""
+    seed_rooms(rooms=2, members=2, wishes=1)
+    refresh_wish_digests()
+    assert database.join_room(2, 10_000_001)[0]
+    assert database.get_user_room(10_000_001)['room_id'] == 2
+
+    assert database.get_stale_digest_room_ids() == [2]
+    refresh_wish_digests()
+    recipients = {(digest['room_id'], digest['chat_id']) for digest in database.get_wish_digests()}
+    assert {(1, 10_000_001), (2, 10_000_001)} <= recipients
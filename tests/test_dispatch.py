@@ -0,0 +1,72 @@
+"""Тесты параллельной обработки обновлений."""
+import asyncio
+import pytest
+from telegram import Update
+
+from dispatch import OrderedUpdateProcessor
+
+
+def make_update(update_id, user_id):
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Тест'},
+            'text': str(update_id),
+        },
+    }, None)
+
+
+@pytest.mark.asyncio
+async def test_same_user_updates_keep_order():
+    """Тест того, что обновления одного пользователя идут по очереди."""
+    processor = OrderedUpdateProcessor(max_workers=8)
+    log = []
+
+    async def handle(update_id, user_id, delay):
+        log.append(('start', user_id, update_id))
+        await asyncio.sleep(delay)
+        log.append(('end', user_id, update_id))
+
+    # Первое обновление пользователя 1 самое медленное
+    jobs = [(1, 1, 0.05), (2, 1, 0.0), (3, 2, 0.0), (4, 1, 0.01)]
+    await asyncio.gather(*[
+        processor.process_update(make_update(update_id, user_id), handle(update_id, user_id, delay))
+        for update_id, user_id, delay in jobs
+    ])
+
+    user_1 = [update_id for event, user_id, update_id in log if user_id == 1 and event == 'start']
+    assert user_1 == [1, 2, 4]
+    # Пользователь 2 не ждет медленное обновление пользователя 1
+    assert log.index(('end', 2, 3)) < log.index(('end', 1, 1))
+    assert log.index(('end', 1, 1)) < log.index(('start', 1, 2))
+    assert log.index(('end', 1, 2)) < log.index(('start', 1, 4))
+
+
+@pytest.mark.asyncio
+async def test_worker_cap_and_metrics():
+    """Тест ограничения числа воркеров и метрик очереди."""
+    processor = OrderedUpdateProcessor(max_workers=3)
+    peak = 0
+
+    async def handle():
+        nonlocal peak
+        peak = max(peak, processor.running)
+        await asyncio.sleep(0.01)
+
+    tasks = [
+        asyncio.create_task(processor.process_update(make_update(i, 100 + i), handle()))
+        for i in range(20)
+    ]
+    await asyncio.sleep(0)
+    assert processor.stats()['waiting'] == 17
+
+    await asyncio.gather(*tasks)
+    stats = processor.stats()
+    assert peak == 3
+    assert stats['processed'] == 20
+    assert stats['peak_waiting'] == 17
+    assert stats['waiting'] == 0 and stats['running'] == 0
+    assert stats['active_users'] == 0
@@ -0,0 +1,90 @@
+"""Тесты жеребьевки."""
+import random
+import pytest
+
+import database
+from draw import draw_pairs, draw_room
+
+
+def _assert_valid(participants, pairs):
+    assert set(pairs) == set(participants)
+    assert sorted(pairs.values()) == sorted(participants)
+    assert all(giver != receiver for giver, receiver in pairs.items())
+
+
+def test_draw_pairs_is_derangement():
+    """Тест того, что каждый дарит ровно одному и не самому себе."""
+    participants = list(range(1, 1001))
+    for seed in range(5):
+        _assert_valid(participants, draw_pairs(participants, rng=random.Random(seed)))
+
+
+def test_draw_pairs_single_cycle():
+    """Тест построения одного общего цикла."""
+    participants = list(range(1, 51))
+    pairs = draw_pairs(participants, single_cycle=True, rng=random.Random(1))
+    _assert_valid(participants, pairs)
+
+    current, visited = participants[0], set()
+    while current not in visited:
+        visited.add(current)
+        current = pairs[current]
+    assert visited == set(participants)
+
+
+def test_draw_pairs_respects_exclusions():
+    """Тест того, что запрещенные пары не выпадают."""
+    participants = list(range(1, 201))
+    couples = []
+    for giver in range(1, 200, 2):
+        couples += [(giver, giver + 1), (giver + 1, giver)]
+
+    for seed in range(5):
+        pairs = draw_pairs(participants, couples, rng=random.Random(seed))
+        _assert_valid(participants, pairs)
+        assert not set(pairs.items()) & set(couples)
+
+
+def test_draw_pairs_tight_exclusions():
+    """Тест случая, когда разрешено ровно одно распределение."""
+    participants = [1, 2, 3, 4]
+    allowed = {1: 2, 2: 3, 3: 4, 4: 1}
+    exclusions = [
+        (giver, receiver)
+        for giver in participants for receiver in participants
+        if giver != receiver and allowed[giver] != receiver
+    ]
+    for seed in range(10):
+        assert draw_pairs(participants, exclusions, rng=random.Random(seed)) == allowed
+
+
+def test_draw_pairs_impossible():
+    """Тест ошибки при невозможной жеребьевке."""
+    with pytest.raises(ValueError):
+        draw_pairs([1, 2], [(1, 2)])
+    with pytest.raises(ValueError):
+        draw_pairs([1])
+
+
+def test_draw_room_saves_assignments(seed_rooms):
+    """Тест сохранения жеребьевки комнаты с учетом исключений."""
+    seed_rooms(rooms=1, members=4, wishes=0)
+    assert database.add_draw_exclusion(1, 10_000_001, 10_000_002)
+
+    success, _ = draw_room(1)
+    assert success
+
+    pairs = dict(database.get_assignments(1))
+    _assert_valid([1, 2, 3, 4], pairs)
+    assert pairs[1] != 2 and pairs[2] != 1
+
+    receiver = database.get_user_assignment(1, 10_000_001)
+    assert receiver['telegram_id'] == 10_000_000 + pairs[1]
+
+
+def test_draw_room_needs_two_members(seed_rooms):
+    """Тест отказа в жеребьевке для комнаты с одним участником."""
+    seed_rooms(rooms=1, members=1, wishes=0)
+    success, _ = draw_room(1)
+    assert not success
+    assert database.get_assignments(1) == []
@@ -0,0 +1,65 @@
+"""Тесты массового добавления участников в комнату."""
+import database
+from database import Room, User
+from scripts.db_manage import read_members
+
+
+def test_import_room_members(temp_db):
+    """Тест импорта пачками: новые и существующие пользователи, повторы."""
+    room_id = database.create_room(1)
+    other_room_id = database.create_room(2)
+    database.add_user(10, 'old_name', 'Иван')
+    database.add_user_to_room(other_room_id, 10)
+
+    members = [{'telegram_id': telegram_id} for telegram_id in range(100, 1100)]
+    members += [
+        {'telegram_id': '10', 'username': 'new_name'},
+        {'telegram_id': 100},
+        {'telegram_id': 'не число'},
+        {'username': 'без id'},
+    ]
+    # Бесплатная комната не вмещает список: импорт отклоняется целиком
+    assert database.import_room_members(room_id, members, batch_size=300) is None
+    assert database.count_users_in_room(room_id) == 1
+    assert database.get_user_by_telegram_id(100) is None
+
+    result = database.import_room_members(
+        room_id, members, batch_size=300, allow_over_limit=True
+    )
+    assert result == {'members': 1002, 'created': 1000, 'moved': 1001, 'skipped': 2}
+
+    session = database.Session()
+    try:
+        room = session.get(Room, room_id)
+        assert room.member_count == 1002
+        assert room.max_participants == 1002
+        user = session.query(User).filter(User.telegram_id == 10).one()
+        assert (user.username, user.first_name, user.room_id) == ('new_name', 'Иван', room_id)
+    finally:
+        session.close()
+    assert database.get_user_room(10)['room_id'] == room_id
+    # Участник другой комнаты сохраняет в ней место
+    assert database.count_users_in_room(other_room_id) == 2
+
+    # Повторный импорт ничего не меняет и помещается в поднятый лимит
+    again = database.import_room_members(room_id, members, batch_size=300)
+    assert again == {'members': 1002, 'created': 0, 'moved': 0, 'skipped': 2}
+    assert database.recount_room_counters()['rooms'] == 0
+    assert database.import_room_members(0, members) is None
+
+
+def test_read_members(tmp_path):
+    """Тест чтения участников из CSV и JSONL."""
+    csv_path = tmp_path / 'members.csv'
+    csv_path.write_text('telegram_id,username\n1,anna\n2,\n', encoding='utf-8')
+    jsonl_path = tmp_path / 'members.jsonl'
+    jsonl_path.write_text('{"telegram_id": 1, "username": "anna"}\n\n{"telegram_id": 2}\n', encoding='utf-8')
+
+    assert list(read_members(str(csv_path))) == [
+        {'telegram_id': '1', 'username': 'anna'},
+        {'telegram_id': '2', 'username': ''},
+    ]
+    assert list(read_members(str(jsonl_path))) == [
+        {'telegram_id': 1, 'username': 'anna'},
+        {'telegram_id': 2},
+    ]
@@ -0,0 +1,117 @@
+"""Тесты присоединения к комнате."""
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import insert
+
+import database
+from database import Room, User, user_room_association
+
+
+def _seed_users(engine, count, offset=100):
+    with engine.begin() as connection:
+        connection.execute(insert(User), [
+            {'telegram_id': offset + index, 'username': f'user_{index}'}
+            for index in range(count)
+        ])
+
+
+def _room_state(room_id):
+    session = database.Session()
+    try:
+        room = session.get(Room, room_id)
+        members = session.query(user_room_association).filter(
+            user_room_association.c.room_id == room_id
+        ).count()
+        return room.member_count, members
+    finally:
+        session.close()
+
+
+def test_join_room_messages(temp_db):
+    """Тест результатов присоединения к комнате."""
+    room_id = database.create_room(1)
+    database.update_room_version(room_id, 'free')
+    _seed_users(temp_db, 5)
+
+    assert database.join_room(room_id, 999) == (False, "Пользователь не найден")
+    assert database.join_room(0, 100) == (False, "Комната не найдена")
+    assert database.join_room(room_id, 1) == (False, "Вы уже состоите в этой комнате")
+    assert database.join_room(room_id, 100) == (True, "Вы успешно присоединились к комнате")
+    assert database.join_room(room_id, 100) == (False, "Вы уже состоите в этой комнате")
+    for telegram_id in range(101, 104):
+        assert database.join_room(room_id, telegram_id)[0]
+    assert database.join_room(room_id, 104) == (False, "Комната заполнена")
+    assert _room_state(room_id) == (5, 5)
+    assert database.get_user_room(100)['room_id'] == room_id
+
+    # Переход в другую комнату не освобождает место в прежней
+    other_room_id = database.create_room(2)
+    assert database.join_room(other_room_id, 100)[0]
+    assert database.get_user_room(100)['room_id'] == other_room_id
+    assert _room_state(room_id) == (5, 5)
+    assert database.join_room(room_id, 100) == (False, "Вы уже состоите в этой комнате")
+    assert database.join_room(other_room_id, 2) == (False, "Вы уже состоите в этой комнате")
+    assert database.recount_room_counters()['rooms'] == 0
+
+
+def test_join_leave_join_releases_seat(temp_db):
+    """Тест того, что выход из комнаты освобождает место и текущую комнату."""
+    room_id = database.create_room(1)
+    other_room_id = database.create_room(2)
+    database.update_room_version(room_id, 'free')
+    _seed_users(temp_db, 5)
+    for telegram_id in range(100, 104):
+        assert database.join_room(room_id, telegram_id)[0]
+    assert database.join_room(room_id, 104) == (False, "Комната заполнена")
+
+    # Текущая комната переключается на оставшуюся, а затем сбрасывается
+    assert database.join_room(other_room_id, 100)[0]
+    assert database.switch_room(100, room_id)
+    assert database.leave_room(100, room_id) == (True, "Вы успешно покинули комнату")
+    assert _room_state(room_id) == (4, 4)
+    assert database.get_user_room(100)['room_id'] == other_room_id
+    assert database.leave_room(100, room_id) == (False, "Вы не состоите в этой комнате")
+    assert database.leave_room(100, other_room_id)[0]
+    assert database.get_user_room(100)['room_id'] == 0
+    assert database.count_users_in_room(other_room_id) == 1
+
+    # Освободившееся место можно занять снова, но не сверх лимита
+    assert database.join_room(room_id, 104)[0]
+    assert database.join_room(room_id, 100) == (False, "Комната заполнена")
+    assert database.leave_room(104, room_id)[0]
+    assert database.join_room(room_id, 100)[0]
+    assert database.get_user_room(100)['room_id'] == room_id
+    assert _room_state(room_id) == (5, 5)
+    assert database.leave_room(1, room_id) == (False, "Создатель не может покинуть комнату")
+    assert database.recount_room_counters()['rooms'] == 0
+
+
+def test_join_room_query_count(temp_db, count_queries):
+    """Тест того, что присоединение выполняется небольшим числом запросов."""
+    room_id = database.create_room(1)
+    _seed_users(temp_db, 1)
+    with count_queries() as counter:
+        assert database.join_room(room_id, 100)[0]
+    assert counter.count <= 6
+
+
+def test_concurrent_joins_respect_limit(temp_db):
+    """Тест того, что 1000 одновременных присоединений не превышают 10 мест."""
+    room_id = database.create_room(1)
+    session = database.Session()
+    session.query(Room).filter(Room.id == room_id).update({'max_participants': 10})
+    session.commit()
+    session.close()
+    _seed_users(temp_db, 1000)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(
+            lambda telegram_id: database.join_room(room_id, telegram_id),
+            range(100, 1100)
+        ))
+
+    joined = [message for success, message in results if success]
+    rejected = {message for success, message in results if not success}
+    assert len(joined) == 9
+    assert rejected == {"Комната заполнена"}
+    assert _room_state(room_id) == (10, 10)
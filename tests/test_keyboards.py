@@ -0,0 +1,53 @@
+"""Тесты готовых клавиатур."""
+import json
+
+from telegram import InlineKeyboardMarkup
+
+import keyboards
+from config import KEYBOARD_CACHE_SIZE
+from scripts.benchmark import reply_markup_cost
+
+
+def _callback_data(markup):
+    return [[button.callback_data for button in row] for row in markup.inline_keyboard]
+
+
+def test_static_keyboards_are_built_once():
+    """Тест того, что статичные клавиатуры создаются один раз."""
+    assert keyboards.get_main_menu_keyboard() is keyboards.get_main_menu_keyboard()
+    assert _callback_data(keyboards.get_main_menu_keyboard()) == [
+        ['create_room', 'join_room'], ['list_rooms', 'create_wish'],
+        ['edit_wish', 'list_wishes'], ['help'],
+    ]
+    assert _callback_data(keyboards.get_room_version_keyboard()) == [
+        ['free_version', 'pro_version'], ['back_to_main'],
+    ]
+    assert _callback_data(keyboards.get_room_context_menu_keyboard()) == [
+        ['room_menu'], ['main_menu'],
+    ]
+
+
+def test_serialized_once_and_matches_plain_markup():
+    """Тест того, что словарь для Bot API строится один раз и не отличается от обычного."""
+    markup = keyboards.get_wish_actions_keyboard()
+    plain = keyboards.build_keyboard(keyboards.WISH_ACTIONS_LAYOUT, InlineKeyboardMarkup)
+
+    assert markup.to_dict() is markup.to_dict()
+    assert json.dumps(markup.to_dict()) == json.dumps(plain.to_dict())
+    assert markup == plain
+
+
+def test_room_keyboards_are_cached():
+    """Тест кэша клавиатур с ID комнаты."""
+    assert keyboards.get_confirm_join_keyboard(5) is keyboards.get_confirm_join_keyboard(5)
+    assert _callback_data(keyboards.get_confirm_join_keyboard(6)) == [['confirm_join_6', 'cancel_join']]
+    assert _callback_data(keyboards.get_room_payment_keyboard(7)) == [['pay_full_7', 'stay_free_7']]
+    assert _callback_data(keyboards.get_confirm_delete_keyboard(8)) == [
+        ['confirm_delete_8', 'cancel_delete']
+    ]
+    assert keyboards.get_confirm_join_keyboard.cache_info().maxsize == KEYBOARD_CACHE_SIZE
+
+
+def test_reply_markup_cost():
+    """Тест замера стоимости клавиатуры ответа."""
+    assert reply_markup_cost(lambda i: keyboards.get_main_menu_keyboard(), 10) > 0
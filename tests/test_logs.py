@@ -0,0 +1,101 @@
+"""Тесты настройки логирования."""
+import io
+import json
+import logging
+import threading
+
+import pytest
+
+from logs import SamplingFilter, parse_levels, setup_logging
+
+
+class Argument:
+    """Аргумент сообщения, запоминающий, где и сколько раз его форматировали."""
+
+    def __init__(self):
+        self.threads = []
+
+    def __str__(self):
+        self.threads.append(threading.current_thread())
+        return 'значение'
+
+
+@pytest.fixture
+def root_logger():
+    """Восстанавливает корневой логгер после теста."""
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    logging.getLogger('logs_test.quiet').setLevel(logging.NOTSET)
+
+
+def test_lazy_formatting_in_listener_thread(root_logger):
+    """Тест того, что сообщение собирается только для включенных уровней и не в вызывающем потоке."""
+    stream = io.StringIO()
+    listener = setup_logging(level='INFO', levels='', stream=stream)
+    logger = logging.getLogger('logs_test')
+    skipped, logged = Argument(), Argument()
+    try:
+        logger.debug("Отключенный уровень: %s", skipped)
+        logger.info("Комната %s", logged)
+    finally:
+        listener.stop()
+
+    assert skipped.threads == []
+    assert len(logged.threads) == 1
+    assert logged.threads[0] is not threading.current_thread()
+    assert 'logs_test - INFO - Комната значение' in stream.getvalue()
+
+
+def test_json_format_levels_and_sampling(root_logger):
+    """Тест вывода JSON, уровней отдельных логгеров и прореживания."""
+    stream = io.StringIO()
+    listener = setup_logging(
+        level='INFO', levels='logs_test.quiet=ERROR', log_format='json',
+        sample_every=3, stream=stream
+    )
+    logger = logging.getLogger('logs_test')
+    try:
+        for room_id in range(7):
+            logger.info("Обновлена комната %s", room_id, extra={'room_id': room_id})
+        logger.error("Ошибка %s", 1)
+        logger.error("Ошибка %s", 2)
+        logging.getLogger('logs_test.quiet').warning("Скрыто")
+    finally:
+        listener.stop()
+
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record['message'] for record in records] == [
+        'Обновлена комната 0', 'Обновлена комната 3', 'Обновлена комната 6',
+        'Ошибка 1', 'Ошибка 2',
+    ]
+    assert records[1]['room_id'] == 3
+    assert records[1]['level'] == 'INFO'
+    assert records[1]['logger'] == 'logs_test'
+
+
+def test_sampling_counts_are_bounded():
+    """Тест того, что прореживание хранит счетчики ограниченного числа шаблонов."""
+    sampling = SamplingFilter(every=2, maxsize=3)
+
+    def passed(message):
+        return sampling.filter(logging.LogRecord('test', logging.INFO, '', 0, message, (), None))
+
+    assert [passed("Частое %s") for _ in range(3)] == [True, False, True]
+    for index in range(10):
+        passed(f"Уникальное {index}")
+    assert len(sampling._counts) == 3
+    # Вытесненный шаблон считается заново
+    assert passed("Частое %s")
+
+
+def test_parse_levels():
+    """Тест разбора уровней отдельных логгеров."""
+    assert parse_levels('httpx=warning, database = INFO,,bad') == {
+        'httpx': 'WARNING', 'database': 'INFO'
+    }
@@ -0,0 +1,124 @@
+"""Тесты метрик функций базы данных."""
+import json
+import pytest
+from aiohttp import ClientSession
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+
+import database
+from metrics import Metrics, db_metrics
+from webhook import start_metrics_server
+
+
+@pytest.fixture
+def metrics():
+    """Включает общий реестр метрик на время теста."""
+    db_metrics.reset()
+    db_metrics.enable()
+    yield db_metrics
+    db_metrics.disable()
+    db_metrics.reset()
+
+
+def test_database_functions_are_measured(temp_db, metrics):
+    """Тест подсчета вызовов, запросов и строк функций database.py."""
+    room_id = database.create_room(1)
+    database.add_user(2, 'guest')
+    assert database.add_user_to_room(room_id, 2)
+    assert database.add_wish(room_id, 2, 'Книга')[0]
+    assert database.add_wish(room_id, 2, 'Шарф')[0]
+    assert len(database.get_room_wishes(room_id)) == 2
+
+    snapshot = metrics.snapshot()
+    wishes = snapshot['get_room_wishes']
+    assert wishes['calls'] == 1
+    assert wishes['errors'] == 0
+    assert wishes['rows'] == 2
+    assert wishes['statements'] >= 1
+    assert sum(wishes['buckets'].values()) == 1
+    assert snapshot['add_wish']['calls'] == 2
+    assert snapshot['add_wish']['statements'] >= 2
+    # Запросы вспомогательных функций приписываются вызвавшей функции
+    assert 'set_current_room' not in snapshot
+
+
+def test_failed_statement_leaves_no_state(temp_db, metrics):
+    """Тест того, что запрос с ошибкой не оставляет данных на соединении."""
+    @metrics.instrument
+    def broken_query():
+        with temp_db.connect() as connection:
+            connection.execute(text('SELECT * FROM no_such_table'))
+
+    @metrics.instrument
+    def two_queries():
+        with temp_db.connect() as connection:
+            connection.execute(text('SELECT 1'))
+            connection.execute(text('SELECT 1'))
+            return dict(connection.info)
+
+    for _ in range(3):
+        with pytest.raises((OperationalError, ProgrammingError)):
+            broken_query()
+    assert two_queries() == {}
+
+    snapshot = metrics.snapshot()
+    assert snapshot['broken_query']['errors'] == 3
+    assert snapshot['two_queries']['statements'] == 2
+
+
+def test_disabled_metrics_record_nothing(temp_db):
+    """Тест того, что выключенные метрики ничего не записывают."""
+    db_metrics.reset()
+    assert not db_metrics.enabled
+    room_id = database.create_room(1)
+    database.get_room_wishes(room_id)
+    assert db_metrics.snapshot() == {}
+
+
+def test_errors_and_exports(tmp_path):
+    """Тест подсчета ошибок и выгрузки в Prometheus и JSON."""
+    registry = Metrics(prefix='test')
+    registry.enable()
+    try:
+        @registry.instrument
+        def load(fail=False):
+            if fail:
+                raise ValueError('ошибка')
+            return [1, 2, 3]
+
+        assert load() == [1, 2, 3]
+        with pytest.raises(ValueError):
+            load(fail=True)
+    finally:
+        registry.disable()
+
+    stats = registry.snapshot()['load']
+    assert (stats['calls'], stats['errors'], stats['rows']) == (2, 1, 3)
+
+    text = registry.render_prometheus()
+    assert '# TYPE test_calls_total counter' in text
+    assert 'test_calls_total{function="load"} 2' in text
+    assert 'test_errors_total{function="load"} 1' in text
+    assert 'test_duration_seconds_bucket{function="load",le="+Inf"} 2' in text
+    assert 'test_duration_seconds_count{function="load"} 2' in text
+
+    path = tmp_path / 'metrics.json'
+    registry.dump_json(str(path))
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data['functions']['load']['calls'] == 2
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(temp_db, metrics):
+    """Тест отдачи метрик по HTTP."""
+    database.create_room(1)
+    runner = await start_metrics_server(host='127.0.0.1', port=0)
+    try:
+        port = runner.addresses[0][1]
+        async with ClientSession() as client:
+            async with client.get(f'http://127.0.0.1:{port}/metrics') as response:
+                assert response.status == 200
+                text = await response.text()
+    finally:
+        await runner.cleanup()
+    assert 'santa_db_calls_total{function="create_room"} 1' in text
@@ -0,0 +1,121 @@
+"""Тесты переноса данных между базами."""
+import pytest
+from sqlalchemy import func, select, text
+
+from database import Base, Room, User, Wish
+from db_engine import create_db_engine
+from migration import migrate_database
+from tests.helpers import seed_rooms
+
+
+@pytest.fixture
+def source(tmp_path):
+    """Исходная база SQLite с комнатами, участниками и желаниями."""
+    engine = create_db_engine(f'sqlite:///{tmp_path / "source.db"}')
+    Base.metadata.create_all(engine)
+    seed_rooms(engine, rooms=20, members=5, wishes=3)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def destination(request, tmp_path):
+    """Пустая целевая база SQLite или PostgreSQL."""
+    if request.param == 'sqlite':
+        url = f'sqlite:///{tmp_path / "destination.db"}'
+    else:
+        url = request.getfixturevalue('postgres_url')
+    engine = create_db_engine(url)
+    Base.metadata.drop_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _snapshot(engine):
+    with engine.connect() as connection:
+        return {
+            'users': connection.execute(
+                select(User.telegram_id, User.room_id).order_by(User.id)
+            ).all(),
+            'rooms': connection.execute(
+                select(Room.code, Room.creator_id, Room.member_count).order_by(Room.id)
+            ).all(),
+            'wishes': connection.execute(select(func.count(Wish.id))).scalar(),
+        }
+
+
+def test_migrate_in_chunks(source, destination):
+    """Тест переноса всех таблиц пачками с сохранением связей."""
+    chunks = []
+    copied = migrate_database(
+        source, destination, chunk_size=40,
+        progress=lambda table, done, total, elapsed: chunks.append((table, done, total))
+    )
+
+    assert copied['users'] == 100 and copied['rooms'] == 20 and copied['wishes'] == 300
+    assert ('wishes', 40, 300) in chunks and ('wishes', 300, 300) in chunks
+    assert _snapshot(destination) == _snapshot(source)
+
+    # Последовательности выровнены: новые строки получают следующие ID
+    with destination.begin() as connection:
+        connection.execute(Wish.__table__.insert().values(text='Новое', room_id=1, user_id=1))
+        assert connection.execute(select(func.max(Wish.id))).scalar() == 301
+
+    with pytest.raises(ValueError):
+        migrate_database(source, destination)
+
+
+def test_migrate_resumes_after_failure(source, destination):
+    """Тест продолжения переноса с последней записанной пачки."""
+    def fail_on_wishes(table, done, total, elapsed):
+        if table == 'wishes' and done == 120:
+            raise RuntimeError('обрыв соединения')
+
+    with pytest.raises(RuntimeError):
+        migrate_database(source, destination, chunk_size=40, progress=fail_on_wishes)
+
+    copied = migrate_database(source, destination, chunk_size=40, resume=True)
+    assert copied['users'] == 0 and copied['wishes'] == 180
+    assert _snapshot(destination) == _snapshot(source)
+
+
+@pytest.fixture
+def baseline_source(tmp_path):
+    """Исходная база первой версии бота: без счетчиков, outbox и подборок."""
+    engine = create_db_engine(f'sqlite:///{tmp_path / "baseline.db"}')
+    with engine.begin() as connection:
+        for ddl in (
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id BIGINT NOT NULL UNIQUE, "
+            "username VARCHAR(32), first_name VARCHAR(64), last_name VARCHAR(64), "
+            "created_at DATETIME, is_admin BOOLEAN, is_premium BOOLEAN, room_id INTEGER)",
+            "CREATE TABLE rooms (id INTEGER PRIMARY KEY, code VARCHAR(8), creator_id INTEGER, "
+            "created_at DATETIME, is_active BOOLEAN, is_paid BOOLEAN, "
+            "max_participants INTEGER, description TEXT, last_activity DATETIME)",
+            "CREATE TABLE wishes (id INTEGER PRIMARY KEY, text TEXT NOT NULL, created_at DATETIME, "
+            "is_viewed BOOLEAN, user_id INTEGER, room_id INTEGER)",
+            "CREATE TABLE user_room_association (user_id INTEGER, room_id INTEGER, "
+            "joined_at DATETIME, PRIMARY KEY (user_id, room_id))",
+            "INSERT INTO users (id, telegram_id, room_id) VALUES (1, 101, 1), (2, 102, 1), (3, 103, 2)",
+            "INSERT INTO rooms (id, code, creator_id, is_active, is_paid, max_participants) "
+            "VALUES (1, 'AAAA1111', 1, 1, 0, 5), (2, 'BBBB2222', 3, 1, 0, 5)",
+            "INSERT INTO user_room_association (user_id, room_id) VALUES (2, 1)",
+            "INSERT INTO wishes (text, is_viewed, user_id, room_id) "
+            "VALUES ('Книга', 1, 1, 1), ('Шарф', 0, 2, 1)",
+        ):
+            connection.execute(text(ddl))
+    yield engine
+    engine.dispose()
+
+
+def test_migrate_from_baseline_schema(baseline_source, destination):
+    """Тест переноса из базы старой версии: общие столбцы и пересчет счетчиков."""
+    copied = migrate_database(baseline_source, destination)
+
+    assert copied == {'users': 3, 'rooms': 2, 'wishes': 2, 'user_room_association': 1}
+    with destination.connect() as connection:
+        rooms = connection.execute(
+            select(Room.code, Room.member_count, Room.wish_count, Room.viewed_wish_count)
+            .order_by(Room.id)
+        ).all()
+        assert [tuple(room) for room in rooms] == [('AAAA1111', 2, 2, 1), ('BBBB2222', 1, 0, 0)]
+        assert connection.execute(select(User.room_id).order_by(User.id)).scalars().all() == [1, 1, 2]
@@ -0,0 +1,103 @@
+"""Тесты постраничных списков комнат и желаний."""
+import os
+
+from sqlalchemy import event
+
+import database
+from database import Wish
+from keyboards import get_page_buttons, get_page_cursor
+
+
+def _walk(fetch):
+    """Проходит страницы вперед, затем назад; возвращает ID по страницам."""
+    pages = [fetch()]
+    while pages[-1]['next'] is not None:
+        pages.append(fetch(after=pages[-1]['next']))
+    backward = [pages[-1]]
+    while backward[-1]['prev'] is not None:
+        backward.append(fetch(before=backward[-1]['prev']))
+    ids = lambda page: [item['id'] for item in page['items']]
+    return [ids(page) for page in pages], [ids(page) for page in reversed(backward)]
+
+
+def test_rooms_pages(seed_user_rooms):
+    """Тест перехода по страницам комнат в обе стороны."""
+    telegram_id = seed_user_rooms(rooms=23, members=2)
+    forward, backward = _walk(
+        lambda **cursor: database.get_rooms_page(telegram_id, limit=10, **cursor)
+    )
+    assert forward == [list(range(1, 11)), list(range(11, 21)), [21, 22, 23]]
+    assert backward == forward
+
+    first = database.get_rooms_page(telegram_id, limit=10)
+    assert first['prev'] is None and first['next'] == 10
+    assert first['items'][0]['is_creator'] and first['items'][0]['is_current']
+    assert first['items'][1]['current_users'] == 3
+    assert database.get_rooms_page(telegram_id, limit=30)['next'] is None
+    assert database.get_rooms_page(1) == {'items': [], 'prev': None, 'next': None}
+
+
+def test_page_query_count_independent_of_position(count_queries, seed_user_rooms):
+    """Тест того, что дальняя страница стоит столько же запросов, сколько первая."""
+    telegram_id = seed_user_rooms(rooms=60, members=1)
+    with count_queries() as first:
+        database.get_rooms_page(telegram_id, limit=5)
+    with count_queries() as last:
+        page = database.get_rooms_page(telegram_id, after=55, limit=5)
+    assert [room['id'] for room in page['items']] == [56, 57, 58, 59, 60]
+    assert first.count == last.count
+
+
+def test_rooms_page_is_single_range(temp_db, seed_user_rooms):
+    """Тест того, что страница комнат - диапазон индекса, без OR и IN."""
+    telegram_id = seed_user_rooms(rooms=12, members=1)
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(temp_db, 'before_cursor_execute', listener)
+    try:
+        database.get_rooms_page(telegram_id, after=5, limit=5)
+    finally:
+        event.remove(temp_db, 'before_cursor_execute', listener)
+    page_query = statements[-1].upper()
+    assert 'USER_ROOM_ASSOCIATION.USER_ID = ' in page_query
+    assert 'USER_ROOM_ASSOCIATION.ROOM_ID > ' in page_query
+    assert ' OR ' not in page_query and ' IN ' not in page_query
+
+
+def test_wishes_pages(temp_db):
+    """Тест страниц желаний пользователя в комнате."""
+    room_id = database.create_room(1)
+    other_room_id = database.create_room(2)
+    user_id = database.get_user_by_telegram_id(1)['id']
+    session = database.Session()
+    try:
+        session.add_all([Wish(user_id=user_id, room_id=room_id, text=f'Желание {i}') for i in range(7)])
+        session.add(Wish(user_id=user_id, room_id=other_room_id, text='Чужая комната'))
+        session.commit()
+    finally:
+        session.close()
+
+    forward, backward = _walk(
+        lambda **cursor: database.get_wishes_page(1, room_id, limit=3, **cursor)
+    )
+    assert [len(ids) for ids in forward] == [3, 3, 1]
+    assert backward == forward
+    assert database.get_wishes_page(2, room_id)['items'] == []
+
+
+def test_page_buttons_round_trip():
+    """Тест кнопок страниц и разбора курсора из callback_data."""
+    buttons = get_page_buttons('rooms_', {'prev': 11, 'next': 20})
+    assert [button.callback_data for button in buttons] == ['rooms_prev_11', 'rooms_next_20']
+    assert get_page_cursor('rooms_prev_11', 'rooms_') == (None, 11)
+    assert get_page_cursor('rooms_next_20', 'rooms_') == (20, None)
+    assert get_page_cursor('list_rooms', 'rooms_') == (None, None)
+    assert get_page_buttons('rooms_', {'prev': None, 'next': None}) == []
+
+    os.environ.setdefault('BOT_TOKEN', '0:test')
+    from main import build_callback_router
+    from rooms import list_rooms
+    from wishes import edit_wish_handler
+    router = build_callback_router()
+    assert router.resolve('rooms_next_20') is list_rooms
+    assert router.resolve('wishes_prev_3') is edit_wish_handler
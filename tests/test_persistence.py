@@ -0,0 +1,146 @@
+"""Тесты хранения состояния бота между перезапусками."""
+import asyncio
+from datetime import datetime
+import pytest
+
+import database
+from persistence import PersistenceBackend, RedisStateStore, SqlStateStore
+
+
+class CountingStore:
+    """Хранилище в памяти, считающее записи."""
+
+    def __init__(self):
+        self.data = {}
+        self.saves = 0
+
+    async def load(self, namespace):
+        return {key: value for (ns, key), value in self.data.items() if ns == namespace}
+
+    async def save(self, items):
+        self.saves += 1
+        for item, value in items.items():
+            if value is None:
+                self.data.pop(item, None)
+            else:
+                self.data[item] = value
+        return True
+
+
+@pytest.mark.asyncio
+async def test_sql_round_trip(temp_db):
+    """Состояние, записанное одним экземпляром, читается после перезапуска."""
+    persistence = PersistenceBackend(SqlStateStore())
+    await persistence.update_user_data(1, {'waiting_for': 'wish'})
+    await persistence.update_user_data(2, {'editing_wish_id': 7})
+    await persistence.update_bot_data({'started': True})
+    await persistence.flush()
+    await persistence.drop_user_data(2)
+    await persistence.flush()
+
+    restarted = PersistenceBackend(SqlStateStore())
+    assert await restarted.get_user_data() == {1: {'waiting_for': 'wish'}}
+    assert await restarted.get_bot_data() == {'started': True}
+    assert await restarted.get_chat_data() == {}
+    assert database.load_bot_state('user_data') == {'1': '{"waiting_for": "wish"}'}
+
+
+@pytest.mark.asyncio
+async def test_updates_are_batched():
+    """Изменения за один цикл записываются одной пачкой, неизмененные пропускаются."""
+    store = CountingStore()
+    persistence = PersistenceBackend(store)
+    for user_id in range(100):
+        await persistence.update_user_data(user_id, {'waiting_for': 'room_code'})
+    await asyncio.sleep(0)
+    await persistence.flush()
+    assert store.saves == 1
+    assert len(store.data) == 100
+
+    # Данные не изменились - записывать нечего
+    for user_id in range(100):
+        await persistence.update_user_data(user_id, {'waiting_for': 'room_code'})
+    await persistence.flush()
+    assert store.saves == 1
+
+    await persistence.update_user_data(5, {})
+    await persistence.flush()
+    assert store.saves == 2
+    assert store.data[('user_data', '5')] == '{}'
+
+
+@pytest.mark.asyncio
+async def test_failed_save_is_retried():
+    """Несохраненные изменения остаются в буфере до следующей записи."""
+    store = CountingStore()
+    persistence = PersistenceBackend(store)
+    original_save = store.save
+
+    async def failing_save(items):
+        raise ConnectionError('нет соединения')
+
+    store.save = failing_save
+    await persistence.update_user_data(1, {'waiting_for': 'wish'})
+    await persistence.flush()
+    assert store.data == {}
+
+    store.save = original_save
+    await persistence.flush()
+    assert store.data == {('user_data', '1'): '{"waiting_for": "wish"}'}
+
+
+@pytest.mark.asyncio
+async def test_redis_store():
+    """Хранилище Redis работает с совместимым клиентом."""
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.aioredis.FakeRedis()
+    persistence = PersistenceBackend(RedisStateStore(client))
+    await persistence.update_user_data(1, {'waiting_for': 'wish'})
+    await persistence.update_user_data(2, {'editing_wish_id': 3})
+    await persistence.flush()
+    await persistence.drop_user_data(2)
+    await persistence.flush()
+
+    restarted = PersistenceBackend(RedisStateStore(client))
+    assert await restarted.get_user_data() == {1: {'waiting_for': 'wish'}}
+    assert await client.hkeys('santa:user_data') == [b'1']
+
+
+@pytest.mark.asyncio
+async def test_state_must_survive_json():
+    """Состояние, которое JSON исказил бы, не сохраняется молча."""
+    persistence = PersistenceBackend(CountingStore())
+    with pytest.raises(TypeError):
+        await persistence.update_user_data(1, {'created': datetime(2025, 12, 1)})
+    with pytest.raises(TypeError):
+        await persistence.update_user_data(1, {7: 'wish'})
+    with pytest.raises(TypeError):
+        await persistence.update_chat_data(1, {'pair': (1, 2)})
+    assert persistence._pending == {}
+
+
+@pytest.mark.asyncio
+async def test_changes_during_flush_are_written():
+    """Изменения, пришедшие во время записи, записываются следующей пачкой."""
+    store = CountingStore()
+    persistence = PersistenceBackend(store)
+    original_save = store.save
+    release = asyncio.Event()
+
+    async def slow_save(items):
+        await release.wait()
+        return await original_save(items)
+
+    store.save = slow_save
+    await persistence.update_user_data(1, {'waiting_for': 'wish'})
+    await asyncio.sleep(0)
+    # Первая запись ждет хранилище; второе изменение приходит во время нее
+    await persistence.update_user_data(2, {'waiting_for': 'room_code'})
+    release.set()
+    await asyncio.wait_for(_until(lambda: len(store.data) == 2), timeout=1)
+    assert store.saves == 2
+
+
+async def _until(condition):
+    while not condition():
+        await asyncio.sleep(0)
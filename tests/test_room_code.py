@@ -0,0 +1,108 @@
+"""Тесты кодов комнат."""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy import insert
+
+import database
+from database import Room, User
+from room_codes import ALPHABET, CODE_LENGTH, CODE_SPACE, encode, permute
+
+
+def test_code_lookup_is_case_insensitive(seed_rooms):
+    """Тест поиска комнаты по коду без учета регистра и пробелов."""
+    seed_rooms(rooms=2, members=1, wishes=0)
+
+    assert database.get_room_id_by_code(' r000000002 ') == 2
+    assert database.get_room_by_code('r000000001')['id'] == 1
+    assert database.get_room_details('r000000002')['id'] == 2
+    assert database.get_room_id_by_code('R999999999') == 0
+
+
+def test_code_lookup_is_single_indexed_query(temp_db, count_queries, seed_rooms):
+    """Тест того, что поиск по коду - один запрос по индексу."""
+    seed_rooms(rooms=50, members=1, wishes=0)
+
+    with count_queries() as counter:
+        assert database.get_room_id_by_code('r000000025') == 25
+    assert counter.count == 1
+
+    with temp_db.connect() as connection:
+        if temp_db.dialect.name == 'sqlite':
+            plan = connection.exec_driver_sql(
+                "EXPLAIN QUERY PLAN SELECT id FROM rooms WHERE code = 'R000000025'"
+            ).scalars(3).all()
+        else:
+            # На 50 строках планировщик предпочтет полный просмотр,
+            # проверяем, что индекс в принципе применим
+            connection.exec_driver_sql("SET enable_seqscan = off")
+            plan = connection.exec_driver_sql(
+                "EXPLAIN SELECT id FROM rooms WHERE code = 'R000000025'"
+            ).scalars().all()
+    assert 'Index' in plan[0] or 'INDEX' in plan[0]
+
+
+def test_room_code_normalized_on_write():
+    """Тест нормализации кода при сохранении комнаты."""
+    assert Room(code=' ab12cd ').code == 'AB12CD'
+
+
+def test_permute_is_bijective():
+    """Тест того, что разные номера дают разные коды."""
+    secret = b'0123456789abcdef'
+    codes = {permute(number, secret) for number in range(20000)}
+    assert len(codes) == 20000
+    assert all(0 <= code < CODE_SPACE for code in codes)
+
+    code = encode(permute(CODE_SPACE - 1, secret))
+    assert len(code) == CODE_LENGTH and set(code) <= set(ALPHABET)
+
+
+def test_codes_reserved_in_blocks(monkeypatch, count_queries):
+    """Тест того, что база резервирует номера одним запросом на блок."""
+    monkeypatch.setattr(database.room_codes, 'block_size', 10)
+
+    with count_queries() as counter:
+        codes = [database.generate_room_code() for _ in range(25)]
+
+    assert len(set(codes)) == 25
+    # Три блока по 10 номеров: UPDATE и INSERT счетчика, затем два UPDATE
+    assert counter.count == 4
+
+
+def test_create_room_skips_taken_code(temp_db):
+    """Тест создания комнаты, когда очередной код уже занят."""
+    taken = database.generate_room_code()
+    database.room_codes.reset()
+    with temp_db.begin() as connection:
+        creator_id = connection.execute(
+            insert(User).values(telegram_id=1)
+        ).inserted_primary_key[0]
+        connection.execute(insert(Room), [{'code': taken, 'creator_id': creator_id}])
+    # Возвращаем счетчик к началу, чтобы первым снова выдался занятый код
+    with temp_db.begin() as connection:
+        connection.exec_driver_sql("UPDATE room_code_sequence SET next_value = 0")
+
+    room_id = database.create_room(2)
+
+    assert room_id
+    assert database.get_room_by_id(room_id)['code'] != taken
+
+
+@pytest.mark.asyncio
+async def test_create_room_handler_uses_room_code(temp_db, monkeypatch):
+    """Тест того, что создание комнаты из бота расходует один код."""
+    from rooms import create_room_handler
+
+    codes = []
+    generate = database.generate_room_code
+    monkeypatch.setattr(database, 'generate_room_code', lambda: codes.append(generate()) or codes[-1])
+    message = SimpleNamespace(reply_text=AsyncMock())
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=1), message=message)
+
+    await create_room_handler(update, SimpleNamespace(args=[]))
+
+    assert len(codes) == 1
+    text = message.reply_text.call_args.args[0]
+    assert f'"Комната {codes[0]}"' in text and f'кодом: {codes[0]}' in text
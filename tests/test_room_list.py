@@ -0,0 +1,43 @@
+"""Тесты загрузки списка комнат пользователя."""
+import database
+
+
+def test_room_list_query_count_independent_of_rooms(temp_db, count_queries, seed_user_rooms):
+    """Тест того, что число запросов не зависит от числа комнат пользователя."""
+    telegram_id = seed_user_rooms(rooms=5, members=3)
+    with count_queries() as small:
+        assert len(database.get_all_rooms(telegram_id)) == 5
+
+    database.Base.metadata.drop_all(temp_db)
+    database.Base.metadata.create_all(temp_db)
+    telegram_id = seed_user_rooms(rooms=50, members=3)
+    with count_queries() as large:
+        assert len(database.get_all_rooms(telegram_id)) == 50
+
+    assert small.count == large.count
+
+
+def test_room_list_contents(seed_user_rooms):
+    """Тест порядка комнат, счетчиков и загрузки участников по запросу."""
+    telegram_id = seed_user_rooms(rooms=3, members=2)
+    rooms = database.get_all_rooms(telegram_id)
+
+    assert [room['id'] for room in rooms] == [1, 2, 3]
+    assert [room['is_creator'] for room in rooms] == [True, False, False]
+    assert [room['is_current'] for room in rooms] == [True, False, False]
+    assert [room['current_users'] for room in rooms] == [2, 3, 3]
+    assert 'participants' not in rooms[0]
+
+    rooms = database.get_all_rooms(telegram_id, with_participants=True)
+    assert [p['username'] for p in rooms[1]['participants']] == ['user_1', 'user_3', 'user_4']
+
+
+def test_room_list_includes_current_room(seed_user_rooms):
+    """Тест того, что в список попадает комната, в которой пользователь только участник."""
+    seed_user_rooms(rooms=2, members=2)
+    # Второй участник первой комнаты не создавал комнат и не присоединялся явно
+    rooms = database.get_all_rooms(10_000_002)
+    assert [(room['id'], room['is_creator'], room['is_current']) for room in rooms] == [
+        (1, False, True)
+    ]
+    assert database.get_all_rooms(999) == []
@@ -0,0 +1,49 @@
+"""Тесты маршрутизации нажатий на кнопки."""
+import os
+
+import pytest
+
+from routing import CallbackRouter
+from scripts.benchmark import (
+    SAMPLE_CALLBACK_DATA, legacy_callback_handlers, make_callback_update
+)
+
+
+async def first(update, context):
+    pass
+
+
+async def second(update, context):
+    pass
+
+
+def test_router_exact_and_prefix():
+    """Тест поиска по точному значению и по префиксу."""
+    router = CallbackRouter(fallback=second)
+    router.add('edit_wish', first)
+    router.add_prefix('edit_wish_', second)
+    router.add_prefix('room_', first, numeric=True)
+
+    assert router.resolve('edit_wish') is first
+    assert router.resolve('edit_wish_15') is second
+    assert router.resolve('room_5') is first
+    assert router.resolve('room_abc') is None
+    assert router.resolve('unknown') is None
+
+    with pytest.raises(ValueError):
+        router.add_prefix('room', first)
+
+
+def test_router_matches_legacy_handler_chain():
+    """Тест того, что таблица выбирает те же обработчики, что прежняя цепочка."""
+    os.environ.setdefault('BOT_TOKEN', '0:test')
+    from main import build_callback_router
+
+    router = build_callback_router()
+    legacy = legacy_callback_handlers()
+
+    for data in SAMPLE_CALLBACK_DATA + ['switch_room_x', 'stay_free_1', 'room_menu']:
+        update = make_callback_update(data)
+        expected = next(name for name, handler in legacy if handler.check_update(update))
+        handler = router.resolve(data) or router.fallback
+        assert handler.__name__ == expected, data
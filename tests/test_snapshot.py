@@ -0,0 +1,39 @@
+"""Тесты загрузки снимков комнат для рассылки."""
+import database
+from digests import format_digest
+
+
+def test_snapshot_query_count_independent_of_rooms(temp_db, count_queries, seed_rooms):
+    """Тест того, что число запросов не зависит от числа комнат."""
+    seed_rooms(rooms=3, members=2, wishes=1)
+    with count_queries() as small:
+        assert len(database.load_room_snapshots()) == 3
+
+    database.Base.metadata.drop_all(temp_db)
+    database.Base.metadata.create_all(temp_db)
+    seed_rooms(rooms=30, members=2, wishes=1)
+    with count_queries() as large:
+        assert len(database.load_room_snapshots()) == 30
+
+    assert small.count == large.count
+
+
+def test_format_digest_skips_own_wishes(seed_rooms):
+    """Тест того, что участник не получает собственные желания."""
+    seed_rooms(rooms=1, members=2, wishes=1)
+    room = database.load_room_snapshots()[0]
+    first, second = room['members']
+
+    assert 'user_2' in format_digest(room, first['id'])
+    assert 'user_1' not in format_digest(room, first['id'])
+    assert 'user_1' in format_digest(room, second['id'])
+
+
+def test_snapshot_includes_members_of_other_current_room(seed_rooms):
+    """Тест того, что снимок включает участников, перешедших в другую комнату."""
+    seed_rooms(rooms=2, members=2, wishes=1)
+    assert database.join_room(2, 10_000_001)[0]
+
+    snapshots = {room['id']: room for room in database.load_room_snapshots()}
+    assert sorted(member['id'] for member in snapshots[1]['members']) == [1, 2]
+    assert sorted(member['id'] for member in snapshots[2]['members']) == [1, 3, 4]
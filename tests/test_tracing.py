@@ -0,0 +1,128 @@
+"""Тесты трассировки обработчиков обновлений."""
+import pytest
+from telegram import Update, User
+from telegram.ext import Application, CallbackQueryHandler, ExtBot
+from telegram.request import HTTPXRequest
+
+import async_database
+from routing import CallbackRouter
+from tracing import (
+    HandlerStats, Trace, TracedRequest, Tracer, instrument_application, percentile, tracer
+)
+
+
+class OfflineBot(ExtBot):
+    """Бот, не обращающийся к Telegram при инициализации."""
+
+    async def get_me(self, *args, **kwargs):
+        self._bot_user = User(1, 'Santa', is_bot=True, username='santa_bot')
+        return self._bot_user
+
+
+def callback_update(data):
+    return {
+        'update_id': 1,
+        'callback_query': {
+            'id': '10',
+            'chat_instance': '1',
+            'data': data,
+            'from': {'id': 5, 'is_bot': False, 'first_name': 'Тест'},
+        },
+    }
+
+
+@pytest.fixture
+def enabled_tracer():
+    tracer.reset()
+    tracer.enable()
+    yield tracer
+    tracer.disable()
+    tracer.reset()
+
+
+@pytest.mark.asyncio
+async def test_handler_trace_has_db_and_api_spans(temp_db, enabled_tracer, monkeypatch):
+    """Тест трассы нажатия на кнопку с запросом к базе и к Bot API."""
+    async def fake_do_request(self, url, method, *args, **kwargs):
+        return 200, b'{"ok": true, "result": true}'
+    monkeypatch.setattr(HTTPXRequest, 'do_request', fake_do_request)
+
+    async def confirm_join_handler(update, context):
+        await async_database.get_room_by_id(1)
+        await context.bot.answer_callback_query(update.callback_query.id)
+
+    async def fallback(update, context):
+        pass
+
+    router = CallbackRouter(fallback=fallback)
+    router.add_prefix('confirm_join_', confirm_join_handler)
+    application = Application.builder().bot(
+        OfflineBot('123:TEST', request=TracedRequest())
+    ).updater(None).build()
+    application.add_handler(CallbackQueryHandler(router))
+    instrument_application(application)
+
+    async with application:
+        await application.process_update(
+            Update.de_json(callback_update('confirm_join_ABC'), application.bot)
+        )
+        await application.process_update(
+            Update.de_json(callback_update('other'), application.bot)
+        )
+
+    stats = tracer.snapshot()
+    assert set(stats) == {'confirm_join_handler', 'fallback'}
+    confirm = stats['confirm_join_handler']
+    assert confirm['count'] == 1
+    assert confirm['db_calls'] == 1
+    assert confirm['bot_api_calls'] == 1
+    assert confirm['p99'] >= confirm['db_seconds'] + confirm['bot_api_seconds']
+    assert stats['fallback']['db_calls'] == 0
+
+    trace = tracer.recent[0]
+    assert trace.root.name == 'CallbackRouter'
+    (handler_span,) = trace.root.children
+    assert handler_span.name == 'confirm_join_handler'
+    assert [(span.kind, span.name) for span in handler_span.children] == [
+        ('db', 'get_room_by_id'), ('bot_api', 'answerCallbackQuery')
+    ]
+
+
+@pytest.mark.asyncio
+async def test_disabled_tracer_records_nothing():
+    """Тест того, что выключенная трассировка ничего не записывает."""
+    local = Tracer()
+
+    async def handler(update, context):
+        with local.span('db', 'query') as span:
+            assert span is None
+        return 'ok'
+
+    assert await local.trace_handler(handler)(None, None) == 'ok'
+    assert local.snapshot() == {}
+
+
+def test_percentiles_and_prometheus():
+    """Тест перцентилей по окну последних обновлений и формата Prometheus."""
+    assert percentile([], 0.5) == 0.0
+    values = [float(value) for value in range(1, 101)]
+    assert percentile(values, 0.5) == 50.0
+    assert percentile(values, 0.95) == 95.0
+    assert percentile(values, 0.99) == 99.0
+
+    local = Tracer(prefix='test', window=100)
+    stats = local._handlers['start'] = HandlerStats(local.window)
+    for value in [1000.0] * 10 + values:
+        trace = Trace('start')
+        trace.root.duration = value / 1000
+        stats.observe(trace)
+    # Старые медленные обновления вытеснены из окна
+    snapshot = local.snapshot()['start']
+    assert snapshot['count'] == 110
+    assert snapshot['p99'] == pytest.approx(0.099)
+
+    text = local.render_prometheus()
+    assert '# TYPE test_duration_seconds summary' in text
+    assert 'test_duration_seconds{handler="start",quantile="0.95"} 0.095000' in text
+    assert 'test_duration_seconds_count{handler="start"} 110' in text
+    assert 'test_spans_total{handler="start",kind="db"} 0' in text
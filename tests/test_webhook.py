@@ -0,0 +1,141 @@
+"""Тесты приема обновлений через webhook."""
+import asyncio
+import pytest
+from aiohttp import ClientSession
+from telegram import User
+from telegram.ext import Application, ExtBot, MessageHandler, filters
+
+from webhook import SECRET_TOKEN_HEADER, create_webhook_app, start_webhook_server
+
+SECRET = 'webhook-secret'
+
+
+class OfflineBot(ExtBot):
+    """Бот, не обращающийся к Telegram при инициализации."""
+
+    async def get_me(self, *args, **kwargs):
+        self._bot_user = User(1, 'Santa', is_bot=True, username='santa_bot')
+        return self._bot_user
+
+
+def make_update(update_id, chat_id, text='привет'):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Тест'},
+            'text': text,
+        },
+    }
+
+
+async def _serve(concurrent_updates, handler):
+    application = (
+        Application.builder()
+        .bot(OfflineBot('123:TEST'))
+        .updater(None)
+        .concurrent_updates(concurrent_updates)
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, handler))
+    await application.initialize()
+    await application.start()
+    runner = await start_webhook_server(
+        application, host='127.0.0.1', port=0, path='/telegram', secret_token=SECRET
+    )
+    port = runner.addresses[0][1]
+    return application, runner, f'http://127.0.0.1:{port}/telegram'
+
+
+async def _shutdown(application, runner):
+    await runner.cleanup()
+    await application.stop()
+    await application.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_webhook_delivers_updates_and_checks_secret():
+    """Тест доставки обновлений и отклонения запросов без секрета."""
+    received = []
+
+    async def handler(update, context):
+        received.append(update.message.text)
+
+    application, runner, url = await _serve(4, handler)
+    try:
+        async with ClientSession() as client:
+            response = await client.post(url, json=make_update(1, 10))
+            assert response.status == 403
+
+            response = await client.post(
+                url, json=make_update(2, 10, 'ok'), headers={SECRET_TOKEN_HEADER: 'wrong'}
+            )
+            assert response.status == 403
+
+            response = await client.post(
+                url, data='not json', headers={SECRET_TOKEN_HEADER: SECRET}
+            )
+            assert response.status == 400
+
+            response = await client.post(
+                url, json=make_update(3, 10, 'ok'), headers={SECRET_TOKEN_HEADER: SECRET}
+            )
+            assert response.status == 200
+
+            # Метрики отдает только отдельный сервер METRICS_HOST
+            response = await client.get(url.replace('/telegram', '/metrics'))
+            assert response.status == 404
+
+        for _ in range(100):
+            if received:
+                break
+            await asyncio.sleep(0.01)
+        assert received == ['ok']
+    finally:
+        await _shutdown(application, runner)
+
+
+@pytest.mark.parametrize('secret_token', [None, ''])
+def test_webhook_requires_secret(secret_token):
+    """Тест того, что сервер webhook не создается без секрета."""
+    application = Application.builder().bot(OfflineBot('123:TEST')).updater(None).build()
+    with pytest.raises(ValueError):
+        create_webhook_app(application, secret_token=secret_token)
+
+
+@pytest.mark.asyncio
+async def test_webhook_respects_concurrency_limit():
+    """Тест ограничения числа одновременно обрабатываемых обновлений."""
+    active = 0
+    peak = 0
+    done = 0
+
+    async def handler(update, context):
+        nonlocal active, peak, done
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.05)
+        active -= 1
+        done += 1
+
+    application, runner, url = await _serve(3, handler)
+    try:
+        async with ClientSession() as client:
+            responses = await asyncio.gather(*[
+                client.post(
+                    url, json=make_update(i, 100 + i), headers={SECRET_TOKEN_HEADER: SECRET}
+                )
+                for i in range(12)
+            ])
+        assert all(response.status == 200 for response in responses)
+
+        for _ in range(200):
+            if done == 12:
+                break
+            await asyncio.sleep(0.01)
+        assert done == 12
+        assert peak == 3
+    finally:
+        await _shutdown(application, runner)
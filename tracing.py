@@ -0,0 +1,234 @@
+"""Трассировка обработки обновлений Telegram.
+
+Каждый обработчик приложения оборачивается Tracer.trace_handler: на
+обновление открывается трасса, а вызовы async_database и запросы к Bot API
+записываются в нее дочерними интервалами. Трасса называется по самому
+вложенному обработчику (для нажатий на кнопки - по обработчику из
+CallbackRouter). По этому имени хранятся длительности последних
+обновлений, из которых считаются p50/p95/p99 для /metrics.
+"""
+import functools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from telegram.ext import Application
+from telegram.request import HTTPXRequest
+
+from config import METRICS_HANDLER_WINDOW
+from routing import CallbackRouter
+
+QUANTILES = (0.5, 0.95, 0.99)
+# Виды дочерних интервалов: запросы к базе данных и к Bot API
+SPAN_KINDS = ('db', 'bot_api')
+
+
+class Span:
+    """Интервал трассы"""
+
+    __slots__ = ('kind', 'name', 'started', 'duration', 'children')
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.children: List['Span'] = []
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self.started
+
+    def walk(self) -> Iterator['Span']:
+        """Все вложенные интервалы"""
+        for child in self.children:
+            yield child
+            yield from child.walk()
+
+
+class Trace:
+    """Трасса обработки одного обновления"""
+
+    __slots__ = ('name', 'root')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.root = Span('handler', name)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Перцентиль по рангу для отсортированного списка"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))]
+
+
+class HandlerStats:
+    """Длительности обработки обновлений одним обработчиком"""
+
+    __slots__ = ('durations', 'count', 'seconds', 'spans')
+
+    def __init__(self, window: int):
+        # Последние window длительностей: по ним считаются перцентили
+        self.durations: Deque[float] = deque(maxlen=window)
+        self.count = 0
+        self.seconds = 0.0
+        # Вид интервала -> [число, секунд]
+        self.spans = {kind: [0, 0.0] for kind in SPAN_KINDS}
+
+    def observe(self, trace: Trace) -> None:
+        self.durations.append(trace.root.duration)
+        self.count += 1
+        self.seconds += trace.root.duration
+        for span in trace.root.walk():
+            totals = self.spans.get(span.kind)
+            if totals is not None:
+                totals[0] += 1
+                totals[1] += span.duration
+
+    def as_dict(self) -> Dict[str, Any]:
+        durations = sorted(self.durations)
+        data = {'count': self.count, 'seconds': self.seconds}
+        for q in QUANTILES:
+            data[f'p{round(q * 100)}'] = percentile(durations, q)
+        for kind, (count, seconds) in self.spans.items():
+            data[f'{kind}_calls'] = count
+            data[f'{kind}_seconds'] = seconds
+        return data
+
+
+class Tracer:
+    """Реестр трасс обработчиков"""
+
+    def __init__(self, prefix: str = 'santa_handler', window: int = METRICS_HANDLER_WINDOW):
+        self.prefix = prefix
+        self.window = window
+        self.enabled = False
+        self._handlers: Dict[str, HandlerStats] = {}
+        self._lock = threading.Lock()
+        self._trace: ContextVar[Optional[Trace]] = ContextVar(f'{prefix}_trace', default=None)
+        self._span: ContextVar[Optional[Span]] = ContextVar(f'{prefix}_span', default=None)
+        # Последние завершенные трассы для разбора медленных обновлений
+        self.recent: Deque[Trace] = deque(maxlen=100)
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._handlers.clear()
+            self.recent.clear()
+
+    def trace_handler(self, fn: Callable, name: Optional[str] = None) -> Callable:
+        """Оборачивает обработчик: обновление записывается трассой"""
+        name = name or getattr(fn, '__name__', type(fn).__name__)
+
+        @functools.wraps(fn)
+        async def wrapper(update, context):
+            if not self.enabled:
+                return await fn(update, context)
+            trace = self._trace.get()
+            if trace is not None:
+                # Обработчик вызван другим обработчиком (CallbackRouter):
+                # трасса получает более точное имя
+                trace.name = name
+                with self.span('handler', name):
+                    return await fn(update, context)
+
+            trace = Trace(name)
+            trace_token = self._trace.set(trace)
+            span_token = self._span.set(trace.root)
+            try:
+                return await fn(update, context)
+            finally:
+                self._span.reset(span_token)
+                self._trace.reset(trace_token)
+                trace.root.finish()
+                self._record(trace)
+        return wrapper
+
+    @contextmanager
+    def span(self, kind: str, name: str):
+        """Дочерний интервал текущей трассы (вне трассы ничего не пишет)"""
+        parent = self._span.get() if self.enabled else None
+        if parent is None:
+            yield None
+            return
+        span = Span(kind, name)
+        parent.children.append(span)
+        token = self._span.set(span)
+        try:
+            yield span
+        finally:
+            self._span.reset(token)
+            span.finish()
+
+    def _record(self, trace: Trace) -> None:
+        with self._lock:
+            stats = self._handlers.get(trace.name)
+            if stats is None:
+                stats = self._handlers[trace.name] = HandlerStats(self.window)
+            stats.observe(trace)
+            self.recent.append(trace)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Метрики всех обработчиков: имя обработчика -> значения"""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in sorted(self._handlers.items())}
+
+    def render_prometheus(self) -> str:
+        """Перцентили и дочерние интервалы в текстовом формате Prometheus"""
+        prefix = self.prefix
+        handlers = self.snapshot()
+        lines = [f'# TYPE {prefix}_duration_seconds summary']
+        for name, stats in handlers.items():
+            for q in QUANTILES:
+                value = stats[f'p{round(q * 100)}']
+                lines.append(
+                    f'{prefix}_duration_seconds{{handler="{name}",quantile="{q}"}} {value:.6f}'
+                )
+            lines.append(f'{prefix}_duration_seconds_sum{{handler="{name}"}} {stats["seconds"]:.6f}')
+            lines.append(f'{prefix}_duration_seconds_count{{handler="{name}"}} {stats["count"]}')
+
+        lines.append(f'# TYPE {prefix}_spans_total counter')
+        for name, stats in handlers.items():
+            for kind in SPAN_KINDS:
+                lines.append(
+                    f'{prefix}_spans_total{{handler="{name}",kind="{kind}"}} {stats[f"{kind}_calls"]}'
+                )
+        lines.append(f'# TYPE {prefix}_span_seconds_total counter')
+        for name, stats in handlers.items():
+            for kind in SPAN_KINDS:
+                lines.append(
+                    f'{prefix}_span_seconds_total{{handler="{name}",kind="{kind}"}} '
+                    f'{stats[f"{kind}_seconds"]:.6f}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+# Общий реестр трасс
+tracer = Tracer()
+
+
+class TracedRequest(HTTPXRequest):
+    """HTTPXRequest, записывающий запросы к Bot API в текущую трассу"""
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # Последняя часть адреса - метод Bot API (sendMessage, answerCallbackQuery)
+        with tracer.span('bot_api', url.rsplit('/', 1)[-1]):
+            return await super().do_request(url, method, *args, **kwargs)
+
+
+def instrument_application(application: Application, handler_tracer: Tracer = tracer) -> None:
+    """Оборачивает трассировкой все обработчики приложения"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            if isinstance(handler.callback, CallbackRouter):
+                handler.callback.wrap_handlers(handler_tracer.trace_handler)
+            handler.callback = handler_tracer.trace_handler(handler.callback)
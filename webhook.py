@@ -0,0 +1,163 @@
+"""Прием обновлений Telegram через webhook.
+
+Telegram отправляет обновления POST-запросами на локальный HTTP-сервер
+(aiohttp). Запросы без правильного заголовка
+X-Telegram-Bot-Api-Secret-Token отклоняются, принятые обновления кладутся
+в update_queue приложения, а число одновременно обрабатываемых обновлений
+ограничивает обработчик обновлений приложения (dispatch.py).
+"""
+import asyncio
+import hmac
+import logging
+import signal
+from typing import Optional, Sequence
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_HOST, WEBHOOK_PORT,
+    WEBHOOK_SECRET_TOKEN, WEBHOOK_MAX_CONNECTIONS,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT
+)
+from metrics import db_metrics
+from tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    """Метрики базы данных и обработчиков в текстовом формате Prometheus"""
+    text = db_metrics.render_prometheus() + tracer.render_prometheus()
+    return web.Response(text=text, content_type='text/plain')
+
+
+def create_webhook_app(
+    application: Application,
+    path: str = WEBHOOK_PATH,
+    secret_token: Optional[str] = WEBHOOK_SECRET_TOKEN
+) -> web.Application:
+    """
+    Создает aiohttp-приложение, принимающее обновления Telegram.
+
+    Args:
+        application: Приложение бота
+        path: Путь webhook
+        secret_token: Секрет, который Telegram передает в заголовке запроса
+
+    Returns:
+        web.Application: aiohttp-приложение
+
+    Raises:
+        ValueError: Не задан секрет webhook
+    """
+    if not secret_token:
+        raise ValueError("Не задан WEBHOOK_SECRET_TOKEN для режима webhook")
+
+    async def handle_update(request: web.Request) -> web.Response:
+        if not hmac.compare_digest(
+            request.headers.get(SECRET_TOKEN_HEADER, ''), secret_token
+        ):
+            logger.warning("Отклонен запрос webhook с неверным секретом от %s", request.remote)
+            return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, application.bot)
+        except Exception as e:
+            logger.error("Некорректное обновление webhook: %s", e)
+            return web.Response(status=400)
+
+        await application.update_queue.put(update)
+        return web.Response()
+
+    async def handle_health(request: web.Request) -> web.Response:
+        health = {'status': 'ok', 'update_queue': application.update_queue.qsize()}
+        processor = application.update_processor
+        if hasattr(processor, 'stats'):
+            health['updates'] = processor.stats()
+        return web.json_response(health)
+
+    app = web.Application()
+    app.router.add_post(path, handle_update)
+    app.router.add_get('/healthz', handle_health)
+    return app
+
+
+async def start_webhook_server(
+    application: Application,
+    host: str = WEBHOOK_HOST,
+    port: int = WEBHOOK_PORT,
+    path: str = WEBHOOK_PATH,
+    secret_token: Optional[str] = WEBHOOK_SECRET_TOKEN
+) -> web.AppRunner:
+    """Запускает HTTP-сервер webhook. Returns: runner для остановки сервера"""
+    runner = web.AppRunner(create_webhook_app(application, path, secret_token))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Сервер webhook слушает %s", runner.addresses)
+    return runner
+
+
+async def start_metrics_server(
+    host: str = METRICS_HOST,
+    port: int = METRICS_PORT
+) -> web.AppRunner:
+    """Запускает отдельный HTTP-сервер /metrics. Метрики не отдаются
+    сервером webhook: он доступен из интернета"""
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Сервер метрик слушает %s", runner.addresses)
+    return runner
+
+
+async def run_webhook(
+    application: Application,
+    allowed_updates: Optional[Sequence[str]] = None
+) -> None:
+    """
+    Запускает бота в режиме webhook и работает до сигнала остановки.
+
+    Args:
+        application: Приложение бота
+        allowed_updates: Типы обновлений, которые присылает Telegram
+    """
+    if not WEBHOOK_URL:
+        raise ValueError("Не задан WEBHOOK_URL для режима webhook")
+    # Без секрета любой, кто знает адрес, может присылать поддельные обновления
+    if not WEBHOOK_SECRET_TOKEN:
+        raise ValueError("Не задан WEBHOOK_SECRET_TOKEN для режима webhook")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows: остановка по Ctrl+C через KeyboardInterrupt
+            pass
+
+    async with application:
+        await application.bot.set_webhook(
+            url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            allowed_updates=allowed_updates,
+            max_connections=WEBHOOK_MAX_CONNECTIONS
+        )
+        await application.start()
+        runner = await start_webhook_server(application)
+        metrics_runner = await start_metrics_server() if METRICS_ENABLED else None
+        try:
+            await stop.wait()
+        finally:
+            logger.info("Останавливаем webhook")
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+            await runner.cleanup()
+            await application.stop()
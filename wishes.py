@@ -1,11 +1,15 @@
 import logging
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
-from database import (
-    add_wish, get_user_room, get_user_wishes, update_wish, get_wish,
-    Session, User, Wish, Room, count_users_in_room
+from async_database import (
+    add_wish, get_user_room, get_user_wishes, get_wishes_page, update_wish, get_wish,
+    get_user_by_telegram_id, get_room_by_id
+)
+from broadcast import BroadcastEngine
+from digests import enqueue_wish_digests
+from keyboards import (
+    get_wish_actions_keyboard, get_wish_menu_keyboard, get_page_buttons, get_page_cursor
 )
-from keyboards import get_wish_actions_keyboard
 from datetime import datetime, time
 import asyncio
 
@@ -13,22 +17,17 @@ logger = logging.getLogger(__name__)
 
 
 def get_main_menu_keyboard():
-    """Создает основную клавиатуру меню"""
-    keyboard = [
-        [InlineKeyboardButton("📝 Добавить желание", callback_data="add_wish")],
-        [InlineKeyboardButton("✏️ Редактировать желания", callback_data="edit_wish")],
-        [InlineKeyboardButton("📋 Мои желания", callback_data="list_wishes")]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    """Основная клавиатура меню желаний"""
+    return get_wish_menu_keyboard()
 
 
 async def create_wish(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработчик создания желания"""
     user_id = update.effective_user.id
-    logger.info(f"Пользователь {user_id} создает желание")
+    logger.debug("Пользователь %s создает желание", user_id)
     
     # Проверяем, состоит ли пользователь в комнате
-    user_room = get_user_room(user_id)
+    user_room = await get_user_room(user_id)
     if not user_room or not user_room.get('room_id'):
         await update.callback_query.message.reply_text(
             "Вы не состоите в комнате. Сначала присоединитесь к комнате или создайте новую."
@@ -52,7 +51,7 @@ async def handle_wish_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     wish_text = update.message.text
     
     # Проверяем, состоит ли пользователь в комнате
-    user_room = get_user_room(user_id)
+    user_room = await get_user_room(user_id)
     if not user_room or not user_room.get('room_id'):
         await update.message.reply_text(
             "Вы не состоите в комнате. Сначала присоединитесь к комнате или создайте новую."
@@ -62,7 +61,7 @@ async def handle_wish_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
     room_id = user_room['room_id']
     
     # Сохраняем желание
-    success, message_text = add_wish(room_id, user_id, wish_text)
+    success, message_text = await add_wish(room_id, user_id, wish_text)
     
     if success:
         await update.message.reply_text(
@@ -86,7 +85,8 @@ async def handle_wish_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def edit_wish_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обработчик редактирования желаний"""
+    """Обработчик редактирования желаний: страница списка желаний
+    (wishes_next_/wishes_prev_ - соседние страницы)"""
     query = update.callback_query
     await query.answer()
     
@@ -94,7 +94,7 @@ async def edit_wish_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # Проверяем, есть ли у пользователя комната
-        user_room = get_user_room(user_id)
+        user_room = await get_user_room(user_id)
         if not user_room:
             await query.message.reply_text(
                 "❌ Вы не состоите ни в одной комнате. "
@@ -102,8 +102,12 @@ async def edit_wish_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        # Получаем список желаний пользователя
-        wishes = get_user_wishes(user_id, user_room['room_id'])
+        # Получаем страницу списка желаний пользователя
+        after, before = get_page_cursor(query.data, "wishes_")
+        page = await get_wishes_page(user_id, user_room['room_id'], after=after, before=before)
+        if not page['items'] and (after or before):
+            page = await get_wishes_page(user_id, user_room['room_id'])
+        wishes = page['items']
         if not wishes:
             await query.message.reply_text(
                 "❌ У вас пока нет желаний. "
@@ -119,7 +123,10 @@ async def edit_wish_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 callback_data=f"edit_wish_{wish['id']}"
             )])
         
-        # Добавляем кнопку возврата в главное меню
+        # Кнопки соседних страниц и возврата в главное меню
+        page_buttons = get_page_buttons("wishes_", page)
+        if page_buttons:
+            keyboard.append(page_buttons)
         keyboard.append([InlineKeyboardButton(
             "🔙 Назад",
             callback_data="main_menu"
@@ -131,7 +138,7 @@ async def edit_wish_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
     except Exception as e:
-        logger.error(f"Ошибка при редактировании желания: {e}")
+        logger.error("Ошибка при редактировании желания: %s", e)
         await query.message.reply_text(
             "❌ Произошла ошибка при редактировании желания. "
             "Пожалуйста, попробуйте позже."
@@ -142,18 +149,17 @@ async def list_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает список желаний пользователя в текущей комнате"""
     user_id = update.effective_user.id
     
-    session = Session()
     try:
         # Находим пользователя
-        user = session.query(User).filter(User.telegram_id == user_id).first()
-        if not user or not user.room_id:
+        user = await get_user_by_telegram_id(user_id)
+        if not user or not user['room_id']:
             await update.callback_query.message.reply_text(
                 "❌ Вы не состоите ни в одной комнате."
             )
             return
             
         # Находим комнату
-        room = session.query(Room).filter(Room.id == user.room_id).first()
+        room = await get_room_by_id(user['room_id'])
         if not room:
             await update.callback_query.message.reply_text(
                 "❌ Комната не найдена. Возможно, она была удалена."
@@ -161,7 +167,7 @@ async def list_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
             
         # Получаем желания пользователя в текущей комнате
-        wishes = get_user_wishes(user_id, user.room_id)
+        wishes = await get_user_wishes(user_id, user['room_id'])
         
         if not wishes:
             await update.callback_query.message.reply_text(
@@ -170,14 +176,14 @@ async def list_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
         
-        message = f"📋 Ваши желания в комнате {room.code}:\n\n"
+        message = f"📋 Ваши желания в комнате {room['code']}:\n\n"
         for i, wish in enumerate(wishes, 1):
             message += f"{i}. {wish['text']}\n"
         
         # Добавляем информацию о комнате
-        message += f"\n🏠 Комната {room.code}\n"
-        message += f"🎁 Максимум желаний: {10 if room.is_paid else 3}\n"
-        message += f"👥 Участников: {count_users_in_room(room.id)}/{room.max_participants}\n"
+        message += f"\n🏠 Комната {room['code']}\n"
+        message += f"🎁 Максимум желаний: {10 if room['is_paid'] else 3}\n"
+        message += f"👥 Участников: {room['current_users']}/{room['max_participants']}\n"
         
         await update.callback_query.message.reply_text(
             message,
@@ -185,13 +191,11 @@ async def list_wishes(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         
     except Exception as e:
-        logger.error(f"Ошибка при получении списка желаний: {e}")
+        logger.error("Ошибка при получении списка желаний: %s", e)
         await update.callback_query.message.reply_text(
             "❌ Произошла ошибка при получении списка желаний. "
             "Пожалуйста, попробуйте позже."
         )
-    finally:
-        session.close()
 
 
 async def edit_specific_wish(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -202,7 +206,7 @@ async def edit_specific_wish(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     try:
         # Получаем желание
-        wish = get_wish(wish_id)
+        wish = await get_wish(wish_id)
         if not wish:
             await query.message.reply_text(
                 "❌ Желание не найдено. "
@@ -211,8 +215,7 @@ async def edit_specific_wish(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return
             
         # Получаем пользователя из базы данных
-        session = Session()
-        db_user = session.query(User).filter(User.telegram_id == user.id).first()
+        db_user = await get_user_by_telegram_id(user.id)
         if not db_user:
             await query.message.reply_text(
                 "❌ Пользователь не найден в базе данных."
@@ -220,7 +223,7 @@ async def edit_specific_wish(update: Update, context: ContextTypes.DEFAULT_TYPE)
             return
             
         # Проверяем, принадлежит ли желание пользователю
-        if wish['user_id'] != db_user.id:
+        if wish['user_id'] != db_user['id']:
             await query.message.reply_text(
                 "❌ Вы не можете редактировать чужие желания."
             )
@@ -236,14 +239,11 @@ async def edit_specific_wish(update: Update, context: ContextTypes.DEFAULT_TYPE)
         )
         
     except Exception as e:
-        logger.error(f"Ошибка при редактировании желания {wish_id}: {e}")
+        logger.error("Ошибка при редактировании желания %s: %s", wish_id, e)
         await query.message.reply_text(
             "❌ Произошла ошибка при редактировании желания. "
             "Пожалуйста, попробуйте позже."
         )
-    finally:
-        if 'session' in locals():
-            session.close()
 
 
 async def handle_edit_wish_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -260,8 +260,7 @@ async def handle_edit_wish_text(update: Update, context: ContextTypes.DEFAULT_TY
     
     try:
         # Получаем пользователя из базы данных
-        session = Session()
-        db_user = session.query(User).filter(User.telegram_id == user_id).first()
+        db_user = await get_user_by_telegram_id(user_id)
         if not db_user:
             await update.message.reply_text(
                 "❌ Пользователь не найден в базе данных."
@@ -269,7 +268,7 @@ async def handle_edit_wish_text(update: Update, context: ContextTypes.DEFAULT_TY
             return
             
         # Получаем желание
-        wish = get_wish(wish_id)
+        wish = await get_wish(wish_id)
         if not wish:
             await update.message.reply_text(
                 "❌ Желание не найдено. Возможно, оно было удалено."
@@ -277,14 +276,14 @@ async def handle_edit_wish_text(update: Update, context: ContextTypes.DEFAULT_TY
             return
             
         # Проверяем, принадлежит ли желание пользователю
-        if wish['user_id'] != db_user.id:
+        if wish['user_id'] != db_user['id']:
             await update.message.reply_text(
                 "❌ Вы не можете редактировать чужие желания."
             )
             return
             
         # Обновляем желание
-        success = update_wish(wish_id, new_text)
+        success = await update_wish(wish_id, new_text)
         if success:
             await update.message.reply_text(
                 "✅ Желание успешно обновлено!",
@@ -296,7 +295,7 @@ async def handle_edit_wish_text(update: Update, context: ContextTypes.DEFAULT_TY
                 "Пожалуйста, попробуйте позже."
             )
     except Exception as e:
-        logger.error(f"Ошибка при обновлении желания {wish_id}: {e}")
+        logger.error("Ошибка при обновлении желания %s: %s", wish_id, e)
         await update.message.reply_text(
             "❌ Произошла ошибка при обновлении желания. "
             "Пожалуйста, попробуйте позже."
@@ -304,50 +303,18 @@ async def handle_edit_wish_text(update: Update, context: ContextTypes.DEFAULT_TY
     finally:
         # Очищаем контекст
         context.user_data.pop('editing_wish_id', None)
-        if 'session' in locals():
-            session.close()
 
 
 async def send_daily_wishes(context: ContextTypes.DEFAULT_TYPE):
     """Функция для ежедневной рассылки желаний"""
     logger.info("Начало ежедневной рассылки желаний")
-    session = Session()
     try:
-        # Получаем все комнаты
-        rooms = session.query(Room).all()
-        
-        for room in rooms:
-            # Получаем всех пользователей в комнате
-            users = session.query(User).filter(User.room_id == room.id).all()
-            
-            for user in users:
-                # Получаем желания пользователя
-                wishes = session.query(Wish).filter(
-                    Wish.user_id == user.id,
-                    Wish.room_id == room.id
-                ).all()
-                
-                if wishes:
-                    # Формируем сообщение с желаниями
-                    message = f"🎁 Желания пользователя {user.username or 'Аноним'}:\n\n"
-                    for wish in wishes:
-                        message += f"• {wish.text}\n"
-                    
-                    # Отправляем желания всем пользователям в комнате
-                    for recipient in users:
-                        if recipient.id != user.id:  # Не отправляем пользователю его собственные желания
-                            try:
-                                await context.bot.send_message(
-                                    chat_id=recipient.telegram_id,
-                                    text=message
-                                )
-                            except Exception as e:
-                                logger.error(f"Ошибка при отправке желаний пользователю {recipient.telegram_id}: {e}")
+        # Сохраняем подборки в outbox, чтобы рассылка пережила перезапуск
+        await enqueue_wish_digests()
         
+        await BroadcastEngine(context.bot).run()
     except Exception as e:
-        logger.error(f"Ошибка при рассылке желаний: {e}")
-    finally:
-        session.close()
+        logger.error("Ошибка при рассылке желаний: %s", e)
 
 
 async def schedule_wishes(context: ContextTypes.DEFAULT_TYPE):